@@ -1,13 +1,30 @@
-from fastapi import FastAPI, Request
+import time
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from loguru import logger
-from db.setup import SessionLocal
+from sqlalchemy import select
+from db.setup import AsyncSessionLocal, async_engine
 from db.models.user import User
 from api.routes import upload_receipt
 from api.routes import rag_qa
+from api.routes import batch_upload
+from api.routes import summary
+from api.routes import receipts
+from api.routes import admin
+from api.services.batch_service import batch_service
+from api.services.embedding_worker import embedding_worker
+from ingestion.ocr.ocr_pool import ocr_pool
+from api.services.llm_client import close_llm_client
+from api.services.model_registry import MODEL_WARMUP, registry
+from api.services.upload_limits import UploadSizeLimit
+from api.services.profiling import RequestProfiler
+from api.services import metrics
 
 app = FastAPI()
 
+# Added first so it sits innermost, closest to the route handlers.
+app.add_middleware(RequestProfiler)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -15,23 +32,71 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(UploadSizeLimit)
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     logger.info(f"{request.method} {request.url}")
+    start = time.perf_counter()
     response = await call_next(request)
+    # The route template, not the raw path, keeps label cardinality bounded.
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    metrics.HTTP_SECONDS.labels(request.method, route, str(response.status_code)).observe(time.perf_counter() - start)
     logger.info(f"Status code: {response.status_code}")
     return response
 
 app.include_router(upload_receipt.router, prefix="/upload")
+app.include_router(batch_upload.router, prefix="/upload")
 app.include_router(rag_qa.router, prefix="/rag")
+app.include_router(summary.router, prefix="/summary")
+app.include_router(receipts.router, prefix="/receipts")
+app.include_router(admin.router, prefix="/admin")
 
-@app.on_event("startup")
-def on_startup():
-    db = SessionLocal()
+@app.get("/ready")
+def ready():
+    status = {"models": registry.status(), "ocr": ocr_pool.status()}
+    status["ready"] = all(component["ready"] for component in status.values())
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get("/stats/embedding-cache")
+def embedding_cache_stats():
+    cache = registry.embedding_cache()
+    return cache.stats() if cache else {"enabled": False}
+
+@app.get("/stats/embedding-outbox")
+async def embedding_outbox_stats():
+    async with AsyncSessionLocal() as db:
+        return await embedding_worker.stats(db)
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
     try:
-        if not db.query(User).filter(User.id == 1).first():
+        async with AsyncSessionLocal() as db:
+            outbox = await embedding_worker.stats(db)
+        metrics.OUTBOX_PENDING.set(outbox["pending"])
+        metrics.OUTBOX_FAILED.set(outbox["failed"])
+        metrics.OUTBOX_LAG.set(outbox["lag_seconds"])
+    except Exception as e:
+        logger.warning(f"Could not read embedding outbox for /metrics: {e}")
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+@app.on_event("startup")
+async def on_startup():
+    async with AsyncSessionLocal() as db:
+        if not (await db.execute(select(User).where(User.id == 1))).scalar_one_or_none():
             db.add(User(id=1, name="Default User", email="default@example.com"))
-            db.commit()
-    finally:
-        db.close()
+            await db.commit()
+    # Models load in background threads so the app serves at once; /ready turns
+    # 200 when they are in (MODEL_WARMUP=blocking waits for them here instead).
+    registry.start_warm_up(MODEL_WARMUP)
+    ocr_pool.start(MODEL_WARMUP)
+    embedding_worker.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await batch_service.shutdown()
+    await embedding_worker.stop()
+    ocr_pool.shutdown()
+    await close_llm_client()
+    await async_engine.dispose()
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from typing import Literal
+from api.services.reindex_service import reindex_job
+
+router = APIRouter()
+
+class ReindexRequest(BaseModel):
+    mode: Literal["reindex", "reconcile"] = "reconcile"
+    user_id: int | None = None
+    resume: bool = True
+
+@router.post("/reindex", status_code=202)
+def start_reindex(request: ReindexRequest):
+    if not reindex_job.start(request.mode, request.user_id, request.resume):
+        raise HTTPException(status_code=409, detail="A re-index job is already running")
+    return reindex_job.status()
+
+@router.get("/reindex")
+def reindex_status():
+    return reindex_job.status()
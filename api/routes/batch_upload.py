@@ -0,0 +1,48 @@
+from fastapi import APIRouter, UploadFile, File, HTTPException
+from pydantic import BaseModel
+from datetime import datetime
+from api.services.batch_service import batch_service, BatchJob
+from api.services.upload_limits import InMemoryUploadRoute, read_upload, MAX_BATCH_UPLOAD_BYTES
+
+router = APIRouter(route_class=InMemoryUploadRoute)
+
+class BatchItemStatus(BaseModel):
+    filename: str
+    status: str
+    receipt_id: int | None = None
+    error: str | None = None
+    duplicate: bool = False
+
+class BatchJobStatus(BaseModel):
+    job_id: str
+    status: str
+    progress: dict
+    created_at: datetime
+    finished_at: datetime | None = None
+    items: list[BatchItemStatus]
+
+def _to_status(job: BatchJob) -> BatchJobStatus:
+    return BatchJobStatus(
+        job_id=job.id,
+        status=job.status,
+        progress=job.progress,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+        items=[BatchItemStatus(filename=i.filename, status=i.status,
+                               receipt_id=i.receipt_id, error=i.error, duplicate=i.duplicate) for i in job.items],
+    )
+
+@router.post("/batch", response_model=BatchJobStatus, status_code=202)
+async def upload_batch(files: list[UploadFile] = File(...)):
+    if not files:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+    uploads = [(f.filename, await read_upload(f, MAX_BATCH_UPLOAD_BYTES)) for f in files]
+    job = batch_service.create_job(uploads, user_id=1)
+    return _to_status(job)
+
+@router.get("/batch/{job_id}", response_model=BatchJobStatus)
+async def batch_status(job_id: str):
+    job = batch_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return _to_status(job)
@@ -1,6 +1,11 @@
-from fastapi import APIRouter, HTTPException
+import json
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from api.services.rag_service import RAGService
+from db.setup import get_async_session
 from datetime import date
 router = APIRouter()
 rag_svc = RAGService()
@@ -17,14 +22,14 @@ class RAGResponse(BaseModel):
     source_chunks: list[str]
 
 @router.post("/Question", response_model=RAGResponse)
-async def raq_qa(request: RAGRequest):
+async def raq_qa(request: RAGRequest, db: AsyncSession = Depends(get_async_session)):
     question = request.question
     user_id  = request.user_id
     start_date  = request.start_date
     end_date    = request.end_date
     try:
-        answer, chunks = rag_svc.answer_question(user_id, question, start_date, end_date)
-        #answer, chunks = rag_svc.answer_question(user_id, question)
+        answer, chunks = await rag_svc.answer_question(user_id, question, start_date, end_date, db=db)
+        #answer, chunks = await rag_svc.answer_question(user_id, question)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     if not chunks:
@@ -34,3 +39,49 @@ async def raq_qa(request: RAGRequest):
         answer=answer,
         source_chunks=chunks
     )
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _answer_events(request: RAGRequest, structured, docs=None):
+    # Event order: sources, token*, then done (with the full answer) or error.
+    try:
+        if structured is not None:
+            answer, chunks = structured
+            yield _sse("sources", {"source_chunks": chunks})
+            yield _sse("token", {"text": answer})
+            yield _sse("done", {"answer": answer})
+            return
+        parts = []
+        async for kind, payload in rag_svc.stream_answer(request.user_id, request.question,
+                                                         request.start_date, request.end_date, docs=docs):
+            if kind == "sources":
+                if not payload:
+                    yield _sse("error", {"status": 404, "detail": "No relevant context found."})
+                    return
+                yield _sse("sources", {"source_chunks": payload})
+            else:
+                parts.append(payload)
+                yield _sse("token", {"text": payload})
+        yield _sse("done", {"answer": "".join(parts).strip()})
+    except Exception as e:
+        logger.error(f"Streaming answer failed: {e}")
+        yield _sse("error", {"status": 500, "detail": str(e)})
+
+@router.post("/Question/stream")
+async def rag_qa_stream(request: RAGRequest, db: AsyncSession = Depends(get_async_session)):
+    # The SQL path and lexical retrieval finish here so the session is not used after the response starts.
+    structured = await rag_svc.structured_answer(db, request.user_id, request.question,
+                                                 request.start_date, request.end_date)
+    docs = None
+    if structured is None:
+        try:
+            docs = await rag_svc.retrieve_hybrid(db, request.user_id, request.question,
+                                                 request.start_date, request.end_date)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(
+        _answer_events(request, structured, docs),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
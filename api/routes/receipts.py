@@ -0,0 +1,57 @@
+from datetime import date
+import datetime as dt
+from fastapi import APIRouter, Depends, Query
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.setup import get_async_session
+from api.services.receipt_query_service import list_receipts, list_line_items, DEFAULT_LIMIT, MAX_LIMIT
+
+router = APIRouter()
+
+class ReceiptOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    id: int
+    store_name: str | None = None
+    store_address: str | None = None
+    store_number: str | None = None
+    date: dt.date | None = None
+    total: float | None = None
+    taxes: float | None = None
+    payment_method: str | None = None
+
+class LineItemOut(BaseModel):
+    id: int
+    receipt_id: int
+    date: dt.date | None = None
+    store_name: str | None = None
+    name: str | None = None
+    quantity: float | None = None
+    price_per_unit: float | None = None
+    total_price: float | None = None
+    category: str | None = None
+
+class ReceiptPage(BaseModel):
+    items: list[ReceiptOut]
+    next_cursor: str | None = None
+
+class LineItemPage(BaseModel):
+    items: list[LineItemOut]
+    next_cursor: str | None = None
+
+@router.get("", response_model=ReceiptPage)
+async def get_receipts(user_id: int, start_date: date | None = None, end_date: date | None = None,
+                       store: str | None = None, min_total: float | None = None, max_total: float | None = None,
+                       limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT), cursor: str | None = None,
+                       db: AsyncSession = Depends(get_async_session)):
+    return await list_receipts(db, user_id, limit=limit, start_date=start_date, end_date=end_date,
+                               store=store, min_total=min_total, max_total=max_total, cursor=cursor)
+
+@router.get("/line-items", response_model=LineItemPage)
+async def get_line_items(user_id: int, start_date: date | None = None, end_date: date | None = None,
+                         store: str | None = None, category: str | None = None,
+                         min_price: float | None = None, max_price: float | None = None,
+                         limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT), cursor: str | None = None,
+                         db: AsyncSession = Depends(get_async_session)):
+    return await list_line_items(db, user_id, limit=limit, start_date=start_date, end_date=end_date,
+                                 store=store, category=category, min_price=min_price,
+                                 max_price=max_price, cursor=cursor)
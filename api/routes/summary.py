@@ -0,0 +1,12 @@
+from datetime import date
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.setup import get_async_session
+from api.services.rollup_service import monthly_summary
+
+router = APIRouter()
+
+@router.get("/monthly")
+async def get_monthly_summary(user_id: int, start_date: date | None = None, end_date: date | None = None,
+                              db: AsyncSession = Depends(get_async_session)):
+    return await monthly_summary(db, user_id, start_date, end_date)
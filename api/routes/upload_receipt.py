@@ -1,42 +1,61 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from loguru import logger
-from ingestion.ocr.easyocr_wrapper import extract_lines
-from ingestion.ocr.llm_classifier_wrapper import classify_receipt
-import tempfile
+from ingestion.ocr.ocr_pool import ocr_pool, OCRQueueFull
+from api.services.receipt_classifier import classify_lines
+from api.services.category_memo import category_memo
 import os, json
 from dotenv import load_dotenv
 load_dotenv()
 from api.services.receipt_service import persist_receipt
-from api.services.embedding_service import EmbeddingService
+from db.setup import get_async_session
+from api.services.upload_limits import InMemoryUploadRoute, read_upload
+from api.services.dedupe_service import (image_keys, text_fingerprint, find_image_duplicate,
+                                         find_near_image_duplicate, find_text_duplicate, receipt_summary)
 from pathlib import Path
 
-router = APIRouter()
+router = APIRouter(route_class=InMemoryUploadRoute)
+
+async def _duplicate_response(db, filename, receipt_id, matched_on):
+    logger.info(f"{filename} duplicates receipt {receipt_id} ({matched_on} match), returning it")
+    return {"filename": filename, "receipt_id": receipt_id, "duplicate": True,
+            "json_data": await receipt_summary(db, receipt_id)}
 
 @router.post("/receipt")
-async def upload_receipt(file: UploadFile = File(...)):
+async def upload_receipt(file: UploadFile = File(...), db: AsyncSession = Depends(get_async_session)):
     logger.info(f"Received receipt: {file.filename}")
     if not file.filename.lower().endswith((".jpg", ".jpeg", ".png", ".tiff")):
         raise HTTPException(status_code=400, detail="Only image files are allowed")
-    with tempfile.NamedTemporaryFile(delete=False,
-                                     suffix=os.path.splitext(file.filename)[1]) as tmp:
-        tmp.write(await file.read())
-        tmp_path = tmp.name
+    data = await read_upload(file)
+    validating = os.getenv("MODEL_VALIDATION") == "1"
+    keys = await run_in_threadpool(image_keys, data)
+    if not validating and (dup_id := await find_image_duplicate(db, 1, keys)) is not None:
+        return await _duplicate_response(db, file.filename, dup_id, "image")
+    await category_memo.ensure_loaded(db, 1)
+    # End the read transaction so the pooled connection is free while OCR and the LLM run.
+    await db.commit()
     try:
-        lines = extract_lines(tmp_path)
+        lines = await ocr_pool.extract(data)
         logger.debug(f"OCR extracted {len(lines)} lines")
-    finally:
-        os.remove(tmp_path)
-    json_data = classify_receipt(lines)
+    except OCRQueueFull as e:
+        raise HTTPException(status_code=503, detail="OCR workers are busy, retry later",
+                            headers={"Retry-After": str(e.retry_after)})
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Could not decode image")
+    fingerprint = text_fingerprint(lines)
+    if not validating and (dup_id := await find_text_duplicate(db, 1, fingerprint)) is not None:
+        return await _duplicate_response(db, file.filename, dup_id, "text")
+    if not validating and (dup_id := await find_near_image_duplicate(db, 1, keys, lines)) is not None:
+        return await _duplicate_response(db, file.filename, dup_id, "image")
+    await db.commit()
+    json_data = await classify_lines(lines, user_id=1)
     logger.info(f"Classified receipt: {json_data}")
-    if os.getenv("MODEL_VALIDATION") != "1":
-        receipt = persist_receipt(json_data, lines, user_id=1)
+    if not validating:
+        receipt = await persist_receipt(db, json_data, lines, user_id=1,
+                                        dedupe_keys={**keys.columns(), "text_fingerprint": fingerprint})
+        # Vectors are written by the embedding worker from the outbox row committed with the receipt.
         logger.info(f"Persisted receipt with ID: {receipt.id}")
-        try:
-            emb_svc = EmbeddingService()
-            emb_svc.embed_receipt(receipt)
-            logger.info(f"Embedded receipt {receipt.id} into vector DB")
-        except Exception as e:
-            logger.error(f"Failed to embed receipt {receipt.id}: {e}")
     else:
         logger.info("Model validation mode is enabled, skipping persistence and embedding")
         pred_receipt_dir = Path("validation/receipt_val_data/predictions_receipts")
@@ -46,4 +65,4 @@ async def upload_receipt(file: UploadFile = File(...)):
         full_receipt = json_data.model_dump()
         with pred_file.open("w", encoding="utf-8") as fp:
             json.dump(full_receipt, fp, indent=2, ensure_ascii=False)
-    return {"filename": file.filename, "receipt_id": receipt.id, "json_data": json_data}
\ No newline at end of file
+    return {"filename": file.filename, "receipt_id": receipt.id, "duplicate": False, "json_data": json_data}
\ No newline at end of file
@@ -0,0 +1,259 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+from loguru import logger
+from ingestion.ocr.ocr_pool import ocr_pool
+from api.services.receipt_classifier import classify_lines
+from api.services.category_memo import category_memo
+from api.services.receipt_service import persist_receipts
+from db.setup import AsyncSessionLocal
+from api.services import metrics
+from api.services.dedupe_service import (image_keys, text_fingerprint, find_image_duplicate,
+                                         find_near_image_duplicate, find_text_duplicate)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tiff")
+JOB_TTL = timedelta(hours=int(os.getenv("BATCH_JOB_TTL_HOURS", "24")))
+PERSIST_BATCH_SIZE = int(os.getenv("BATCH_PERSIST_SIZE", "50"))
+PERSIST_WAIT = float(os.getenv("BATCH_PERSIST_WAIT", "0.05"))
+
+@dataclass
+class BatchItem:
+    filename: str
+    path: str
+    status: str = "queued"          # queued -> ocr -> classifying -> persisting -> done | failed
+    receipt_id: Optional[int] = None
+    error: Optional[str] = None
+    duplicate: bool = False
+    dedupe_keys: Optional[dict] = None
+    # Later items in the same job with identical bytes; they wait ("waiting") and share this item's outcome.
+    followers: List["BatchItem"] = field(default_factory=list)
+
+@dataclass
+class BatchJob:
+    id: str
+    user_id: int
+    workdir: str
+    items: List[BatchItem] = field(default_factory=list)
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+
+    @property
+    def progress(self) -> dict:
+        counts = {"total": len(self.items), "done": 0, "failed": 0, "pending": 0}
+        for item in self.items:
+            if item.status in ("done", "failed"):
+                counts[item.status] += 1
+            else:
+                counts["pending"] += 1
+        return counts
+
+    @property
+    def status(self) -> str:
+        p = self.progress
+        if p["pending"]:
+            return "running"
+        return "failed" if p["failed"] == p["total"] else "completed"
+
+class BatchService:
+    """Runs the upload pipeline for many receipts on a bounded worker pool.
+
+    Jobs live in memory, so their status is only visible to the process that
+    accepted the upload.
+    """
+    def __init__(self, workers: int | None = None):
+        self.workers = workers or int(os.getenv("BATCH_WORKERS", os.cpu_count() or 2))
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch")
+        self.jobs: Dict[str, BatchJob] = {}
+        self.queue: asyncio.Queue | None = None
+        self.persist_queue: asyncio.Queue | None = None
+        self._tasks: List[asyncio.Task] = []
+
+    def _ensure_workers(self):
+        if self.queue is None:
+            self.queue = asyncio.Queue()
+            self.persist_queue = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+            self._tasks.append(asyncio.create_task(self._persister()))
+
+    async def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self.queue = None
+        self.persist_queue = None
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def create_job(self, uploads: List[tuple[str, bytes]], user_id: int = 1) -> BatchJob:
+        self._prune_jobs()
+        job = BatchJob(id=uuid.uuid4().hex, user_id=user_id, workdir=tempfile.mkdtemp(prefix="batch_"))
+        seen: Dict[str, BatchItem] = {}
+        for filename, data in uploads:
+            if filename.lower().endswith(".zip"):
+                self._add_zip(job, filename, data, seen)
+            elif filename.lower().endswith(IMAGE_EXTENSIONS):
+                self._add_image(job, filename, data, seen)
+            else:
+                job.items.append(BatchItem(filename=filename, path="", status="failed",
+                                           error="Only image or zip files are allowed"))
+        self.jobs[job.id] = job
+        self._ensure_workers()
+        for item in job.items:
+            if item.status == "queued":
+                self.queue.put_nowait((job, item))
+        self._check_finished(job)
+        logger.info(f"Created batch job {job.id} with {len(job.items)} items")
+        return job
+
+    def get_job(self, job_id: str) -> BatchJob | None:
+        return self.jobs.get(job_id)
+
+    def _prune_jobs(self):
+        cutoff = datetime.utcnow() - JOB_TTL
+        for job_id in [j.id for j in self.jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del self.jobs[job_id]
+
+    def _add_image(self, job: BatchJob, filename: str, data: bytes, seen: Dict[str, BatchItem]):
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in seen:
+            item = BatchItem(filename=filename, path="", status="waiting")
+            seen[digest].followers.append(item)
+            job.items.append(item)
+            return
+        path = Path(job.workdir) / f"{len(job.items)}{Path(filename).suffix.lower()}"
+        path.write_bytes(data)
+        seen[digest] = BatchItem(filename=filename, path=str(path))
+        job.items.append(seen[digest])
+
+    def _add_zip(self, job: BatchJob, filename: str, data: bytes, seen: Dict[str, BatchItem]):
+        zip_path = Path(job.workdir) / f"upload_{len(job.items)}.zip"
+        zip_path.write_bytes(data)
+        try:
+            with zipfile.ZipFile(zip_path) as zf:
+                for info in zf.infolist():
+                    if info.is_dir() or not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                        continue
+                    self._add_image(job, f"{filename}/{info.filename}", zf.read(info), seen)
+        except zipfile.BadZipFile:
+            job.items.append(BatchItem(filename=filename, path="", status="failed", error="Invalid zip file"))
+        finally:
+            zip_path.unlink(missing_ok=True)
+
+    async def _worker(self):
+        while True:
+            job, item = await self.queue.get()
+            try:
+                await self._extract_and_classify(job, item)
+            finally:
+                self.queue.task_done()
+
+    async def _extract_and_classify(self, job: BatchJob, item: BatchItem):
+        loop = asyncio.get_running_loop()
+        try:
+            item.status = "ocr"
+            keys = await loop.run_in_executor(self.executor, lambda: image_keys(Path(item.path).read_bytes()))
+            async with AsyncSessionLocal() as db:
+                dup_id = await find_image_duplicate(db, job.user_id, keys)
+                await category_memo.ensure_loaded(db, job.user_id)
+            if dup_id is not None:
+                self._mark_duplicate(job, item, dup_id)
+                return
+            # Waiting for an OCR slot blocks, so do it off the event loop.
+            ocr_future = await loop.run_in_executor(self.executor, ocr_pool.submit, item.path, True)
+            lines = await asyncio.wrap_future(ocr_future)
+            fingerprint = text_fingerprint(lines)
+            async with AsyncSessionLocal() as db:
+                dup_id = await find_text_duplicate(db, job.user_id, fingerprint)
+                if dup_id is None:
+                    dup_id = await find_near_image_duplicate(db, job.user_id, keys, lines)
+            if dup_id is not None:
+                self._mark_duplicate(job, item, dup_id)
+                return
+            item.dedupe_keys = {**keys.columns(), "text_fingerprint": fingerprint}
+            item.status = "classifying"
+            json_data = await classify_lines(lines, job.user_id)
+            item.status = "persisting"
+            await self.persist_queue.put((job, item, json_data, lines))
+        except Exception as e:
+            self._fail(job, item, e)
+        finally:
+            if item.path:
+                Path(item.path).unlink(missing_ok=True)
+
+    async def _persister(self):
+        # Drains classified receipts in micro-batches so each batch costs one transaction.
+        while True:
+            batch = [await self.persist_queue.get()]
+            await asyncio.sleep(PERSIST_WAIT)
+            while len(batch) < PERSIST_BATCH_SIZE and not self.persist_queue.empty():
+                batch.append(self.persist_queue.get_nowait())
+            try:
+                await self._persist_batch(batch)
+            finally:
+                for _ in batch:
+                    self.persist_queue.task_done()
+
+    async def _persist_batch(self, batch):
+        by_user = {}
+        for entry in batch:
+            by_user.setdefault(entry[0].user_id, []).append(entry)
+        for user_id, entries in by_user.items():
+            try:
+                async with AsyncSessionLocal() as db:
+                    receipts = await persist_receipts(db, [(j, l) for _, _, j, l in entries], user_id=user_id,
+                                                      dedupe_keys=[item.dedupe_keys for _, item, _, _ in entries])
+            except Exception as e:
+                if len(entries) == 1:
+                    self._fail(entries[0][0], entries[0][1], e)
+                    continue
+                # Retry one by one so a single bad receipt does not fail its neighbours.
+                logger.warning(f"Bulk persist of {len(entries)} receipts failed, retrying individually: {e}")
+                for entry in entries:
+                    await self._persist_batch([entry])
+                continue
+            # Embedding happens in the outbox worker; the job is done once the receipts are committed.
+            for (job, item, _, _), receipt in zip(entries, receipts):
+                item.receipt_id = receipt.id
+                item.status = "done"
+                for follower in item.followers:
+                    self._mark_duplicate(job, follower, item.receipt_id)
+                self._check_finished(job)
+
+    def _mark_duplicate(self, job: BatchJob, item: BatchItem, receipt_id: int):
+        logger.info(f"Batch job {job.id}: {item.filename} duplicates receipt {receipt_id}")
+        item.receipt_id = receipt_id
+        item.duplicate = True
+        item.status = "done"
+        for follower in item.followers:
+            self._mark_duplicate(job, follower, receipt_id)
+        self._check_finished(job)
+
+    def _fail(self, job: BatchJob, item: BatchItem, e: Exception):
+        item.status = "failed"
+        item.error = getattr(e, "detail", None) or str(e)
+        logger.error(f"Batch job {job.id}: {item.filename} failed: {item.error}")
+        for follower in item.followers:
+            self._fail(job, follower, e)
+        self._check_finished(job)
+
+    def _check_finished(self, job: BatchJob):
+        if not job.progress["pending"]:
+            self._finish(job)
+
+    def _finish(self, job: BatchJob):
+        if job.finished_at is None:
+            job.finished_at = datetime.utcnow()
+            shutil.rmtree(job.workdir, ignore_errors=True)
+            logger.info(f"Batch job {job.id} finished: {job.progress}")
+
+batch_service = BatchService()
+metrics.track_queue("batch", lambda: batch_service.queue.qsize() if batch_service.queue else 0)
+metrics.track_queue("batch_persist", lambda: batch_service.persist_queue.qsize() if batch_service.persist_queue else 0)
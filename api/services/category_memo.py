@@ -0,0 +1,135 @@
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+import numpy as np
+from loguru import logger
+from sqlalchemy import func, select
+from db.models.receipt import Receipt
+from db.models.line_item import LineItem
+
+# An exact name is trusted once it was seen this often with this share of one category.
+MIN_COUNT = int(os.getenv("CATEGORY_MEMO_MIN_COUNT", "2"))
+MIN_SHARE = float(os.getenv("CATEGORY_MEMO_MIN_SHARE", "0.8"))
+# Cosine similarity a MiniLM nearest neighbour needs for its category to be reused.
+MIN_SIMILARITY = float(os.getenv("CATEGORY_MEMO_MIN_SIMILARITY", "0.88"))
+TTL_SECONDS = int(os.getenv("CATEGORY_MEMO_TTL", "900"))
+
+def normalize_item_name(name: str) -> str:
+    text = unicodedata.normalize("NFKC", name).lower()
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+@dataclass
+class CategoryGuess:
+    category: str
+    confidence: float       # 0-1
+    source: str             # "memo" | "neighbour" | "llm"
+
+@dataclass
+class _UserMemo:
+    counts: Dict[str, Counter] = field(default_factory=dict)
+    loaded_at: float = 0.0
+    index: Optional[tuple] = None       # (names, unit vectors, categories, shares), rebuilt when dirty
+    version: int = 0
+
+class CategoryMemo:
+    """Normalized item name -> category, learned from a user's line_items history.
+
+    Exact names are answered from counts; unseen names fall back to the
+    nearest confidently-known name under the embedding model.
+    """
+    def __init__(self, encoder: Callable[[List[str]], List[List[float]]] | None = None):
+        self._encoder = encoder
+        self._users: Dict[int, _UserMemo] = {}
+        self._lock = threading.Lock()
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        if self._encoder is None:
+            from api.services.embedding_service import EmbeddingService
+            self._encoder = EmbeddingService().encode
+        vectors = np.asarray(self._encoder(texts), dtype=np.float32)
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    async def ensure_loaded(self, db, user_id: int):
+        memo = self._users.get(user_id)
+        if memo is not None and time.monotonic() - memo.loaded_at < TTL_SECONDS:
+            return
+        rows = (await db.execute(
+            select(LineItem.name, LineItem.category, func.count())
+            .join(Receipt, LineItem.receipt_id == Receipt.id)
+            .where(Receipt.user_id == user_id, LineItem.name.isnot(None), LineItem.category.isnot(None))
+            .group_by(LineItem.name, LineItem.category)
+        )).all()
+        counts: Dict[str, Counter] = {}
+        for name, category, n in rows:
+            counts.setdefault(normalize_item_name(name), Counter())[category] += n
+        with self._lock:
+            self._users[user_id] = _UserMemo(counts=counts, loaded_at=time.monotonic())
+        logger.debug(f"Loaded category memo for user {user_id}: {len(counts)} names")
+
+    def learn(self, user_id: int, items: Iterable):
+        """Fold freshly persisted line items (anything with .name and .category) into the memo."""
+        with self._lock:
+            memo = self._users.get(user_id)
+            if memo is None:
+                return      # not loaded yet; the first load reads these rows from the database
+            for item in items:
+                if item.name and item.category:
+                    memo.counts.setdefault(normalize_item_name(item.name), Counter())[item.category] += 1
+            memo.index = None
+            memo.version += 1
+
+    @staticmethod
+    def _best(counter: Counter):
+        category, n = counter.most_common(1)[0]
+        return category, n / sum(counter.values()), n
+
+    def _index(self, memo: _UserMemo):
+        with self._lock:
+            if memo.index is not None:
+                return memo.index
+            known = [(name, *self._best(c)) for name, c in memo.counts.items()]
+            version = memo.version
+        # Encode outside the lock so learn() on the event loop never waits on the model.
+        known = [(name, cat, share) for name, cat, share, n in known if n >= MIN_COUNT and share >= MIN_SHARE]
+        index = ([], None, [], None)
+        if known:
+            names = [k[0] for k in known]
+            index = (names, self._encode(names), [k[1] for k in known], np.array([k[2] for k in known]))
+        with self._lock:
+            if memo.version == version:
+                memo.index = index
+        return index
+
+    def lookup(self, user_id: int, names: List[str]) -> Dict[str, Optional[CategoryGuess]]:
+        """Best guess per name, or None. Blocking (may run the embedding model)."""
+        with self._lock:
+            memo = self._users.get(user_id)
+            if memo is None:
+                return {name: None for name in names}
+            guesses, unseen = {}, []
+            for name in names:
+                counter = memo.counts.get(normalize_item_name(name))
+                if counter:
+                    category, share, n = self._best(counter)
+                    if n >= MIN_COUNT and share >= MIN_SHARE:
+                        guesses[name] = CategoryGuess(category, share, "memo")
+                        continue
+                guesses[name] = None
+                unseen.append(name)
+        if not unseen:
+            return guesses
+        _, matrix, categories, shares = self._index(memo)
+        if matrix is not None:
+            sims = self._encode([normalize_item_name(n) for n in unseen]) @ matrix.T
+            for name, row in zip(unseen, sims):
+                best = int(row.argmax())
+                if row[best] >= MIN_SIMILARITY:
+                    guesses[name] = CategoryGuess(categories[best], float(row[best] * shares[best]), "neighbour")
+        return guesses
+
+category_memo = CategoryMemo()
@@ -0,0 +1,175 @@
+import hashlib
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+import cv2
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from db.models.receipt import Receipt
+from ingestion.ocr.receipt_parser import parse_receipt
+from api.services import metrics
+
+DEDUPE_ENABLED = os.getenv("DEDUPE_ENABLED", "1") == "1"
+# Max differing bits (of 64) for two photos to count as the same receipt.
+PHASH_MAX_DISTANCE = int(os.getenv("DEDUPE_PHASH_DISTANCE", "6"))
+# How many of a user's most recent receipts the perceptual-hash check looks at.
+PHASH_SCAN_LIMIT = int(os.getenv("DEDUPE_PHASH_SCAN", "2000"))
+# The cropped receipt is hashed on a tall grid so its text rows keep some resolution.
+PHASH_GRID = (64, 256)
+# The 8x8 DCT block that is hashed. Its rows and columns start past the lowest
+# frequencies, which only encode the layout every receipt from one till shares.
+PHASH_BAND = (8, 4)
+# Fewer amounts than this make the text fingerprint too collision-prone to trust.
+MIN_FINGERPRINT_AMOUNTS = 3
+
+AMOUNT = re.compile(r"(?<![\d.,])-?\d{1,5}[.,]\d{2}(?![\d.,])")
+DATE = re.compile(r"\b(\d{1,2})[./-](\d{1,2})[./-](\d{2,4})\b")
+TIME = re.compile(r"\b([01]?\d|2[0-3]):([0-5]\d)\b")
+RECEIPT_NUMBER = re.compile(
+    r"\b(?:bon|beleg|rechnung|quittung|trans(?:aktion)?|receipt|invoice)\s*[-.]?\s*(?:nr|no|nummer)?\.?\s*[:#]?\s*(\d{2,})",
+    re.I,
+)
+WORD = re.compile(r"[^\W\d_]{3,}")
+
+@dataclass
+class ImageKeys:
+    content_sha256: str
+    image_phash: Optional[int]
+
+    def columns(self) -> dict:
+        return {"content_sha256": self.content_sha256, "image_phash": self.image_phash}
+
+def crop_receipt(gray):
+    """The receipt paper, deskewed, or the whole image when no paper stands out."""
+    blur = cv2.GaussianBlur(gray, (5, 5), 0)
+    _, mask = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    k = max(3, min(gray.shape) // 50)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((k, k), np.uint8))
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    paper = max(contours, key=cv2.contourArea, default=None)
+    if paper is None or cv2.contourArea(paper) < 0.1 * gray.size:
+        return gray
+    box = cv2.boxPoints(cv2.minAreaRect(paper))
+    corner_sum, corner_diff = box.sum(axis=1), np.diff(box, axis=1).ravel()
+    tl, br = box[np.argmin(corner_sum)], box[np.argmax(corner_sum)]
+    tr, bl = box[np.argmin(corner_diff)], box[np.argmax(corner_diff)]
+    w = int(max(np.linalg.norm(tr - tl), np.linalg.norm(br - bl)))
+    h = int(max(np.linalg.norm(bl - tl), np.linalg.norm(br - tr)))
+    if w < 8 or h < 8:
+        return gray
+    m = cv2.getPerspectiveTransform(np.float32([tl, tr, br, bl]), np.float32([[0, 0], [w, 0], [w, h], [0, h]]))
+    return cv2.warpPerspective(gray, m, (w, h))
+
+def phash(gray) -> int:
+    """64-bit DCT perceptual hash, as a signed int so it fits a Postgres BIGINT."""
+    grid = cv2.resize(gray, PHASH_GRID, interpolation=cv2.INTER_AREA).astype(np.float32)
+    row, col = PHASH_BAND
+    band = cv2.dct(grid)[row:row + 8, col:col + 8].flatten()
+    bits = band > np.median(band)
+    value = int("".join("1" if b else "0" for b in bits), 2)
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+def hamming(a: int, b: int) -> int:
+    return ((a ^ b) & ((1 << 64) - 1)).bit_count()
+
+def image_keys(data: bytes) -> ImageKeys:
+    # A quarter-scale decode still leaves a phone photo's receipt hundreds of pixels across.
+    gray = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    return ImageKeys(
+        content_sha256=hashlib.sha256(data).hexdigest(),
+        image_phash=phash(crop_receipt(gray)) if gray is not None else None,
+    )
+
+def text_fingerprint(lines: List[str]) -> Optional[str]:
+    """Hash of the store, amounts, dates and receipt time or number, in order.
+
+    Prices survive re-photographing far better than OCR'd item names, so two
+    shots of one receipt usually agree on them even when the words differ.
+    The store and the time or number keep two same-day purchases at one price
+    apart; receipts without a date, or with neither, get no fingerprint.
+    """
+    text = "\n".join(lines)
+    amounts = [a.replace(",", ".") for a in AMOUNT.findall(text)]
+    dates = [f"{int(d):02d}{int(m):02d}{y[-2:]}" for d, m, y in DATE.findall(text)]
+    stamps = [f"{int(h):02d}{m}" for h, m in TIME.findall(text)] + RECEIPT_NUMBER.findall(text)
+    store = next((WORD.search(line).group().lower() for line in lines if WORD.search(line)), None)
+    if len(amounts) < MIN_FINGERPRINT_AMOUNTS or not dates or not stamps or store is None:
+        return None
+    return hashlib.sha256(" ".join([store] + amounts + dates + stamps).encode()).hexdigest()
+
+async def find_image_duplicate(db, user_id: int, keys: ImageKeys) -> Optional[int]:
+    """Id of an earlier receipt uploaded with the same bytes.
+
+    Only an exact match may skip OCR; near-identical photos are confirmed
+    against the OCR'd text by :func:`find_near_image_duplicate`.
+    """
+    if not DEDUPE_ENABLED:
+        return None
+    exact = (await db.execute(
+        select(Receipt.id).where(Receipt.user_id == user_id, Receipt.content_sha256 == keys.content_sha256).limit(1)
+    )).scalar_one_or_none()
+    metrics.count_lookup("dedupe_image", "hit" if exact is not None else "miss")
+    return exact
+
+async def find_near_image_duplicate(db, user_id: int, keys: ImageKeys, lines: List[str]) -> Optional[int]:
+    """Id of an earlier receipt with a near-identical photo and the same OCR'd total and date.
+
+    Receipts printed by one till look alike, so a close image hash only
+    nominates candidates; the total read off the new photo must agree too.
+    """
+    if not DEDUPE_ENABLED or keys.image_phash is None:
+        return None
+    parsed = parse_receipt(lines)
+    if parsed.total is None:
+        return None
+    candidates = (await db.execute(
+        select(Receipt.id, Receipt.image_phash)
+        .where(Receipt.user_id == user_id, Receipt.image_phash.isnot(None))
+        .order_by(Receipt.id.desc()).limit(PHASH_SCAN_LIMIT)
+    )).all()
+    near = {c.id: hamming(c.image_phash, keys.image_phash) for c in candidates}
+    near = {rid: dist for rid, dist in near.items() if dist <= PHASH_MAX_DISTANCE}
+    if near:
+        parsed_date = datetime.strptime(parsed.date, "%d-%m-%Y").date() if parsed.date else None
+        rows = (await db.execute(
+            select(Receipt.id, Receipt.total, Receipt.date).where(Receipt.id.in_(near))
+        )).all()
+        for r in sorted(rows, key=lambda r: near[r.id]):
+            if (r.total is not None and abs(r.total - parsed.total) < 0.005
+                    and (parsed_date is None or r.date is None or r.date == parsed_date)):
+                metrics.count_lookup("dedupe_image", "near_hit")
+                return r.id
+    metrics.count_lookup("dedupe_image", "near_miss")
+    return None
+
+async def find_text_duplicate(db, user_id: int, fingerprint: Optional[str]) -> Optional[int]:
+    if not DEDUPE_ENABLED or fingerprint is None:
+        return None
+    found = (await db.execute(
+        select(Receipt.id).where(Receipt.user_id == user_id, Receipt.text_fingerprint == fingerprint).limit(1)
+    )).scalar_one_or_none()
+    metrics.count_lookup("dedupe_text", "hit" if found is not None else "miss")
+    return found
+
+async def receipt_summary(db, receipt_id: int) -> dict:
+    """The stored receipt in the shape classify_receipt returns, for duplicate uploads."""
+    r = (await db.execute(
+        select(Receipt).options(selectinload(Receipt.line_items)).where(Receipt.id == receipt_id)
+    )).scalar_one()
+    return {
+        "store_name": r.store_name,
+        "store_address": r.store_address,
+        "store_number": r.store_number,
+        "items": [{
+            "name": li.name, "quantity": li.quantity, "price_per_unit": li.price_per_unit,
+            "total_price": li.total_price, "category": li.category, "confidence_score": li.confidence_score,
+        } for li in r.line_items],
+        "taxes": r.taxes,
+        "total": r.total,
+        "date": r.date.strftime("%d-%m-%Y") if r.date else None,
+        "payment_method": r.payment_method,
+        "confidence_score_ocr": r.confidence_score_ocr,
+    }
@@ -0,0 +1,100 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List
+import numpy as np
+
+class EmbeddingCache:
+    """On-disk embedding cache keyed by sha256(model name + text).
+
+    Entries are evicted least-recently-used once the table grows past
+    ``max_entries``; eviction trims to 90% so it runs rarely. The row count is
+    kept in memory as an upper bound (a rewrite of an existing key counts as a
+    new row) and only re-counted in SQL once that bound crosses the limit or
+    ``stats()`` is read.
+    """
+    def __init__(self, path: str | None = None, max_entries: int | None = None):
+        self.path = path or os.getenv("EMBED_CACHE_PATH", "./embedding_cache.sqlite3")
+        self.max_entries = max_entries or int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "200000"))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(model_name: str, text: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, model_name: str, texts: List[str]) -> Dict[str, List[float]]:
+        keys = {self.key(model_name, t): t for t in dict.fromkeys(texts)}
+        found = {}
+        with self._lock:
+            key_list = list(keys)
+            for i in range(0, len(key_list), 500):
+                chunk = key_list[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[keys[key]] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, self.key(model_name, t)) for t in found],
+                )
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, model_name: str, vectors: Dict[str, List[float]]):
+        if not vectors:
+            return
+        now = time.time()
+        rows = [(self.key(model_name, t), np.asarray(v, dtype=np.float32).tobytes(), now)
+                for t, v in vectors.items()]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows)
+            self._conn.execute("COMMIT")
+            self._size += len(rows)
+            if self._size > self.max_entries:
+                self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if self._size > self.max_entries:
+                self._evict(self._size - int(self.max_entries * 0.9))
+
+    def _evict(self, n: int):
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (n,)
+        )
+        self._size -= n
+        self.evictions += n
+
+    def stats(self) -> dict:
+        # Other processes may share the file, so report the real row count and resync the estimate.
+        with self._lock:
+            self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,56 +1,105 @@
-import os
-from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings
+from typing import List
 from datetime import date, datetime, time
+from api.services.model_registry import registry
+from api.services import metrics
+
+def summary_text(receipt) -> str:
+    return (
+        f"Store: {receipt.store_name}; "
+        f"Store Address: {receipt.store_address or 'N/A'}; "
+        f"Store Number: {receipt.store_number or 'N/A'}; "
+        f"Date: {receipt.date.isoformat()}; "
+        f"Payment: {receipt.payment_method}; "
+        f"Total (incl. taxes): {receipt.total}; Taxes: {receipt.taxes}"
+    )
+
+def item_text(li) -> str:
+    return (
+        f"Item name: {li.name}; "
+        f"Quantity: {li.quantity}; "
+        f"Unit Price: {li.price_per_unit}; "
+        f"Total Price: {li.total_price}; "
+        f"Category: {li.category}"
+    )
 
 class EmbeddingService:
-    def __init__(self):
-        self.model = SentenceTransformer(os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2"))
-        self.client = chromadb.PersistentClient(path=os.getenv("CHROMA_PERSIST_DIR", "./chroma_db1"))
-        self.collection = self.client.get_or_create_collection(name="receipts")
+    # Resolved through the registry on use, so building a service (e.g. when a
+    # route module is imported) loads no model and opens no store.
+    @property
+    def model(self):
+        return registry.embedding_model()
+
+    @property
+    def client(self):
+        return registry.chroma_client()
+
+    @property
+    def store(self):
+        return registry.vector_store()
+
+    @property
+    def cache(self):
+        return registry.embedding_cache()
+
+    def encode(self, texts: List[str], batch_size: int | None = None) -> List[List[float]]:
+        # batch_size is the model's forward-pass size; bulk re-indexing raises it.
+        kwargs = {"batch_size": batch_size} if batch_size else {}
+        cache = self.cache
+        if cache is None:
+            return self.model.encode(texts, show_progress_bar=False, **kwargs).tolist()
+        model_name = registry.embed_model_name
+        vectors = cache.get_many(model_name, texts)
+        missing = [t for t in dict.fromkeys(texts) if t not in vectors]
+        metrics.count_lookup("embedding", "hit", len(vectors))
+        metrics.count_lookup("embedding", "miss", len(missing))
+        if missing:
+            fresh = dict(zip(missing, self.model.encode(missing, show_progress_bar=False, **kwargs).tolist()))
+            cache.put_many(model_name, fresh)
+            vectors.update(fresh)
+        return [vectors[t] for t in texts]
 
     def embed_receipt(self, receipt):
-        summary = (
-            f"Store: {receipt.store_name}; "
-            f"Store Address: {receipt.store_address or 'N/A'}; "
-            f"Store Number: {receipt.store_number or 'N/A'}; "
-            f"Date: {receipt.date.isoformat()}; "
-            f"Payment: {receipt.payment_method}; "
-            f"Total (incl. taxes): {receipt.total}; Taxes: {receipt.taxes}"
-        )
-        texts = [summary]
-        ids = [f"r:{receipt.id}:summary"]
-        ts = datetime.combine(receipt.date, time()).timestamp()
-        metadatas = [{
-            "user_id": receipt.user_id,
-            "receipt_id": receipt.id,
-            "date_iso": receipt.date.isoformat(),
-            "date_ts": ts,
-            "type": "summary"
-        }]
-        for i, li in enumerate(receipt.line_items):
-            texts.append(
-                f"Item name: {li.name}; "
-                f"Quantity: {li.quantity}; "
-                f"Unit Price: {li.price_per_unit}; "
-                f"Total Price: {li.total_price}; "
-                f"Category: {li.category}"
-            )
-            ids.append(f"r:{receipt.id}:item:{i}")
+        self.embed_receipts([receipt])
+
+    def embed_receipts(self, receipts, batch_size: int | None = None):
+        # One encode for the whole batch, one upsert per user partition.
+        texts, ids, metadatas = [], [], []
+        for receipt in receipts:
+            texts.append(summary_text(receipt))
+            ids.append(f"r:{receipt.id}:summary")
+            ts = datetime.combine(receipt.date, time()).timestamp()
             metadatas.append({
                 "user_id": receipt.user_id,
                 "receipt_id": receipt.id,
                 "date_iso": receipt.date.isoformat(),
                 "date_ts": ts,
-                "type": "line_item",
-                "category": li.category,
-                "item_name": li.name
+                "type": "summary"
             })
-        embeddings = self.model.encode(texts, show_progress_bar=False).tolist()
-        self.collection.upsert(
-            ids=ids,
-            embeddings=embeddings,
-            metadatas=metadatas,
-            documents=texts
-        )
\ No newline at end of file
+            for i, li in enumerate(receipt.line_items):
+                texts.append(item_text(li))
+                ids.append(f"r:{receipt.id}:item:{i}")
+                metadatas.append({
+                    "user_id": receipt.user_id,
+                    "receipt_id": receipt.id,
+                    "date_iso": receipt.date.isoformat(),
+                    "date_ts": ts,
+                    "type": "line_item",
+                    "category": li.category,
+                    "item_name": li.name
+                })
+        if not texts:
+            return
+        with metrics.timed("embed", len(texts)):
+            embeddings = self.encode(texts, batch_size)
+        by_user = {}
+        for i, meta in enumerate(metadatas):
+            by_user.setdefault(meta["user_id"], []).append(i)
+        for user_id, rows in by_user.items():
+            self.store.upsert(
+                user_id,
+                ids=[ids[i] for i in rows],
+                embeddings=[embeddings[i] for i in rows],
+                metadatas=[metadatas[i] for i in rows],
+                documents=[texts[i] for i in rows],
+                model=registry.embed_model_name,
+            )
@@ -0,0 +1,169 @@
+import asyncio
+import os
+import time
+from datetime import timedelta
+from typing import Callable, Dict, List
+from loguru import logger
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.orm import selectinload
+from db.models.receipt import Receipt
+from db.models.embedding_outbox import EmbeddingOutbox
+
+BATCH_SIZE = int(os.getenv("EMBED_WORKER_BATCH", "64"))
+# After a wake-up, wait this long so a burst of uploads shares one forward pass.
+BATCH_WAIT = float(os.getenv("EMBED_WORKER_BATCH_WAIT", "0.2"))
+POLL_INTERVAL = float(os.getenv("EMBED_WORKER_POLL", "5"))
+# A claimed row becomes visible again after this long, so a crashed worker's batch is retried.
+LEASE_SECONDS = int(os.getenv("EMBED_WORKER_LEASE", "300"))
+MAX_ATTEMPTS = int(os.getenv("EMBED_WORKER_MAX_ATTEMPTS", "8"))
+BACKOFF_SECONDS = float(os.getenv("EMBED_WORKER_BACKOFF", "5"))
+MAX_BACKOFF_SECONDS = float(os.getenv("EMBED_WORKER_MAX_BACKOFF", "3600"))
+
+def claim_statement(limit: int, lease_seconds: int = LEASE_SECONDS):
+    # SKIP LOCKED lets every API process run a worker without two of them taking the same rows.
+    due = (select(EmbeddingOutbox.id)
+           .where(EmbeddingOutbox.failed_at.is_(None), EmbeddingOutbox.available_at <= func.now())
+           .order_by(EmbeddingOutbox.available_at, EmbeddingOutbox.id)
+           .limit(limit).with_for_update(skip_locked=True))
+    return (update(EmbeddingOutbox).where(EmbeddingOutbox.id.in_(due))
+            .values(attempts=EmbeddingOutbox.attempts + 1,
+                    available_at=func.now() + timedelta(seconds=lease_seconds))
+            .returning(EmbeddingOutbox.id, EmbeddingOutbox.receipt_id, EmbeddingOutbox.attempts))
+
+def retry_statement(ids: List[int], error: str):
+    backoff = func.least(MAX_BACKOFF_SECONDS, BACKOFF_SECONDS * func.power(2, EmbeddingOutbox.attempts - 1))
+    return (update(EmbeddingOutbox).where(EmbeddingOutbox.id.in_(ids))
+            .values(last_error=error[:2000],
+                    available_at=func.now() + func.make_interval(0, 0, 0, 0, 0, 0, backoff),
+                    failed_at=case((EmbeddingOutbox.attempts >= MAX_ATTEMPTS, func.now()), else_=None)))
+
+def lag_statement():
+    pending = EmbeddingOutbox.failed_at.is_(None)
+    return select(
+        func.count().filter(pending),
+        func.count().filter(EmbeddingOutbox.failed_at.isnot(None)),
+        func.extract("epoch", func.now() - func.min(EmbeddingOutbox.created_at).filter(pending)),
+    )
+
+class EmbeddingWorker:
+    """Drains the embedding outbox in micro-batches, off the request path.
+
+    Rows are claimed with a lease (attempts + 1, hidden for LEASE_SECONDS)
+    and deleted once the receipt's vectors are written. Failures back off
+    exponentially and are parked (failed_at) after MAX_ATTEMPTS; the
+    reconcile job can re-embed those later.
+    """
+    def __init__(self, session_factory: Callable | None = None, embedder=None, batch_size: int = BATCH_SIZE):
+        self.session_factory = session_factory
+        self.embedder = embedder
+        self.batch_size = batch_size
+        self.processed = 0
+        self.failures = 0
+        self.last_batch_size = 0
+        self.last_batch_seconds: float | None = None
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    def _session(self):
+        if self.session_factory is None:
+            from db.setup import AsyncSessionLocal
+            self.session_factory = AsyncSessionLocal
+        return self.session_factory()
+
+    def _embedder(self):
+        if self.embedder is None:
+            from api.services.embedding_service import EmbeddingService
+            self.embedder = EmbeddingService()
+        return self.embedder
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self):
+        """Called after a commit that wrote outbox rows; wakes the worker without waiting for the poll."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                claimed = await self.run_once()
+            except Exception as e:
+                logger.error(f"Embedding worker iteration failed: {e}")
+                claimed = 0
+            if claimed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), POLL_INTERVAL)
+                    await asyncio.sleep(BATCH_WAIT)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+
+    def _embed(self, receipts: List[Receipt]) -> Dict[int, str]:
+        """Embed in one forward pass; if that fails, one by one so a bad receipt only fails itself."""
+        try:
+            self._embedder().embed_receipts(receipts)
+            return {}
+        except Exception as e:
+            if len(receipts) == 1:
+                return {receipts[0].id: str(e)}
+        errors = {}
+        for receipt in receipts:
+            errors.update(self._embed([receipt]))
+        return errors
+
+    async def run_once(self) -> int:
+        async with self._session() as db:
+            claimed = (await db.execute(claim_statement(self.batch_size))).all()
+            await db.commit()
+            if not claimed:
+                return 0
+            receipts = (await db.execute(
+                select(Receipt).options(selectinload(Receipt.line_items))
+                .where(Receipt.id.in_({row.receipt_id for row in claimed}))
+            )).scalars().all()
+            await db.commit()
+        start = time.perf_counter()
+        # Receipts without a date carry no date_ts and are not embedded; their rows are simply done.
+        errors = await asyncio.to_thread(self._embed, [r for r in receipts if r.date is not None])
+        failed = [row.id for row in claimed if row.receipt_id in errors]
+        async with self._session() as db:
+            done = [row.id for row in claimed if row.receipt_id not in errors]
+            if done:
+                await db.execute(delete(EmbeddingOutbox).where(EmbeddingOutbox.id.in_(done)))
+            for row in claimed:
+                if row.receipt_id in errors:
+                    await db.execute(retry_statement([row.id], errors[row.receipt_id]))
+                    logger.warning(f"Embedding receipt {row.receipt_id} failed (attempt {row.attempts}): {errors[row.receipt_id]}")
+            await db.commit()
+        self.processed += len(claimed) - len(failed)
+        self.failures += len(failed)
+        self.last_batch_size = len(claimed)
+        self.last_batch_seconds = time.perf_counter() - start
+        return len(claimed)
+
+    async def stats(self, db) -> dict:
+        pending, failed, oldest = (await db.execute(lag_statement())).one()
+        return {
+            "pending": pending,
+            "failed": failed,
+            "lag_seconds": float(oldest) if oldest is not None else 0.0,
+            "processed": self.processed,
+            "failures": self.failures,
+            "last_batch_size": self.last_batch_size,
+            "last_batch_seconds": self.last_batch_seconds,
+            "running": self._task is not None,
+        }
+
+embedding_worker = EmbeddingWorker()
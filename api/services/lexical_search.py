@@ -0,0 +1,90 @@
+import os
+import re
+from datetime import date
+from typing import Dict, Hashable, List, Sequence, Tuple
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import aliased
+from db.models.receipt import Receipt
+from db.models.line_item import LineItem
+from api.services.embedding_service import item_text, summary_text
+from api.services import metrics
+
+# Reciprocal-rank fusion constant; 60 is the usual choice and damps the head of each list.
+RRF_K = int(os.getenv("RRF_K", "60"))
+MAX_TERMS = 8
+STOPWORDS = {
+    "the", "and", "for", "how", "much", "many", "did", "spend", "spent", "what", "when", "where", "which",
+    "with", "from", "buy", "bought", "was", "were", "have", "has", "on", "in", "at", "my", "me", "of", "on",
+    "last", "this", "month", "year", "week", "total", "all", "any", "der", "die", "das", "und", "ich",
+    "wie", "viel", "habe", "für", "fuer", "bei", "von", "mit", "im", "am", "ausgegeben", "gekauft",
+}
+
+Hit = Tuple[Hashable, str]   # (key shared with the vector hits, document text)
+
+def item_key(receipt_id: int, position: int) -> Hashable:
+    # The line's position on its receipt (by LineItem.id), as in the vector id
+    # r:<receipt_id>:item:<position>; two lines with the same name stay two hits.
+    return ("item", receipt_id, position)
+
+def summary_key(receipt_id: int) -> Hashable:
+    return ("summary", receipt_id)
+
+def query_terms(question: str) -> List[str]:
+    """Words worth matching literally: store names, product names, SKUs and numbers."""
+    terms = []
+    for token in re.findall(r"\w+", question.lower()):
+        if (len(token) >= 3 or token.isdigit()) and token not in STOPWORDS and token not in terms:
+            terms.append(token)
+    return terms[:MAX_TERMS]
+
+def _date_filters(stmt, start_date: date | None, end_date: date | None):
+    if start_date:
+        stmt = stmt.where(Receipt.date >= start_date)
+    if end_date:
+        stmt = stmt.where(Receipt.date <= end_date)
+    return stmt
+
+def _best_similarity(column, terms):
+    sims = [func.word_similarity(t, column) for t in terms]
+    return sims[0] if len(sims) == 1 else func.greatest(*sims)
+
+def item_statement(user_id: int, terms: Sequence[str], start_date=None, end_date=None, limit: int = 20):
+    # `column %> term` is word_similarity(term, column) above pg_trgm's threshold and
+    # is answered from the GIN trigram index on line_items.name.
+    score = _best_similarity(LineItem.name, terms).label("score")
+    earlier = aliased(LineItem)
+    position = (select(func.count()).where(earlier.receipt_id == LineItem.receipt_id, earlier.id < LineItem.id)
+                .correlate(LineItem).scalar_subquery().label("position"))
+    stmt = (select(LineItem, Receipt.date, score, position)
+            .join(Receipt, LineItem.receipt_id == Receipt.id)
+            .where(Receipt.user_id == user_id, or_(*[LineItem.name.op("%>")(t) for t in terms])))
+    return _date_filters(stmt, start_date, end_date).order_by(score.desc()).limit(limit)
+
+def store_statement(user_id: int, terms: Sequence[str], start_date=None, end_date=None, limit: int = 20):
+    score = _best_similarity(Receipt.store_name, terms).label("score")
+    stmt = (select(Receipt, score)
+            .where(Receipt.user_id == user_id, or_(*[Receipt.store_name.op("%>")(t) for t in terms])))
+    return _date_filters(stmt, start_date, end_date).order_by(score.desc(), Receipt.date.desc()).limit(limit)
+
+async def lexical_hits(db, user_id: int, question: str, start_date: date | None = None,
+                       end_date: date | None = None, limit: int = 20) -> List[Hit]:
+    terms = query_terms(question)
+    if not terms:
+        return []
+    with metrics.timed("lexical_query"):
+        items = (await db.execute(item_statement(user_id, terms, start_date, end_date, limit))).all()
+        stores = (await db.execute(store_statement(user_id, terms, start_date, end_date, limit))).all()
+    scored = [(score, item_key(li.receipt_id, position), item_text(li)) for li, _, score, position in items]
+    scored += [(score, summary_key(r.id), summary_text(r)) for r, score in stores if r.date is not None]
+    scored.sort(key=lambda s: s[0], reverse=True)
+    return [(key, text) for _, key, text in scored[:limit]]
+
+def reciprocal_rank_fusion(*rankings: Sequence[Hit], top_k: int = 10, k: int = RRF_K) -> List[str]:
+    """Merge ranked hit lists by summed 1/(k + rank); returns the top documents."""
+    scores: Dict[Hashable, float] = {}
+    docs: Dict[Hashable, str] = {}
+    for ranking in rankings:
+        for rank, (key, text) in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            docs.setdefault(key, text)
+    return [docs[key] for key in sorted(scores, key=scores.get, reverse=True)[:top_k]]
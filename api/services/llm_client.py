@@ -0,0 +1,140 @@
+import asyncio
+import os
+import random
+import time
+from typing import AsyncIterator
+import httpx
+from loguru import logger
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, APITimeoutError
+from api.services import metrics
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, (APITimeoutError, APIConnectionError, asyncio.TimeoutError)):
+        return True
+    return isinstance(exc, APIStatusError) and exc.status_code in RETRYABLE_STATUS
+
+def _retry_after(exc: Exception) -> float | None:
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def _chunk_usage(chunk):
+    # Groq reports usage on the final chunk under x_groq (an untyped extra field); OpenAI-style APIs as usage.
+    usage = getattr(chunk, "usage", None)
+    if usage is None:
+        x_groq = getattr(chunk, "x_groq", None)
+        usage = x_groq.get("usage") if isinstance(x_groq, dict) else getattr(x_groq, "usage", None)
+    return usage
+
+class LLMClient:
+    """Process-wide async Groq client with pooled keep-alive connections.
+
+    Every call goes through a semaphore capping in-flight requests, a per-call
+    timeout and jittered exponential backoff on 429/5xx and transport errors.
+    """
+    def __init__(self, max_in_flight: int | None = None, max_retries: int | None = None,
+                 timeout: float | None = None, backoff: float | None = None):
+        self.max_in_flight = max_in_flight or int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", "3"))
+        self.timeout = timeout or float(os.getenv("LLM_TIMEOUT", "60"))
+        self.backoff = backoff if backoff is not None else float(os.getenv("LLM_BACKOFF", "0.5"))
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=self.max_in_flight,
+                                max_keepalive_connections=self.max_in_flight,
+                                keepalive_expiry=60),
+            timeout=self.timeout,
+        )
+        self.client = AsyncOpenAI(
+            base_url=os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1"),
+            api_key=os.getenv("GROQ_API_KEY"),
+            http_client=self._http,
+            max_retries=0,
+            timeout=self.timeout,
+        )
+
+    @property
+    def in_flight(self) -> int:
+        return self.max_in_flight - self._semaphore._value
+
+    async def _call(self, fn, timeout: float | None = None, stage: str = "llm_classify", **kwargs):
+        timeout = timeout or self.timeout
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._semaphore:
+                    response = await asyncio.wait_for(fn(timeout=timeout, **kwargs), timeout=timeout)
+                # Latency includes retries and semaphore waits: it is what the caller experienced.
+                metrics.observe(stage, time.perf_counter() - start)
+                metrics.count_tokens(stage, getattr(response, "usage", None))
+                return response
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    metrics.STAGE_ERRORS.labels(stage).inc()
+                    raise
+                delay = _retry_after(e) or random.uniform(0, self.backoff * 2 ** attempt)
+                logger.warning(f"LLM call failed ({e.__class__.__name__}), retry {attempt + 1} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def chat(self, timeout: float | None = None, stage: str = "llm_answer", **kwargs):
+        return await self._call(self.client.chat.completions.create, timeout=timeout, stage=stage, **kwargs)
+
+    async def parse(self, timeout: float | None = None, stage: str = "llm_classify", **kwargs):
+        return await self._call(self.client.beta.chat.completions.parse, timeout=timeout, stage=stage, **kwargs)
+
+    async def stream(self, timeout: float | None = None, stage: str = "llm_answer", **kwargs) -> AsyncIterator[str]:
+        """Yield chat completion text deltas as they arrive.
+
+        Opening the stream is retried like any other call; once tokens have
+        been yielded a failure is raised to the caller. The in-flight slot is
+        held until the stream is exhausted or closed.
+        """
+        timeout = timeout or self.timeout
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            async with self._semaphore:
+                try:
+                    stream = await asyncio.wait_for(
+                        self.client.chat.completions.create(stream=True, timeout=timeout, **kwargs), timeout=timeout)
+                except Exception as e:
+                    if attempt >= self.max_retries or not _is_retryable(e):
+                        metrics.STAGE_ERRORS.labels(stage).inc()
+                        raise
+                    delay = _retry_after(e) or random.uniform(0, self.backoff * 2 ** attempt)
+                    logger.warning(f"LLM stream failed to open ({e.__class__.__name__}), retry {attempt + 1} in {delay:.2f}s")
+                else:
+                    try:
+                        async for chunk in stream:
+                            if chunk.choices and chunk.choices[0].delta.content:
+                                yield chunk.choices[0].delta.content
+                            metrics.count_tokens(stage, _chunk_usage(chunk))
+                    finally:
+                        await stream.close()
+                        metrics.observe(stage, time.perf_counter() - start)
+                    return
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self.client.close()
+
+_client: LLMClient | None = None
+
+def get_llm_client() -> LLMClient:
+    global _client
+    if _client is None:
+        _client = LLMClient()
+    return _client
+
+metrics.track_queue("llm_in_flight", lambda: _client.in_flight if _client is not None else 0)
+
+async def close_llm_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,60 @@
+import time
+from contextlib import contextmanager
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+STAGES = ("image_decode", "ocr", "llm_classify", "db_persist", "embed", "vector_query", "lexical_query", "llm_answer")
+# From a cache hit on a tiny receipt to a slow LLM call with retries.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+STAGE_SECONDS = Histogram("pipeline_stage_seconds", "Wall time of one pipeline stage call", ["stage"], buckets=BUCKETS)
+STAGE_ERRORS = Counter("pipeline_stage_errors_total", "Pipeline stage calls that raised", ["stage"])
+STAGE_ITEMS = Counter("pipeline_stage_items_total", "Units handled per stage (receipts, texts, lines)", ["stage"])
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens reported by the LLM API", ["stage", "kind"])
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache and memo lookups by outcome", ["cache", "result"])
+QUEUE_DEPTH = Gauge("queue_depth", "Work admitted but not finished", ["queue"])
+OUTBOX_PENDING = Gauge("embedding_outbox_pending", "Outbox rows waiting to be embedded")
+OUTBOX_FAILED = Gauge("embedding_outbox_failed", "Outbox rows parked after too many attempts")
+OUTBOX_LAG = Gauge("embedding_outbox_lag_seconds", "Age of the oldest pending outbox row")
+HTTP_SECONDS = Histogram("http_request_seconds", "HTTP request latency", ["method", "route", "status"], buckets=BUCKETS)
+
+# Label lookups take a lock and a dict probe; resolve the fixed ones once.
+_seconds = {stage: STAGE_SECONDS.labels(stage) for stage in STAGES}
+_errors = {stage: STAGE_ERRORS.labels(stage) for stage in STAGES}
+_items = {stage: STAGE_ITEMS.labels(stage) for stage in STAGES}
+
+def observe(stage: str, seconds: float, items: int = 0):
+    _seconds[stage].observe(seconds)
+    if items:
+        _items[stage].inc(items)
+
+@contextmanager
+def timed(stage: str, items: int = 0):
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        _errors[stage].inc()
+        raise
+    finally:
+        observe(stage, time.perf_counter() - start, items)
+
+def count_tokens(stage: str, usage):
+    """Record an OpenAI-style ``usage`` object (prompt_tokens / completion_tokens), if the API sent one."""
+    if usage is None:
+        return
+    for kind in ("prompt", "completion"):
+        key = f"{kind}_tokens"
+        n = usage.get(key) if isinstance(usage, dict) else getattr(usage, key, None)
+        if n:
+            LLM_TOKENS.labels(stage, kind).inc(n)
+
+def count_lookup(cache: str, result: str, n: int = 1):
+    if n:
+        CACHE_LOOKUPS.labels(cache, result).inc(n)
+
+def track_queue(queue: str, depth):
+    """Report ``depth()`` as queue_depth{queue=...} whenever /metrics is scraped."""
+    QUEUE_DEPTH.labels(queue).set_function(depth)
+
+def render() -> tuple[bytes, str]:
+    return generate_latest(), CONTENT_TYPE_LATEST
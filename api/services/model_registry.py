@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+from typing import TYPE_CHECKING
+from loguru import logger
+from api.services.embedding_cache import EmbeddingCache
+from api.services.vector_store import VectorStore
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+# "background" loads models in a thread so the app starts serving at once and
+# /ready reports 503 until they are in; "blocking" loads them before startup ends.
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "background")
+
+# sentence_transformers and chromadb pull in torch, onnxruntime and friends
+# (several seconds), so they are imported only when a model is first needed.
+def _sentence_transformer(name: str):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(name)
+
+def _persistent_client(path: str):
+    import chromadb
+    return chromadb.PersistentClient(path=path)
+
+class ModelRegistry:
+    """Holds the process-wide embedding model and Chroma client.
+
+    Services ask the registry instead of constructing their own, so the
+    weights are loaded and the vector store opened once per process.
+    Nothing is loaded until first use or warm_up(); ``state`` moves from
+    idle to loading to ready (or failed).
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._embedding_model = None
+        self._chroma_client = None
+        self._collections = {}
+        self._embedding_cache = None
+        self._vector_store = None
+        self.state = "idle"
+        self.error: str | None = None
+        self.load_seconds: float | None = None
+        self._warm_up_thread: threading.Thread | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    @property
+    def embed_model_name(self) -> str:
+        return os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2")
+
+    def embedding_model(self) -> "SentenceTransformer":
+        with self._lock:
+            if self._embedding_model is None:
+                logger.info(f"Loading embedding model {self.embed_model_name}")
+                self._embedding_model = _sentence_transformer(self.embed_model_name)
+            return self._embedding_model
+
+    def chroma_client(self):
+        with self._lock:
+            if self._chroma_client is None:
+                self._chroma_client = _persistent_client(os.getenv("CHROMA_PERSIST_DIR", "./chroma_db1"))
+            return self._chroma_client
+
+    def collection(self, name: str = "receipts"):
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = self.chroma_client().get_or_create_collection(name=name)
+            return self._collections[name]
+
+    def vector_store(self) -> VectorStore:
+        with self._lock:
+            if self._vector_store is None:
+                self._vector_store = VectorStore(collection=self.collection)
+            return self._vector_store
+
+    def embedding_cache(self) -> EmbeddingCache | None:
+        if os.getenv("EMBED_CACHE_ENABLED", "1") != "1":
+            return None
+        with self._lock:
+            if self._embedding_cache is None:
+                self._embedding_cache = EmbeddingCache()
+            return self._embedding_cache
+
+    def warm_up(self):
+        """Load everything now, in the calling thread; raises if a model cannot be loaded."""
+        start = time.perf_counter()
+        self.state = "loading"
+        try:
+            # The first encode initialises tokenizer and kernels; pay for it here, not on a request.
+            self.embedding_model().encode(["warm-up"], show_progress_bar=False)
+            self.collection()
+            self.vector_store()
+            self.embedding_cache()
+        except Exception as e:
+            self.error = str(e)
+            self.state = "failed"
+            logger.error(f"Model warm-up failed: {e}")
+            raise
+        self.load_seconds = time.perf_counter() - start
+        self.error = None
+        self.state = "ready"
+        logger.info(f"Models ready in {self.load_seconds:.1f}s")
+
+    def start_warm_up(self, mode: str = MODEL_WARMUP):
+        """Load in the background (or now, for mode "blocking"); see MODEL_WARMUP."""
+        if mode == "blocking":
+            self.warm_up()
+            return
+        with self._lock:
+            if self._warm_up_thread is not None and self._warm_up_thread.is_alive():
+                return
+            self.state = "loading"
+            self._warm_up_thread = threading.Thread(target=self._warm_up_quietly, name="model-warm-up", daemon=True)
+            self._warm_up_thread.start()
+
+    def _warm_up_quietly(self):
+        try:
+            self.warm_up()
+        except Exception:
+            pass  # recorded in state/error and reported by /ready
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        thread = self._warm_up_thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.ready
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "embedding_model": self.embed_model_name if self._embedding_model is not None else None,
+            "vector_store": self._chroma_client is not None,
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._embedding_model = None
+            self._chroma_client = None
+            self._collections = {}
+            if self._embedding_cache is not None:
+                self._embedding_cache.close()
+            self._embedding_cache = None
+            self._vector_store = None
+            self.state = "idle"
+            self.error = None
+            self.load_seconds = None
+
+registry = ModelRegistry()
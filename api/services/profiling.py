@@ -0,0 +1,137 @@
+import asyncio
+import os
+import random
+import re
+import time
+from pathlib import Path
+from loguru import logger
+
+# Fraction of requests profiled without being asked; 0 disables sampling.
+SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Requests carrying "X-Profile: <token>" are always profiled; unset disables the header.
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+MAX_PROFILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+# "html" is pyinstrument's call tree; "speedscope" is a flamegraph JSON for speedscope.app.
+PROFILE_FORMAT = os.getenv("PROFILE_FORMAT", "html")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+# Sampled profiles of requests faster than this are dropped; requested ones are always kept.
+MIN_SECONDS = float(os.getenv("PROFILE_MIN_SECONDS", "0"))
+MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", "1"))
+
+HEADER = b"x-profile"
+SUFFIXES = {"html": ".html", "speedscope": ".speedscope.json"}
+
+def _pyinstrument_profiler(interval: float):
+    from pyinstrument import Profiler
+    # async_mode="enabled" only attributes samples to this request's task,
+    # not to whatever else the event loop runs while it awaits.
+    return Profiler(interval=interval, async_mode="enabled")
+
+def render(profiler, fmt: str) -> str:
+    if fmt == "speedscope":
+        from pyinstrument.renderers import SpeedscopeRenderer
+        return profiler.output(SpeedscopeRenderer())
+    return profiler.output_html()
+
+def profile_name(method: str, path: str, seconds: float, fmt: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_")[:60] or "root"
+    return f"{time.time_ns()}-{method.lower()}-{slug}-{int(seconds * 1000)}ms{SUFFIXES[fmt]}"
+
+def prune(directory: Path, keep: int):
+    """Delete all but the ``keep`` newest profiles."""
+    # Names start with a fixed-width nanosecond timestamp, so they sort by age.
+    files = sorted((p for p in directory.iterdir() if p.name.endswith(tuple(SUFFIXES.values()))
+                    and not p.name.startswith(".")), key=lambda p: p.name, reverse=True)
+    for path in files[keep:]:
+        path.unlink(missing_ok=True)
+
+class RequestProfiler:
+    """ASGI middleware that runs a sampling profiler around chosen requests.
+
+    A request is profiled when it sends ``X-Profile: <PROFILE_TOKEN>`` or is
+    picked at SAMPLE_RATE. At most MAX_CONCURRENT requests are profiled at
+    once; the rest run untouched, so a low sample rate stays cheap under
+    load. The report is rendered off the event loop after the response has
+    been sent, and only the newest MAX_PROFILES are kept.
+    """
+    def __init__(self, app, sample_rate: float = SAMPLE_RATE, token: str = PROFILE_TOKEN,
+                 directory: str = PROFILE_DIR, max_profiles: int = MAX_PROFILES, fmt: str = PROFILE_FORMAT,
+                 interval: float = PROFILE_INTERVAL, min_seconds: float = MIN_SECONDS,
+                 max_concurrent: int = MAX_CONCURRENT, profiler_factory=_pyinstrument_profiler):
+        if fmt not in SUFFIXES:
+            raise ValueError(f"PROFILE_FORMAT must be one of {sorted(SUFFIXES)}, not {fmt!r}")
+        self.app = app
+        self.sample_rate = sample_rate
+        self.token = token.encode()
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+        self.fmt = fmt
+        self.interval = interval
+        self.min_seconds = min_seconds
+        self.max_concurrent = max_concurrent
+        self.profiler_factory = profiler_factory
+        self.enabled = bool(sample_rate > 0 or token)
+        self.active = 0
+
+    def _requested(self, scope) -> bool:
+        if not self.token:
+            return False
+        return any(name == HEADER and value == self.token for name, value in scope["headers"])
+
+    def _start(self):
+        try:
+            profiler = self.profiler_factory(self.interval)
+            profiler.start()
+            return profiler
+        except ImportError:
+            logger.warning("Request profiling is configured but pyinstrument is not installed; disabling it")
+            self.enabled = False
+        except Exception as e:
+            # e.g. another profiler already owns this thread's stat hook.
+            logger.warning(f"Could not start request profiler: {e}")
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        requested = self._requested(scope)
+        if not requested and random.random() >= self.sample_rate:
+            return await self.app(scope, receive, send)
+        if self.active >= self.max_concurrent:
+            return await self.app(scope, receive, send)
+        profiler = self._start()
+        if profiler is None:
+            return await self.app(scope, receive, send)
+
+        self.active += 1
+        start = time.perf_counter()
+        name = None
+        async def naming_send(message):
+            nonlocal name
+            if message["type"] == "http.response.start" and requested:
+                # The name is fixed before the body is sent, so the duration in it stops here.
+                name = profile_name(scope["method"], scope["path"], time.perf_counter() - start, self.fmt)
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", name.encode())]}
+            await send(message)
+        try:
+            await self.app(scope, receive, naming_send)
+        finally:
+            profiler.stop()
+            self.active -= 1
+            seconds = time.perf_counter() - start
+            if requested or seconds >= self.min_seconds:
+                name = name or profile_name(scope["method"], scope["path"], seconds, self.fmt)
+                try:
+                    await asyncio.to_thread(self._save, profiler, name)
+                except Exception as e:
+                    logger.warning(f"Could not save profile for {scope['path']}: {e}")
+
+    def _save(self, profiler, name: str):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / name
+        tmp = path.with_name(f".{name}.tmp")
+        tmp.write_text(render(profiler, self.fmt), encoding="utf-8")
+        tmp.replace(path)
+        prune(self.directory, self.max_profiles)
+        logger.info(f"Saved request profile {path}")
@@ -0,0 +1,339 @@
+import re
+import typing
+from calendar import monthrange
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import List, Optional, Sequence, Tuple
+from sqlalchemy import desc, func, select
+from db.models.receipt import Receipt
+from db.models.line_item import LineItem
+from ingestion.ocr.llm_classifier_wrapper import LineItem as LineItemSchema
+
+CATEGORIES: Tuple[str, ...] = typing.get_args(LineItemSchema.model_fields["category"].annotation)
+PAYMENT_METHODS = {
+    "cash": "cash", "credit card": "credit card", "debit card": "debit card",
+    "ec card": "debit card", "girocard": "debit card", "check": "check", "cheque": "check",
+}
+CATEGORY_SYNONYMS = {
+    "snack": ["savory snacks"], "chips": ["savory snacks"],
+    "sweets": ["desserts"], "dessert": ["desserts"], "candy": ["desserts"], "chocolate": ["desserts"],
+    "drink": ["beverages"], "beverage": ["beverages"],
+    "beer": ["alcohol"], "wine": ["alcohol"], "liquor": ["alcohol"], "spirits": ["alcohol"], "booze": ["alcohol"],
+    "restaurant": ["dining/restaurants"], "eating out": ["dining/restaurants"], "takeout": ["dining/restaurants"],
+    "medicine": ["over-the-counter medicine"], "pharmacy": ["over-the-counter medicine"],
+    "vitamin": ["vitamins and supplements"], "supplement": ["vitamins and supplements"],
+    "cleaning": ["household cleaning supplies"],
+    "rent": ["utilities/housing"], "electricity": ["utilities/housing"],
+    "transport": ["transportation"], "taxi": ["transportation"], "fuel": ["transportation"], "train": ["transportation"],
+    "hotel": ["travel and accommodation"], "flight": ["travel and accommodation"],
+    "gift": ["gifts and donation"], "donations": ["gifts and donation"],
+    "subscriptions": ["subscription and membership"], "memberships": ["subscription and membership"],
+}
+MONTHS = {name: i for i, names in enumerate([
+    ("january", "jan", "januar"), ("february", "feb", "februar"), ("march", "mar", "märz", "maerz"),
+    ("april", "apr"), ("may", "mai"), ("june", "jun", "juni"), ("july", "jul", "juli"),
+    ("august", "aug"), ("september", "sep", "sept"), ("october", "oct", "oktober"),
+    ("november", "nov"), ("december", "dec", "dezember"),
+], start=1) for name in names}
+
+SUM_RE   = re.compile(r"\bhow much\b|\btotal\b|\bspen[dt]\b|\bspending\b|\bcost\b|\bsum\b")
+COUNT_RE = re.compile(r"\bhow many\b|\bnumber of\b|\bcount\b")
+AVG_RE   = re.compile(r"\baverage\b|\bavg\b|\bmean\b")
+TOP_RE   = re.compile(r"\btop\b|\bmost\b|\bbiggest\b|\blargest\b|\bhighest\b")
+STORE_WORDS_RE    = re.compile(r"\b(stores?|shops?|merchants?|supermarkets?)\b")
+CATEGORY_WORDS_RE = re.compile(r"\b(categor(y|ies))\b")
+BY_STORE_RE    = re.compile(r"\b(by|per|each|every|which)\s+(store|shop|merchant|supermarket)s?\b")
+BY_CATEGORY_RE = re.compile(r"\b(by|per|each|every|which)\s+categor(y|ies)\b")
+BY_MONTH_RE    = re.compile(r"\b(by|per|each|every)\s+month\b|\bmonthly\b|\bmonth by month\b")
+BY_PAYMENT_RE  = re.compile(r"\b(by|per|each)\s+payment( method)?\b|\bpayment methods\b")
+TOP_N_RE       = re.compile(r"\btop\s+(\d{1,2})\b")
+ITEM_COUNT_RE  = re.compile(r"\b(items?|products?|things)\b")
+STORE_STOPWORDS = {"markt", "gmbh", "store", "shop", "supermarkt", "filiale", "the", "und", "and", "co", "kg"}
+# Questions about one receipt, one item or a unit price: the aggregates below would
+# answer them with a confident but wrong total, so they go to RAG.
+SINGLE_RECEIPT_RE = re.compile(r"\b(last|latest|most recent|previous|first)\b(?:\s+[\w&'-]+){0,2}?\s+"
+                               r"(receipts?|purchases?|visits?|trips?|bills?|orders?|transactions?)\b")
+SINGLE_ITEM_RE = re.compile(r"\b(most expensive|least expensive|priciest|cheapest)\b|"
+                            r"\b(biggest|largest|highest|smallest|lowest)\s+(single\s+)?"
+                            r"(receipts?|purchases?|bills?|items?|products?|transactions?)\b")
+PRICE_RE = re.compile(r"\bprices?\b|\bper (unit|kg|kilo|piece|litre|liter)\b|\bhow much (does|do|is|are)\b")
+# Words a routed question may contain besides its category, store, payment and date
+# filters. Anything else (a product name, an unknown store) is a filter the SQL
+# path cannot apply, so the question falls back to RAG instead of being dropped.
+ROUTABLE_WORDS = set("""
+    how much many did do does i we my me our you your spend spent spending spends expenses expense
+    total totals sum cost costs money overall altogether all in on at for of by per each every which what
+    was were is are has have had been be the a an to from with using via and or so far up until till
+    between during since across over number count average avg mean top most biggest largest highest
+    store stores shop shops merchant merchants supermarket supermarkets category categories month monthly
+    months payment payments method methods paid pay item items product products thing things receipt
+    receipts purchase purchases bought buy show give list tell please can breakdown split grouped group
+    eur euro euros dollars today yesterday last past this previous week weeks quarter quarters year years
+    day days ve s d ll m
+""".split()) | set(MONTHS)
+
+@dataclass
+class SpendQuery:
+    metric: str                              # sum | count | avg
+    group_by: Optional[str] = None           # category | store | month | payment_method
+    categories: List[str] = field(default_factory=list)
+    stores: List[str] = field(default_factory=list)
+    payment_methods: List[str] = field(default_factory=list)
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    limit: Optional[int] = None
+    count_items: bool = False
+
+    @property
+    def item_level(self) -> bool:
+        return bool(self.categories) or self.group_by == "category" or self.count_items
+
+def _category_aliases() -> List[Tuple[str, List[str]]]:
+    aliases = {}
+    for cat in CATEGORIES:
+        aliases.setdefault(cat, []).append(cat)
+        for part in re.split(r"/| and ", cat):
+            part = re.sub(r"\b(essentials?|indulgence)\b", "", part).strip()
+            if part and part not in ("other", "other pantry"):
+                aliases.setdefault(part, []).append(cat)
+    for alias, cats in CATEGORY_SYNONYMS.items():
+        aliases.setdefault(alias, []).extend(cats)
+    return sorted(aliases.items(), key=lambda kv: -len(kv[0]))
+
+CATEGORY_ALIASES = _category_aliases()
+
+def _match_categories(q: str) -> List[str]:
+    found = []
+    for alias, cats in CATEGORY_ALIASES:
+        if re.search(rf"\b{re.escape(alias)}s?\b", q):
+            found.extend(c for c in cats if c not in found)
+    return found
+
+def _match_stores(q: str, known_stores: Sequence[str]) -> List[str]:
+    words = set(re.findall(r"[\w&'-]+", q))
+    found = []
+    for store in known_stores:
+        if not store:
+            continue
+        name = store.lower()
+        tokens = [t for t in re.findall(r"[\w&'-]+", name) if len(t) >= 3 and t not in STORE_STOPWORDS]
+        if name in q or (tokens and tokens[0] in words):
+            found.append(store)
+    return found
+
+def _month_range(year: int, month: int) -> Tuple[date, date]:
+    return date(year, month, 1), date(year, month, monthrange(year, month)[1])
+
+def _quarter_range(year: int, quarter: int) -> Tuple[date, date]:
+    start = date(year, 3 * quarter - 2, 1)
+    return start, _month_range(year, 3 * quarter)[1]
+
+def parse_date_range(q: str, today: date) -> Optional[Tuple[date, date]]:
+    if re.search(r"\btoday\b", q):
+        return today, today
+    if re.search(r"\byesterday\b", q):
+        d = today - timedelta(days=1)
+        return d, d
+    m = re.search(r"\b(?:last|past)\s+(\d{1,3})\s+(day|week|month|year)s?\b", q)
+    if m:
+        n, unit = int(m.group(1)), m.group(2)
+        days = {"day": 1, "week": 7, "month": 30, "year": 365}[unit] * n
+        return today - timedelta(days=days), today
+    m = re.search(r"\b(this|last|previous)\s+(week|month|quarter|year)\b", q)
+    if m:
+        last = m.group(1) != "this"
+        unit = m.group(2)
+        if unit == "week":
+            start = today - timedelta(days=today.weekday()) - timedelta(weeks=1 if last else 0)
+            return start, start + timedelta(days=6)
+        if unit == "month":
+            y, mo = (today.year, today.month - 1) if last else (today.year, today.month)
+            if mo == 0:
+                y, mo = y - 1, 12
+            return _month_range(y, mo)
+        if unit == "quarter":
+            y, qt = today.year, (today.month - 1) // 3 + 1
+            if last:
+                y, qt = (y - 1, 4) if qt == 1 else (y, qt - 1)
+            return _quarter_range(y, qt)
+        y = today.year - 1 if last else today.year
+        return date(y, 1, 1), date(y, 12, 31)
+    m = re.search(r"\bq([1-4])\s+(\d{4})\b", q)
+    if m:
+        return _quarter_range(int(m.group(2)), int(m.group(1)))
+    for m in re.finditer(r"\b(in|during|for|of|since)?\s*([a-zä]+)(?:\s+(\d{4}))?\b", q):
+        word = m.group(2)
+        if word not in MONTHS or (word in ("may", "mar", "jun", "jul", "aug") and not m.group(1)):
+            continue
+        month = MONTHS[word]
+        year = int(m.group(3)) if m.group(3) else (today.year if month <= today.month else today.year - 1)
+        start, end = _month_range(year, month)
+        return (start, today) if m.group(1) == "since" else (start, end)
+    m = re.search(r"\b(?:in|during|for)\s+(\d{4})\b", q)
+    if m:
+        y = int(m.group(1))
+        return date(y, 1, 1), date(y, 12, 31)
+    return None
+
+def _metric(q: str) -> Optional[str]:
+    if SINGLE_RECEIPT_RE.search(q) or SINGLE_ITEM_RE.search(q) or PRICE_RE.search(q):
+        return None
+    if AVG_RE.search(q):
+        return "avg"
+    if COUNT_RE.search(q):
+        return "count"
+    if SUM_RE.search(q) or TOP_RE.search(q):
+        return "sum"
+    return None
+
+def is_spend_question(question: str) -> bool:
+    """Cheap pre-check (no store lookup) for questions parse_question may route to SQL."""
+    return _metric(question.lower()) is not None
+
+def _unmatched_words(q: str, query: SpendQuery) -> List[str]:
+    for alias, cats in CATEGORY_ALIASES:
+        if any(c in query.categories for c in cats):
+            q = re.sub(rf"\b{re.escape(alias)}s?\b", " ", q)
+    for store in query.stores:
+        q = q.replace(store.lower(), " ")
+        store_words = set(re.findall(r"[\w&'-]+", store.lower()))
+        q = " ".join(w for w in re.findall(r"[\w&'-]+", q) if w not in store_words)
+    for method in PAYMENT_METHODS:
+        q = re.sub(rf"\b{method}\b", " ", q)
+    return [w for w in re.findall(r"[a-zäöüß]+", q) if w not in ROUTABLE_WORDS]
+
+def parse_question(question: str, today: date, known_stores: Sequence[str] = (),
+                   start_date: date | None = None, end_date: date | None = None) -> Optional[SpendQuery]:
+    """Return a SpendQuery for aggregate questions, or None for everything else.
+
+    None also covers aggregate-sounding questions the SQL cannot answer
+    faithfully: ones about a single receipt, item or unit price, and ones
+    with words left over after the category, store, payment and date
+    filters are taken out (e.g. a product name).
+    """
+    q = question.lower()
+    is_top = bool(TOP_RE.search(q))
+    metric = _metric(q)
+    if metric is None:
+        return None
+
+    group_by = None
+    if BY_MONTH_RE.search(q):
+        group_by = "month"
+    elif BY_PAYMENT_RE.search(q):
+        group_by = "payment_method"
+    elif BY_STORE_RE.search(q) or (is_top and STORE_WORDS_RE.search(q)):
+        group_by = "store"
+    elif BY_CATEGORY_RE.search(q) or is_top:
+        group_by = "category"
+
+    query = SpendQuery(metric=metric, group_by=group_by)
+    query.categories = _match_categories(q)
+    query.stores = _match_stores(q, known_stores)
+    query.payment_methods = sorted({v for k, v in PAYMENT_METHODS.items() if re.search(rf"\b{k}\b", q)})
+    query.count_items = metric == "count" and bool(ITEM_COUNT_RE.search(q))
+    if group_by and is_top:
+        m = TOP_N_RE.search(q)
+        query.limit = int(m.group(1)) if m else 5
+    dates = parse_date_range(q, today)
+    if dates:
+        query.start_date, query.end_date = dates
+    else:
+        query.start_date, query.end_date = start_date, end_date
+    if _unmatched_words(q, query):
+        return None
+    return query
+
+async def known_stores(db, user_id: int) -> List[str]:
+    rows = (await db.execute(
+        select(Receipt.store_name).where(Receipt.user_id == user_id).distinct()
+    )).scalars().all()
+    return [r for r in rows if r]
+
+def build_statement(user_id: int, query: SpendQuery):
+    amount = LineItem.total_price if query.item_level else Receipt.total
+    counted = LineItem.id if query.item_level else Receipt.id
+    group_col = {
+        "category": LineItem.category,
+        "store": Receipt.store_name,
+        "month": func.date_trunc("month", Receipt.date),
+        "payment_method": Receipt.payment_method,
+        None: None,
+    }[query.group_by]
+    total = func.coalesce(func.sum(amount), 0.0).label("total")
+    cols = ([group_col.label("key")] if group_col is not None else []) + [total, func.count(counted).label("n")]
+    stmt = select(*cols).select_from(Receipt)
+    if query.item_level:
+        stmt = stmt.join(LineItem, LineItem.receipt_id == Receipt.id)
+    stmt = stmt.where(Receipt.user_id == user_id)
+    if query.categories:
+        stmt = stmt.where(LineItem.category.in_(query.categories))
+    if query.stores:
+        stmt = stmt.where(Receipt.store_name.in_(query.stores))
+    if query.payment_methods:
+        stmt = stmt.where(Receipt.payment_method.in_(query.payment_methods))
+    if query.start_date:
+        stmt = stmt.where(Receipt.date >= query.start_date)
+    if query.end_date:
+        stmt = stmt.where(Receipt.date <= query.end_date)
+    if group_col is not None:
+        stmt = stmt.group_by(group_col)
+        stmt = stmt.order_by(group_col) if query.group_by == "month" else stmt.order_by(desc("total"))
+    if query.limit:
+        stmt = stmt.limit(query.limit)
+    return stmt
+
+def format_answer(query: SpendQuery, rows) -> Tuple[str, List[str]]:
+    unit = "items" if query.item_level else "receipts"
+    scope = []
+    if query.categories:
+        scope.append("on " + ", ".join(query.categories))
+    if query.stores:
+        scope.append("at " + ", ".join(query.stores))
+    if query.payment_methods:
+        scope.append("paid by " + ", ".join(query.payment_methods))
+    if query.start_date and query.end_date:
+        scope.append(f"between {query.start_date.isoformat()} and {query.end_date.isoformat()}")
+    elif query.start_date:
+        scope.append(f"since {query.start_date.isoformat()}")
+    elif query.end_date:
+        scope.append(f"until {query.end_date.isoformat()}")
+    scope_txt = (" " + " ".join(scope)) if scope else ""
+
+    def _value(total, n):
+        if query.metric == "count":
+            return f"{n} {unit}"
+        if query.metric == "avg":
+            return f"{(total / n if n else 0.0):.2f} average over {n} {unit}"
+        return f"{total:.2f} ({n} {unit})"
+
+    if query.group_by is None:
+        total, n = rows[0] if rows else (0.0, 0)
+        if query.metric == "count":
+            answer = f"You have {n} {unit}{scope_txt}."
+        elif query.metric == "avg":
+            answer = f"You spent {(total / n if n else 0.0):.2f} per {unit[:-1]} on average{scope_txt} ({n} {unit})."
+        else:
+            answer = f"You spent {total:.2f}{scope_txt} ({n} {unit})."
+        return answer, [f"metric={query.metric}; total={total:.2f}; {unit}={n}{scope_txt}"]
+
+    if not rows:
+        return f"No matching spending found{scope_txt}.", [f"group_by={query.group_by}; rows=0{scope_txt}"]
+    label = query.group_by.replace("_", " ")
+    chunks, lines = [], []
+    for i, (key, total, n) in enumerate(rows, start=1):
+        key = key.strftime("%Y-%m") if hasattr(key, "strftime") else (key or "unknown")
+        lines.append(f"{i}. {key}: {_value(total, n)}")
+        chunks.append(f"{label}={key}; total={total:.2f}; {unit}={n}")
+    header = f"Top {len(rows)} by {label}" if query.limit else f"Spending by {label}"
+    return f"{header}{scope_txt}:\n" + "\n".join(lines), chunks
+
+async def answer_spend_question(db, user_id: int, question: str, today: date,
+                                start_date: date | None = None, end_date: date | None = None):
+    if not is_spend_question(question):
+        return None
+    query = parse_question(question, today, await known_stores(db, user_id), start_date, end_date)
+    if query is None:
+        return None
+    rows = (await db.execute(build_statement(user_id, query))).all()
+    return format_answer(query, rows)
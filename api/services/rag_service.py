@@ -1,34 +1,77 @@
-import os
-from typing import Tuple, List
+import asyncio
+from typing import AsyncIterator, Tuple, List
 from datetime import date, datetime, time
-from openai import OpenAI
+from loguru import logger
 from api.services.embedding_service import EmbeddingService
+from api.services.llm_client import get_llm_client
+from api.services import metrics
+from api.services.query_router import answer_spend_question
+from api.services.lexical_search import item_key, summary_key, lexical_hits, reciprocal_rank_fusion
 
 class RAGService:
     def __init__(self):
         self.emb_svc = EmbeddingService()
-        self.client   = OpenAI(
-                base_url = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1"),
-                api_key  = os.getenv("GROQ_API_KEY"),
-            )
-    def answer_question(self, user_id: int, question: str,
-            start_date: date | None = None, end_date: date | None = None, 
-            top_k: int = 10) -> Tuple[str, List[str]]:
-        filters = [{"user_id": user_id}]
+
+    @staticmethod
+    def _hit_key(hit):
+        # Same keys as lexical_search so a chunk found by both retrievers is fused, not duplicated.
+        meta = hit.metadata or {}
+        if meta.get("type") == "summary":
+            return summary_key(meta["receipt_id"])
+        if meta.get("type") == "line_item" and hit.id and hit.id.rsplit(":", 1)[-1].isdigit():
+            return item_key(meta["receipt_id"], int(hit.id.rsplit(":", 1)[-1]))
+        return hit.id or hit.document
+
+    def retrieve_hits(self, user_id: int, question: str,
+            start_date: date | None = None, end_date: date | None = None,
+            top_k: int = 10) -> List[Tuple[object, str]]:
+        date_range = None
         if start_date and end_date:
-            lo = datetime.combine(start_date, time()).timestamp()
-            hi = datetime.combine(end_date, time()).timestamp()
-            filters.append({"date_ts": {"$gte": lo}})
-            filters.append({"date_ts": {"$lte": hi}})
-        q_emb = self.emb_svc.model.encode([question], show_progress_bar=False).tolist()[0]
-        results = self.emb_svc.collection.query(
-            query_embeddings=[q_emb],
-            n_results=top_k,
-            where={"$and": filters} if len(filters) > 1 else filters[0]
+            date_range = (datetime.combine(start_date, time()).timestamp(),
+                          datetime.combine(end_date, time()).timestamp())
+        with metrics.timed("embed", 1):
+            q_emb = self.emb_svc.model.encode([question], show_progress_bar=False).tolist()[0]
+        with metrics.timed("vector_query"):
+            hits = self.emb_svc.store.query(user_id, q_emb, top_k, date_range)
+        return [(self._hit_key(hit), hit.document) for hit in hits]
+
+    def retrieve(self, user_id: int, question: str,
+            start_date: date | None = None, end_date: date | None = None,
+            top_k: int = 10) -> List[str]:
+        return [doc for _, doc in self.retrieve_hits(user_id, question, start_date, end_date, top_k)]
+
+    async def retrieve_hybrid(self, db, user_id: int, question: str,
+            start_date: date | None = None, end_date: date | None = None,
+            top_k: int = 10) -> List[str]:
+        """Chroma and trigram hits merged with reciprocal-rank fusion.
+
+        Exact store/product names and SKUs that MiniLM scores poorly still surface
+        through the lexical side; if it fails the vector results are used alone.
+        """
+        vector, lexical = await asyncio.gather(
+            asyncio.to_thread(self.retrieve_hits, user_id, question, start_date, end_date, top_k),
+            lexical_hits(db, user_id, question, start_date, end_date, limit=top_k * 2),
+            return_exceptions=True,
         )
-        docs = results.get("documents", [])[0]
-        if not docs:
-            return "I don’t know.", []
+        if isinstance(vector, BaseException):
+            raise vector
+        if isinstance(lexical, BaseException):
+            await db.rollback()
+            logger.error(f"Lexical search failed, using vector results only: {lexical}")
+            lexical = []
+        return reciprocal_rank_fusion(vector, lexical, top_k=top_k)
+
+    async def structured_answer(self, db, user_id: int, question: str,
+            start_date: date | None = None, end_date: date | None = None) -> Tuple[str, List[str]] | None:
+        try:
+            return await answer_spend_question(db, user_id, question, date.today(), start_date, end_date)
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Structured query failed, falling back to RAG: {e}")
+            return None
+
+    @staticmethod
+    def _messages(question: str, docs: List[str]) -> list:
         context = "\n\n".join(docs)
         prompt  = (
             "Use the following receipt context to answer the question. "
@@ -36,10 +79,44 @@ class RAGService:
             f"Context:\n{context}\n\n"
             f"Question: {question}\nAnswer:"
         )
-        resp = self.client.chat.completions.create(
+        return [{"role": "user", "content": prompt}]
+
+    async def answer_question(self, user_id: int, question: str,
+            start_date: date | None = None, end_date: date | None = None,
+            top_k: int = 10, db=None) -> Tuple[str, List[str]]:
+        # Without a session every question goes through retrieval + LLM.
+        if db is not None:
+            result = await self.structured_answer(db, user_id, question, start_date, end_date)
+            if result is not None:
+                return result
+            docs = await self.retrieve_hybrid(db, user_id, question, start_date, end_date, top_k)
+        else:
+            docs = await asyncio.to_thread(self.retrieve, user_id, question, start_date, end_date, top_k)
+        if not docs:
+            return "I don’t know.", []
+        resp = await get_llm_client().chat(
             model="llama-3.1-8b-instant",
-            messages=[{"role": "user", "content": prompt}],
+            messages=self._messages(question, docs),
             temperature=0.0,
         )
         answer = resp.choices[0].message.content.strip()
         return answer, docs
+
+    async def stream_answer(self, user_id: int, question: str,
+            start_date: date | None = None, end_date: date | None = None,
+            top_k: int = 10, docs: List[str] | None = None) -> AsyncIterator[Tuple[str, object]]:
+        """Yield ("sources", docs) as soon as retrieval is done, then ("token", text) per delta.
+
+        Pass ``docs`` when they were already retrieved (e.g. hybrid retrieval with a session).
+        """
+        if docs is None:
+            docs = await asyncio.to_thread(self.retrieve, user_id, question, start_date, end_date, top_k)
+        yield "sources", docs
+        if not docs:
+            return
+        async for token in get_llm_client().stream(
+            model="llama-3.1-8b-instant",
+            messages=self._messages(question, docs),
+            temperature=0.0,
+        ):
+            yield "token", token
@@ -0,0 +1,60 @@
+import asyncio
+import os
+from typing import Dict, List
+from loguru import logger
+from ingestion.ocr.receipt_parser import ParsedReceipt, parse_receipt
+from ingestion.ocr.llm_classifier_wrapper import ReceiptSummary, LineItem, classify_receipt, categorize_items
+from api.services.category_memo import CategoryGuess, category_memo
+from api.services import metrics
+
+# Memo/neighbour guesses below this confidence are sent to the LLM instead.
+MIN_LOCAL_CONFIDENCE = float(os.getenv("LOCAL_CATEGORY_MIN_CONFIDENCE", "0.8"))
+LOCAL_PARSE_ENABLED = os.getenv("LOCAL_PARSE_ENABLED", "1") == "1"
+
+def build_summary(parsed: ParsedReceipt, guesses: Dict[str, CategoryGuess]) -> ReceiptSummary:
+    items = [LineItem(
+        name=item.name,
+        quantity=item.quantity,
+        price_per_unit=item.price_per_unit,
+        total_price=item.total_price,
+        category=guesses[item.name].category,
+        confidence_score=round(guesses[item.name].confidence * 100),
+    ) for item in parsed.items]
+    return ReceiptSummary(
+        store_name=parsed.store_name,
+        store_address=parsed.store_address,
+        items=items,
+        taxes=parsed.taxes or 0.0,
+        total=parsed.total,
+        date=parsed.date,
+        payment_method=parsed.payment_method,
+        # OCR confidence does not reach this layer; report the weakest item instead.
+        confidence_score_ocr=min(i.confidence_score for i in items),
+    )
+
+async def classify_lines(lines: List[str], user_id: int) -> ReceiptSummary:
+    """Turn OCR lines into a ReceiptSummary with as little LLM work as possible.
+
+    Receipts the rule-based parser reads completely (items sum to the total)
+    and whose items are all known to the category memo never reach the LLM.
+    If only some names are unknown, just those names are sent for
+    categorisation. Anything the parser cannot reconcile falls back to the
+    full extraction prompt. Callers load the user's memo first
+    (``category_memo.ensure_loaded``) so no connection is held across LLM calls.
+    """
+    parsed = parse_receipt(lines) if LOCAL_PARSE_ENABLED else None
+    if parsed is None or not parsed.complete:
+        logger.debug("Local parse incomplete, using full LLM extraction")
+        return await classify_receipt(lines)
+    names = list(dict.fromkeys(item.name for item in parsed.items))
+    guesses = await asyncio.to_thread(category_memo.lookup, user_id, names)
+    unknown = [n for n in names if guesses[n] is None or guesses[n].confidence < MIN_LOCAL_CONFIDENCE]
+    for name in names:
+        metrics.count_lookup("category_memo", guesses[name].source if name not in unknown else "miss")
+    if unknown:
+        answered = {c.name: c for c in await categorize_items(unknown)}
+        for name in unknown:
+            c = answered.get(name)
+            guesses[name] = CategoryGuess(c.category, c.confidence_score / 100, "llm") if c else CategoryGuess("other", 0.0, "llm")
+    logger.info(f"Parsed receipt locally: {len(names) - len(unknown)}/{len(names)} items categorised without the LLM")
+    return build_summary(parsed, guesses)
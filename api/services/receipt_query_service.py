@@ -0,0 +1,117 @@
+import base64
+import json
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, select, tuple_
+from db.models.receipt import Receipt
+from db.models.line_item import LineItem
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+@dataclass
+class Cursor:
+    date: Optional[date]
+    receipt_id: int
+    line_item_id: Optional[int] = None
+
+def encode_cursor(cursor: Cursor) -> str:
+    payload = {"d": cursor.date.isoformat() if cursor.date else None, "r": cursor.receipt_id}
+    if cursor.line_item_id is not None:
+        payload["l"] = cursor.line_item_id
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(token: str) -> Cursor:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        return Cursor(
+            date=date.fromisoformat(payload["d"]) if payload["d"] else None,
+            receipt_id=int(payload["r"]),
+            line_item_id=int(payload["l"]) if "l" in payload else None,
+        )
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _after_receipt(cursor: Cursor):
+    # Order is (date DESC NULLS LAST, id DESC), matching ix_receipts_user_id_date_id.
+    if cursor.date is None:
+        return and_(Receipt.date.is_(None), Receipt.id < cursor.receipt_id)
+    return or_(
+        tuple_(Receipt.date, Receipt.id) < tuple_(cursor.date, cursor.receipt_id),
+        Receipt.date.is_(None),
+    )
+
+def _after_line_item(cursor: Cursor):
+    same_receipt = and_(Receipt.id == cursor.receipt_id, LineItem.id < cursor.line_item_id)
+    return or_(_after_receipt(cursor), same_receipt)
+
+def _receipt_filters(stmt, user_id, start_date, end_date, store):
+    stmt = stmt.where(Receipt.user_id == user_id)
+    if start_date:
+        stmt = stmt.where(Receipt.date >= start_date)
+    if end_date:
+        stmt = stmt.where(Receipt.date <= end_date)
+    if store:
+        stmt = stmt.where(Receipt.store_name == store)
+    return stmt
+
+def _clamp(limit: int | None) -> int:
+    return max(1, min(limit or DEFAULT_LIMIT, MAX_LIMIT))
+
+def receipts_statement(user_id: int, start_date: date | None = None, end_date: date | None = None,
+                       store: str | None = None, min_total: float | None = None,
+                       max_total: float | None = None, limit: int | None = None,
+                       cursor: str | None = None):
+    stmt = _receipt_filters(select(Receipt), user_id, start_date, end_date, store)
+    if min_total is not None:
+        stmt = stmt.where(Receipt.total >= min_total)
+    if max_total is not None:
+        stmt = stmt.where(Receipt.total <= max_total)
+    if cursor:
+        stmt = stmt.where(_after_receipt(decode_cursor(cursor)))
+    # Fetch one extra row to know whether another page exists.
+    return stmt.order_by(Receipt.date.desc().nulls_last(), Receipt.id.desc()).limit(_clamp(limit) + 1)
+
+def line_items_statement(user_id: int, start_date: date | None = None, end_date: date | None = None,
+                         store: str | None = None, category: str | None = None,
+                         min_price: float | None = None, max_price: float | None = None,
+                         limit: int | None = None, cursor: str | None = None):
+    stmt = select(LineItem, Receipt.date, Receipt.store_name).join(Receipt, LineItem.receipt_id == Receipt.id)
+    stmt = _receipt_filters(stmt, user_id, start_date, end_date, store)
+    if category:
+        stmt = stmt.where(LineItem.category == category)
+    if min_price is not None:
+        stmt = stmt.where(LineItem.total_price >= min_price)
+    if max_price is not None:
+        stmt = stmt.where(LineItem.total_price <= max_price)
+    if cursor:
+        c = decode_cursor(cursor)
+        if c.line_item_id is None:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        stmt = stmt.where(_after_line_item(c))
+    return stmt.order_by(Receipt.date.desc().nulls_last(), Receipt.id.desc(), LineItem.id.desc()).limit(_clamp(limit) + 1)
+
+async def list_receipts(db, user_id: int, limit: int | None = None, **filters) -> dict:
+    rows = (await db.execute(receipts_statement(user_id, limit=limit, **filters))).scalars().all()
+    page, more = rows[:_clamp(limit)], len(rows) > _clamp(limit)
+    last = page[-1] if page else None
+    return {
+        "items": page,
+        "next_cursor": encode_cursor(Cursor(last.date, last.id)) if more else None,
+    }
+
+async def list_line_items(db, user_id: int, limit: int | None = None, **filters) -> dict:
+    rows = (await db.execute(line_items_statement(user_id, limit=limit, **filters))).all()
+    page, more = rows[:_clamp(limit)], len(rows) > _clamp(limit)
+    items = [{
+        "id": li.id, "receipt_id": li.receipt_id, "date": d, "store_name": store,
+        "name": li.name, "quantity": li.quantity, "price_per_unit": li.price_per_unit,
+        "total_price": li.total_price, "category": li.category,
+    } for li, d, store in page]
+    last = items[-1] if items else None
+    return {
+        "items": items,
+        "next_cursor": encode_cursor(Cursor(last["date"], last["receipt_id"], last["id"])) if more else None,
+    }
@@ -1,42 +1,134 @@
-from db.setup import SessionLocal
 from db.models.receipt import Receipt
 from db.models.line_item import LineItem
-from datetime import datetime
+from db.models.embedding_outbox import EmbeddingOutbox
+import time
+from dataclasses import dataclass, field, fields
+from datetime import date, datetime
+from typing import List, Optional, Sequence, Tuple
 from fastapi import HTTPException
-from sqlalchemy.orm import joinedload
-def persist_receipt(json_data, lines, user_id=1):
-    db = SessionLocal()
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from api.services.rollup_service import apply_rollups
+from api.services.category_memo import category_memo
+from api.services.embedding_worker import embedding_worker
+from api.services import metrics
+
+@dataclass
+class PersistedLineItem:
+    id: int
+    receipt_id: int
+    name: str
+    quantity: Optional[float]
+    price_per_unit: Optional[float]
+    total_price: Optional[float]
+    confidence_score: Optional[int]
+    category: str
+
+@dataclass
+class PersistedReceipt:
+    """What was written for one receipt, without a read-back query.
+
+    Carries the same attributes EmbeddingService and the rollups read from
+    ORM receipts, so either can take it in place of a loaded Receipt.
+    """
+    id: int
+    user_id: int
+    store_name: str
+    store_address: Optional[str]
+    store_number: Optional[str]
+    date: Optional[date]
+    total: Optional[float]
+    taxes: Optional[float]
+    payment_method: Optional[str]
+    confidence_score_ocr: Optional[int]
+    line_items: List[PersistedLineItem] = field(default_factory=list)
+
+_PERSISTED_FIELDS = {f.name for f in fields(PersistedReceipt)}
+
+def _receipt_date(value: Optional[str]) -> Optional[date]:
+    # An OCR misread like 31-02 must not fail the whole batch; the receipt is kept undated.
     try:
-        receipt = Receipt(
-            user_id=user_id,
-            store_name=json_data.store_name,
-            store_address=json_data.store_address,
-            store_number=json_data.store_number,
-            total=json_data.total,
-            taxes=json_data.taxes,
-            payment_method=json_data.payment_method,
-            confidence_score_ocr=json_data.confidence_score_ocr,
-            date=datetime.strptime(json_data.date, "%d-%m-%Y").date() if json_data.date else None,
-            raw_text="\n".join(lines),
-        )
-        db.add(receipt)
-        db.flush()
-        for item in json_data.items:
-            line_item = LineItem(
-                name=item.name,
-                quantity=item.quantity,
-                price_per_unit=item.price_per_unit,
-                total_price=item.total_price,
-                confidence_score=item.confidence_score,
-                category=item.category,
-                receipt=receipt,
-            )
-            db.add(line_item)
-        db.commit()
-        receipt = db.query(Receipt).options(joinedload(Receipt.line_items)).filter(Receipt.id == receipt.id).one()
-        return receipt
+        return datetime.strptime(value, "%d-%m-%Y").date() if value else None
+    except ValueError:
+        return None
+
+def _receipt_row(json_data, lines, user_id, dedupe_keys: Optional[dict] = None) -> dict:
+    return dict(
+        user_id=user_id,
+        store_name=json_data.store_name,
+        store_address=json_data.store_address,
+        store_number=json_data.store_number,
+        total=json_data.total,
+        taxes=json_data.taxes,
+        payment_method=json_data.payment_method,
+        confidence_score_ocr=json_data.confidence_score_ocr,
+        date=_receipt_date(json_data.date),
+        raw_text="\n".join(lines),
+        **(dedupe_keys or {}),
+    )
+
+async def persist_receipts(db: AsyncSession, batch: Sequence[Tuple[object, List[str]]],
+                           user_id=1, dedupe_keys: Optional[Sequence[Optional[dict]]] = None) -> List[PersistedReceipt]:
+    """Write many classified receipts and their line items in one transaction.
+
+    Uses multi-row INSERT ... RETURNING id (one statement per table per
+    1000 rows) instead of per-object ORM flushes and a read-back query.
+    ``dedupe_keys`` optionally gives each receipt's hash columns. Dated
+    receipts get an embedding outbox row in the same transaction; the
+    embedding worker writes their vectors after the commit.
+    """
+    if not batch:
+        return []
+    start = time.perf_counter()
+    try:
+        dedupe_keys = dedupe_keys or [None] * len(batch)
+        receipt_rows = [_receipt_row(json_data, lines, user_id, keys)
+                        for (json_data, lines), keys in zip(batch, dedupe_keys)]
+        receipt_ids = (await db.execute(
+            insert(Receipt).returning(Receipt.id, sort_by_parameter_order=True), receipt_rows
+        )).scalars().all()
+        item_rows = []
+        for receipt_id, (json_data, _) in zip(receipt_ids, batch):
+            for item in json_data.items:
+                item_rows.append(dict(
+                    receipt_id=receipt_id,
+                    name=item.name,
+                    quantity=item.quantity,
+                    price_per_unit=item.price_per_unit,
+                    total_price=item.total_price,
+                    confidence_score=item.confidence_score,
+                    category=item.category,
+                ))
+        item_ids = []
+        if item_rows:
+            item_ids = (await db.execute(
+                insert(LineItem).returning(LineItem.id, sort_by_parameter_order=True), item_rows
+            )).scalars().all()
+        persisted = []
+        items = iter(zip(item_ids, item_rows))
+        for receipt_id, row, (json_data, _) in zip(receipt_ids, receipt_rows, batch):
+            row = {k: v for k, v in row.items() if k in _PERSISTED_FIELDS}
+            persisted.append(PersistedReceipt(
+                id=receipt_id,
+                line_items=[PersistedLineItem(id=item_id, **item_row)
+                            for item_id, item_row in (next(items) for _ in json_data.items)],
+                **row,
+            ))
+        outbox_rows = [dict(receipt_id=r.id, user_id=r.user_id) for r in persisted if r.date is not None]
+        if outbox_rows:
+            await db.execute(insert(EmbeddingOutbox), outbox_rows)
+        await apply_rollups(db, persisted)
+        await db.commit()
+        metrics.observe("db_persist", time.perf_counter() - start, len(persisted))
+        category_memo.learn(user_id, (li for r in persisted for li in r.line_items))
+        if outbox_rows:
+            embedding_worker.notify()
+        return persisted
     except Exception as e:
-        db.rollback()
+        metrics.STAGE_ERRORS.labels("db_persist").inc()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        db.close()
+
+async def persist_receipt(db: AsyncSession, json_data, lines, user_id=1,
+                          dedupe_keys: Optional[dict] = None) -> PersistedReceipt:
+    return (await persist_receipts(db, [(json_data, lines)], user_id=user_id, dedupe_keys=[dedupe_keys]))[0]
@@ -0,0 +1,217 @@
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+from loguru import logger
+from sqlalchemy import distinct, func, select
+from sqlalchemy.orm import selectinload
+from db.models.receipt import Receipt
+from db.models.line_item import LineItem
+from api.services.embedding_service import EmbeddingService
+from api.services.model_registry import registry
+
+# Receipts per server-side cursor partition; one embed + upsert per partition.
+BATCH_SIZE = int(os.getenv("REINDEX_BATCH_SIZE", "500"))
+ENCODE_BATCH_SIZE = int(os.getenv("REINDEX_ENCODE_BATCH", "256"))
+CHECKPOINT_PATH = os.getenv("REINDEX_CHECKPOINT", "./reindex_checkpoint.json")
+MODES = ("reindex", "reconcile")
+
+def vector_ids(receipt_id: int, n_items: int) -> List[str]:
+    # Mirrors the ids written by EmbeddingService.embed_receipts.
+    return [f"r:{receipt_id}:summary"] + [f"r:{receipt_id}:item:{i}" for i in range(n_items)]
+
+def _receipts_with_vectors():
+    # Receipts without a date cannot be embedded (the metadata carries date_ts).
+    return Receipt.date.isnot(None)
+
+@dataclass
+class ReindexProgress:
+    mode: str
+    model: str
+    user_id: Optional[int] = None
+    cursor: int = 0                 # last receipt id (reindex) or last finished user id (reconcile)
+    receipts: int = 0
+    vectors: int = 0
+    missing: int = 0
+    orphaned: int = 0
+    status: str = "running"         # running -> completed | failed
+    error: Optional[str] = None
+    started_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    finished_at: Optional[str] = None
+
+    def resumes(self, other: "ReindexProgress") -> bool:
+        return (self.status != "completed" and self.mode == other.mode
+                and self.model == other.model and self.user_id == other.user_id)
+
+def load_checkpoint(path: str = CHECKPOINT_PATH) -> ReindexProgress | None:
+    try:
+        with open(path) as f:
+            return ReindexProgress(**json.load(f))
+    except FileNotFoundError:
+        return None
+
+def save_checkpoint(progress: ReindexProgress, path: str = CHECKPOINT_PATH):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(asdict(progress), f)
+    os.replace(tmp, path)
+
+def receipt_batches(db, batch_size: int = BATCH_SIZE, after_id: int = 0, user_id: int | None = None,
+                    receipt_ids: List[int] | None = None) -> Iterator[List[Receipt]]:
+    """Receipts with their line items in id order, streamed from a server-side cursor.
+
+    Each yielded partition is expunged before the next is fetched, so memory
+    stays at one partition however many rows the table has.
+    """
+    stmt = (select(Receipt).options(selectinload(Receipt.line_items))
+            .where(Receipt.id > after_id, _receipts_with_vectors()).order_by(Receipt.id))
+    if user_id is not None:
+        stmt = stmt.where(Receipt.user_id == user_id)
+    if receipt_ids is not None:
+        stmt = stmt.where(Receipt.id.in_(receipt_ids))
+    for partition in db.execute(stmt.execution_options(yield_per=batch_size)).scalars().partitions():
+        yield partition
+        db.expunge_all()
+
+class Reindexer:
+    """Rebuilds or repairs the vector partitions from Postgres.
+
+    ``reindex`` re-embeds every receipt in id order and checkpoints the last
+    id after each batch, so an interrupted run resumes where it stopped (a
+    changed EMBED_MODEL starts over). ``reconcile`` walks users one at a
+    time, compares the ids Postgres implies with the ids in the user's
+    partition, embeds what is missing and deletes orphans; memory is bounded
+    by the largest single user.
+    """
+    def __init__(self, session_factory: Callable, embedder: EmbeddingService | None = None,
+                 checkpoint_path: str = CHECKPOINT_PATH, batch_size: int = BATCH_SIZE,
+                 encode_batch_size: int = ENCODE_BATCH_SIZE):
+        self.session_factory = session_factory
+        self.embedder = embedder or EmbeddingService()
+        self.checkpoint_path = checkpoint_path
+        self.batch_size = batch_size
+        self.encode_batch_size = encode_batch_size
+
+    def _start(self, mode: str, user_id: int | None, resume: bool) -> ReindexProgress:
+        progress = ReindexProgress(mode=mode, model=registry.embed_model_name, user_id=user_id)
+        previous = load_checkpoint(self.checkpoint_path) if resume else None
+        if previous is not None and previous.resumes(progress):
+            logger.info(f"Resuming {mode} after {previous.cursor}")
+            previous.status, previous.error = "running", None
+            return previous
+        return progress
+
+    def _embed(self, receipts: List[Receipt], progress: ReindexProgress):
+        self.embedder.embed_receipts(receipts, batch_size=self.encode_batch_size)
+        progress.receipts += len(receipts)
+        progress.vectors += sum(1 + len(r.line_items) for r in receipts)
+
+    def run(self, mode: str = "reindex", user_id: int | None = None, resume: bool = True,
+            on_progress: Callable[[ReindexProgress], None] | None = None) -> ReindexProgress:
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode!r}, expected one of {MODES}")
+        progress = self._start(mode, user_id, resume)
+        report = on_progress or (lambda p: None)
+        db = self.session_factory()
+        try:
+            steps = self._reindex(db, progress) if mode == "reindex" else self._reconcile(db, progress)
+            for _ in steps:
+                save_checkpoint(progress, self.checkpoint_path)
+                report(progress)
+            progress.status = "completed"
+        except Exception as e:
+            progress.status, progress.error = "failed", str(e)
+            logger.error(f"{mode} failed after {progress.cursor}: {e}")
+            raise
+        finally:
+            progress.finished_at = datetime.utcnow().isoformat()
+            save_checkpoint(progress, self.checkpoint_path)
+            report(progress)
+            db.close()
+        return progress
+
+    def _reindex(self, db, progress: ReindexProgress):
+        for receipts in receipt_batches(db, self.batch_size, progress.cursor, progress.user_id):
+            self._embed(receipts, progress)
+            progress.cursor = receipts[-1].id
+            yield
+
+    def _expected_ids(self, db, user_id: int) -> Iterator[tuple]:
+        stmt = (select(Receipt.id, func.count(LineItem.id))
+                .outerjoin(LineItem, LineItem.receipt_id == Receipt.id)
+                .where(Receipt.user_id == user_id, _receipts_with_vectors())
+                .group_by(Receipt.id).order_by(Receipt.id))
+        yield from db.execute(stmt.execution_options(yield_per=self.batch_size * 10))
+
+    def _reconcile(self, db, progress: ReindexProgress):
+        store = self.embedder.store
+        users = select(distinct(Receipt.user_id)).where(Receipt.user_id > progress.cursor).order_by(Receipt.user_id)
+        if progress.user_id is not None:
+            users = users.where(Receipt.user_id == progress.user_id)
+        for user_id in db.execute(users).scalars().all():
+            manifest = store.manifest(user_id)
+            stale = manifest is not None and manifest.get("model") not in (None, progress.model)
+            present = set() if stale else set(store.ids(user_id))
+            missing: List[int] = []
+            for receipt_id, n_items in self._expected_ids(db, user_id):
+                ids = vector_ids(receipt_id, n_items)
+                if not all(i in present for i in ids):
+                    missing.append(receipt_id)
+                present.difference_update(ids)
+            # Whatever is left has no receipt (or item) behind it any more.
+            if present:
+                store.delete(user_id, sorted(present))
+                progress.orphaned += len(present)
+            progress.missing += len(missing)
+            for i in range(0, len(missing), self.batch_size):
+                for receipts in receipt_batches(db, self.batch_size, user_id=user_id,
+                                                receipt_ids=missing[i:i + self.batch_size]):
+                    self._embed(receipts, progress)
+            if manifest is None and missing:
+                store.drop_legacy(user_id)
+            logger.info(f"Reconciled user {user_id}: {len(missing)} receipts re-embedded, {len(present)} orphans removed")
+            progress.cursor = user_id
+            yield
+
+class ReindexJob:
+    """One re-index/reconcile run at a time, in a background thread of the API process."""
+    def __init__(self, session_factory: Callable | None = None):
+        self.session_factory = session_factory
+        self.progress: ReindexProgress | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, mode: str, user_id: int | None = None, resume: bool = True) -> bool:
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode!r}, expected one of {MODES}")
+        with self._lock:
+            if self.running:
+                return False
+            self.progress = None
+            self._thread = threading.Thread(target=self._run, args=(mode, user_id, resume), name="reindex", daemon=True)
+            self._thread.start()
+            return True
+
+    def _run(self, mode: str, user_id: int | None, resume: bool):
+        if self.session_factory is None:
+            from db.setup import SessionLocal
+            self.session_factory = SessionLocal
+        try:
+            Reindexer(self.session_factory).run(mode, user_id, resume, on_progress=self._report)
+        except Exception:
+            pass    # logged by Reindexer and recorded in the progress
+
+    def _report(self, progress: ReindexProgress):
+        self.progress = ReindexProgress(**asdict(progress))
+
+    def status(self) -> Dict:
+        progress = self.progress or load_checkpoint()
+        return {"running": self.running, "progress": asdict(progress) if progress else None}
+
+reindex_job = ReindexJob()
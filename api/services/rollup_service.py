@@ -0,0 +1,110 @@
+from collections import defaultdict
+from datetime import date
+from typing import Iterable, List, Tuple
+from sqlalchemy import delete, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from db.models.spend_rollup import MonthlyCategorySpend, MonthlyStoreSpend
+
+def month_start(d: date) -> date:
+    return d.replace(day=1)
+
+def rollup_rows(receipts: Iterable) -> Tuple[List[dict], List[dict]]:
+    """Aggregate receipts into category and store rollup deltas, one row per key."""
+    categories = defaultdict(lambda: [0.0, 0])
+    stores = defaultdict(lambda: [0.0, 0])
+    for receipt in receipts:
+        if receipt.user_id is None or receipt.date is None:
+            continue
+        month = month_start(receipt.date)
+        store = stores[(receipt.user_id, month, receipt.store_name or "")]
+        store[0] += receipt.total or 0.0
+        store[1] += 1
+        for li in receipt.line_items:
+            cat = categories[(receipt.user_id, month, li.category or "other")]
+            cat[0] += li.total_price or 0.0
+            cat[1] += 1
+    # Sorted keys give concurrent uploads a consistent lock order.
+    category_rows = [dict(user_id=u, month=m, category=c, total=t, item_count=n)
+                     for (u, m, c), (t, n) in sorted(categories.items())]
+    store_rows = [dict(user_id=u, month=m, store_name=s, total=t, receipt_count=n)
+                  for (u, m, s), (t, n) in sorted(stores.items())]
+    return category_rows, store_rows
+
+def upsert_statements(category_rows: List[dict], store_rows: List[dict]) -> list:
+    stmts = []
+    if category_rows:
+        stmt = pg_insert(MonthlyCategorySpend).values(category_rows)
+        stmts.append(stmt.on_conflict_do_update(
+            index_elements=["user_id", "month", "category"],
+            set_={"total": MonthlyCategorySpend.total + stmt.excluded.total,
+                  "item_count": MonthlyCategorySpend.item_count + stmt.excluded.item_count},
+        ))
+    if store_rows:
+        stmt = pg_insert(MonthlyStoreSpend).values(store_rows)
+        stmts.append(stmt.on_conflict_do_update(
+            index_elements=["user_id", "month", "store_name"],
+            set_={"total": MonthlyStoreSpend.total + stmt.excluded.total,
+                  "receipt_count": MonthlyStoreSpend.receipt_count + stmt.excluded.receipt_count},
+        ))
+    return stmts
+
+async def apply_rollups(db, receipts: Iterable):
+    # Runs inside the caller's transaction, so rollups commit or roll back with the receipts.
+    for stmt in upsert_statements(*rollup_rows(receipts)):
+        await db.execute(stmt)
+
+REBUILD_CATEGORY_SQL = """
+    INSERT INTO monthly_category_spend (user_id, month, category, total, item_count)
+    SELECT r.user_id, date_trunc('month', r.date)::date, COALESCE(li.category, 'other'),
+           COALESCE(SUM(li.total_price), 0), COUNT(li.id)
+    FROM line_items li JOIN receipts r ON r.id = li.receipt_id
+    WHERE r.user_id IS NOT NULL AND r.date IS NOT NULL {user_filter}
+    GROUP BY 1, 2, 3
+"""
+REBUILD_STORE_SQL = """
+    INSERT INTO monthly_store_spend (user_id, month, store_name, total, receipt_count)
+    SELECT r.user_id, date_trunc('month', r.date)::date, COALESCE(r.store_name, ''),
+           COALESCE(SUM(r.total), 0), COUNT(r.id)
+    FROM receipts r
+    WHERE r.user_id IS NOT NULL AND r.date IS NOT NULL {user_filter}
+    GROUP BY 1, 2, 3
+"""
+
+def rebuild_statements(user_id: int | None = None) -> list:
+    user_filter = "AND r.user_id = :user_id" if user_id is not None else ""
+    params = {"user_id": user_id} if user_id is not None else {}
+    deletes = [delete(MonthlyCategorySpend), delete(MonthlyStoreSpend)]
+    if user_id is not None:
+        deletes = [delete(MonthlyCategorySpend).where(MonthlyCategorySpend.user_id == user_id),
+                   delete(MonthlyStoreSpend).where(MonthlyStoreSpend.user_id == user_id)]
+    inserts = [text(REBUILD_CATEGORY_SQL.format(user_filter=user_filter)).bindparams(**params),
+               text(REBUILD_STORE_SQL.format(user_filter=user_filter)).bindparams(**params)]
+    return deletes + inserts
+
+def rebuild_rollups(db, user_id: int | None = None):
+    for stmt in rebuild_statements(user_id):
+        db.execute(stmt)
+    db.commit()
+
+def summary_statements(user_id: int, start: date | None = None, end: date | None = None):
+    category = select(MonthlyCategorySpend).where(MonthlyCategorySpend.user_id == user_id)
+    store = select(MonthlyStoreSpend).where(MonthlyStoreSpend.user_id == user_id)
+    if start:
+        category = category.where(MonthlyCategorySpend.month >= month_start(start))
+        store = store.where(MonthlyStoreSpend.month >= month_start(start))
+    if end:
+        category = category.where(MonthlyCategorySpend.month <= end)
+        store = store.where(MonthlyStoreSpend.month <= end)
+    return (category.order_by(MonthlyCategorySpend.month, MonthlyCategorySpend.total.desc()),
+            store.order_by(MonthlyStoreSpend.month, MonthlyStoreSpend.total.desc()))
+
+async def monthly_summary(db, user_id: int, start: date | None = None, end: date | None = None) -> dict:
+    category_stmt, store_stmt = summary_statements(user_id, start, end)
+    months = {}
+    for row in (await db.execute(category_stmt)).scalars():
+        m = months.setdefault(row.month, {"month": row.month, "categories": [], "stores": []})
+        m["categories"].append({"category": row.category, "total": row.total, "items": row.item_count})
+    for row in (await db.execute(store_stmt)).scalars():
+        m = months.setdefault(row.month, {"month": row.month, "categories": [], "stores": []})
+        m["stores"].append({"store_name": row.store_name, "total": row.total, "receipts": row.receipt_count})
+    return {"user_id": user_id, "months": [months[k] for k in sorted(months)]}
@@ -0,0 +1,112 @@
+import json
+import os
+from fastapi import HTTPException, Request, UploadFile
+from fastapi.routing import APIRoute
+from starlette.formparsers import MultiPartException, MultiPartParser
+from starlette.requests import parse_options_header
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(15 * 1024 * 1024)))
+MAX_BATCH_UPLOAD_BYTES = int(os.getenv("MAX_BATCH_UPLOAD_BYTES", str(500 * 1024 * 1024)))
+# Room for multipart boundaries and part headers on top of the file itself.
+MULTIPART_OVERHEAD = 64 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+class _InMemoryMultiPartParser(MultiPartParser):
+    # Keep single-receipt uploads in memory instead of spooling anything over
+    # 1 MB to a temp file (the attribute was renamed across Starlette releases).
+    spool_max_size = max_file_size = MAX_UPLOAD_BYTES
+
+class _InMemoryUploadRequest(Request):
+    async def _get_form(self, **kwargs):
+        content_type, _ = parse_options_header(self.headers.get("Content-Type"))
+        if self._form is None and content_type == b"multipart/form-data":
+            try:
+                self._form = await _InMemoryMultiPartParser(self.headers, self.stream(), **kwargs).parse()
+            except MultiPartException as exc:
+                raise HTTPException(status_code=400, detail=exc.message)
+        return await super()._get_form(**kwargs)
+
+class InMemoryUploadRoute(APIRoute):
+    """Route class for upload endpoints: their multipart files stay in memory.
+
+    Only the routes that use it get the larger spool size; the parser
+    everywhere else in the process keeps Starlette's default.
+    """
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        async def in_memory_handler(request: Request):
+            return await handler(_InMemoryUploadRequest(request.scope, request.receive))
+        return in_memory_handler
+
+class _BodyTooLarge(HTTPException):
+    # An HTTPException so FastAPI's body parsing re-raises it as a 413 rather
+    # than wrapping it in "There was an error parsing the body".
+    def __init__(self, limit: int):
+        super().__init__(status_code=413, detail=f"Upload exceeds the {limit} byte limit")
+
+class UploadSizeLimit:
+    """ASGI middleware that caps request bodies per path prefix.
+
+    Requests that declare a Content-Length over the limit are answered with
+    413 before any of the body is read. Chunked bodies are counted as they
+    stream and cut off once they pass the limit.
+    """
+    def __init__(self, app, limits: dict[str, int] | None = None):
+        self.app = app
+        self.limits = limits or {
+            "/upload/batch": MAX_BATCH_UPLOAD_BYTES,
+            "/upload/receipt": MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD,
+        }
+
+    def _limit_for(self, path: str) -> int | None:
+        for prefix, limit in self.limits.items():
+            if path.startswith(prefix):
+                return limit
+        return None
+
+    async def _reject(self, send, limit: int):
+        body = json.dumps({"detail": f"Upload exceeds the {limit} byte limit"}).encode()
+        await send({"type": "http.response.start", "status": 413,
+                    "headers": [(b"content-type", b"application/json"),
+                                (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        limit = self._limit_for(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            return await self._reject(send, limit)
+
+        received = 0
+        started = False
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise _BodyTooLarge(limit)
+            return message
+        async def tracking_send(message):
+            nonlocal started
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except _BodyTooLarge:
+            if not started:
+                await self._reject(send, limit)
+
+async def read_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    """Read an upload in chunks, failing with 413 as soon as it passes ``max_bytes``."""
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"{file.filename} exceeds the {max_bytes} byte limit")
+    chunks, size = [], 0
+    while chunk := await file.read(CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"{file.filename} exceeds the {max_bytes} byte limit")
+        chunks.append(chunk)
+    return b"".join(chunks)
@@ -0,0 +1,472 @@
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Sequence, Tuple
+import numpy as np
+from loguru import logger
+
+# Partitions up to this many vectors are searched exactly from a memory-mapped matrix;
+# bigger ones are promoted to their own Chroma (HNSW) collection.
+MATRIX_MAX_ROWS = int(os.getenv("VECTOR_MATRIX_MAX_ROWS", "20000"))
+# Storage type of matrix partitions: float32, float16, or int8 with one scale per vector.
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "float32")
+# Keep a float32 copy on disk (read only for the shortlisted rows) to re-rank quantized scores exactly.
+VECTOR_RERANK = os.getenv("VECTOR_RERANK", "1") == "1"
+RERANK_FACTOR = int(os.getenv("VECTOR_RERANK_FACTOR", "4"))
+SCAN_BLOCK = 2048
+CHROMA_BATCH = 5000
+DTYPES = ("float32", "float16", "int8")
+LEGACY_COLLECTION = "receipts"
+# Raw .bin row files plus a JSON-lines rows file, both append-only within a generation.
+APPEND_LAYOUT = 2
+
+DateRange = Tuple[float, float]     # inclusive (lo, hi) on metadata["date_ts"]
+
+def partition_name(user_id: int) -> str:
+    return f"receipts_u{user_id}"
+
+@dataclass
+class VectorHit:
+    id: str
+    document: str
+    metadata: dict
+    score: float            # cosine similarity
+
+@dataclass
+class _Matrix:
+    generation: int
+    vectors: np.ndarray             # (n, dim) unit rows in the stored dtype, memory-mapped
+    scales: np.ndarray | None       # (n,) float32 for int8 codes
+    full: np.ndarray | None         # (n, dim) float32 re-rank copy, memory-mapped
+    ids: List[str]
+    documents: List[str]
+    metadatas: List[dict]
+    date_ts: np.ndarray
+    rows_bytes: int = 0             # length of the rows file these rows were read from
+
+    def exact(self) -> np.ndarray:
+        if self.full is not None:
+            return np.asarray(self.full)
+        return dequantize(self.vectors, self.scales)
+
+def _unit_rows(embeddings) -> np.ndarray:
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, np.ndarray | None]:
+    """Encode float32 rows as (codes, per-row scales); scales is None unless int8."""
+    if dtype == "float32":
+        return vectors.astype(np.float32), None
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    raise ValueError(f"Unknown vector dtype {dtype!r}, expected one of {DTYPES}")
+
+def dequantize(codes: np.ndarray, scales: np.ndarray | None) -> np.ndarray:
+    vectors = np.asarray(codes, dtype=np.float32)
+    return vectors * scales[:, None] if scales is not None else vectors
+
+def _write_atomic(path: str, write: Callable):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+def _append_at(path: str, offset: int, data: bytes):
+    # Bytes past ``offset`` are a torn append from a writer that died before
+    # publishing its manifest; readers never looked at them, so overwrite them.
+    with open(path, "r+b") as f:
+        f.truncate(offset)
+        f.seek(offset)
+        f.write(data)
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+class VectorStore:
+    """Per-user vector partitions with two interchangeable backends.
+
+    Each user gets a directory under ``root`` whose manifest.json names the
+    backend. Small partitions ("matrix") are one contiguous float32 matrix
+    searched exactly with a single mat-vec, optionally stored as float16 or
+    int8 and re-ranked against a float32 copy on disk. New rows are appended
+    to the current generation's files and published by bumping the count in
+    the manifest, so adding a receipt costs its own rows, not the partition.
+    Replacing or deleting rows compacts into a new generation and then swaps
+    the manifest, keeping the generation it replaced; either way readers in
+    any worker process see a complete prefix of rows (a reader that still
+    loses its files re-reads the manifest once). Once a partition outgrows
+    ``matrix_max_rows`` it moves to its own Chroma collection, so no query
+    ever filters a shared index by user. Users without a partition yet are
+    read from the old shared ``receipts`` collection; their first write
+    copies those rows into the new partition.
+    """
+    def __init__(self, root: str | None = None, collection: Callable[[str], object] | None = None,
+                 matrix_max_rows: int | None = None, dtype: str | None = None, rerank: bool | None = None):
+        self.root = root or os.getenv("VECTOR_INDEX_DIR", "./vector_index")
+        self.matrix_max_rows = MATRIX_MAX_ROWS if matrix_max_rows is None else matrix_max_rows
+        self.dtype = dtype or VECTOR_DTYPE
+        if self.dtype not in DTYPES:
+            raise ValueError(f"Unknown vector dtype {self.dtype!r}, expected one of {DTYPES}")
+        # float32 codes are already exact; a second copy would only cost disk.
+        self.rerank = (VECTOR_RERANK if rerank is None else rerank) and self.dtype != "float32"
+        self._collection = collection
+        self._cache: Dict[int, _Matrix] = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def collection(self, name: str):
+        if self._collection is None:
+            from api.services.model_registry import registry
+            self._collection = registry.collection
+        return self._collection(name)
+
+    def _dir(self, user_id: int) -> str:
+        return os.path.join(self.root, f"u{user_id}")
+
+    def manifest(self, user_id: int) -> dict | None:
+        try:
+            with open(os.path.join(self._dir(user_id), "manifest.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def backend(self, user_id: int) -> str:
+        manifest = self.manifest(user_id)
+        return manifest["backend"] if manifest else "legacy"
+
+    def count(self, user_id: int) -> int:
+        manifest = self.manifest(user_id)
+        return manifest["count"] if manifest else 0
+
+    @contextmanager
+    def _writer(self, user_id: int):
+        # flock so upload and batch workers in other processes do not lose each other's rows.
+        path = self._dir(user_id)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield path
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _matrix(self, user_id: int, manifest: dict) -> _Matrix:
+        cached = self._cache.get(user_id)
+        gen, count = manifest["generation"], manifest["count"]
+        if cached is not None and cached.generation == gen and len(cached.ids) == count:
+            return cached
+        path = self._dir(user_id)
+        if manifest.get("layout") != APPEND_LAYOUT:
+            matrix = self._load_npy(path, manifest)
+        else:
+            # Rows appended since this generation was cached are read from the cached offset on.
+            base = cached if cached is not None and cached.generation == gen and len(cached.ids) < count else None
+            offset = base.rows_bytes if base else 0
+            with open(os.path.join(path, f"rows-{gen}.jsonl"), "rb") as f:
+                f.seek(offset)
+                rows = [json.loads(line) for line in f.read(manifest["rows_bytes"] - offset).splitlines()]
+            dim = manifest["dim"]
+            def load(kind, dtype, shape, required):
+                file = os.path.join(path, f"{kind}-{gen}.bin")
+                if not required and not os.path.exists(file):
+                    return None
+                if not count:
+                    open(file).close()
+                    return np.empty(shape, dtype=dtype)
+                return np.memmap(file, dtype=dtype, mode="r", shape=shape)
+            scales = load("scales", np.float32, (count,), manifest["dtype"] == "int8")
+            date_ts = np.array([r["metadata"].get("date_ts", np.nan) for r in rows], dtype=np.float64)
+            matrix = _Matrix(
+                gen, load("vectors", manifest["dtype"], (count, dim), True),
+                None if scales is None else np.asarray(scales),
+                load("full", np.float32, (count, dim), manifest.get("rerank", False)),
+                (base.ids if base else []) + [r["id"] for r in rows],
+                (base.documents if base else []) + [r["document"] for r in rows],
+                (base.metadatas if base else []) + [r["metadata"] for r in rows],
+                np.concatenate([base.date_ts, date_ts]) if base else date_ts,
+                manifest["rows_bytes"],
+            )
+        with self._lock:
+            self._cache[user_id] = matrix
+        return matrix
+
+    @staticmethod
+    def _load_npy(path: str, manifest: dict) -> _Matrix:
+        # Partitions written before the append layout; their next write converts them.
+        gen = manifest["generation"]
+        with open(os.path.join(path, f"rows-{gen}.json")) as f:
+            rows = json.load(f)
+        def load(kind, required):
+            file = os.path.join(path, f"{kind}-{gen}.npy")
+            return np.load(file, mmap_mode="r") if required or os.path.exists(file) else None
+        date_ts = np.array([m.get("date_ts", np.nan) for m in rows["metadatas"]], dtype=np.float64)
+        scales = load("scales", manifest.get("dtype") == "int8")
+        return _Matrix(gen, load("vectors", True), None if scales is None else np.asarray(scales), load("full", False),
+                       rows["ids"], rows["documents"], rows["metadatas"], date_ts)
+
+    def _encode(self, vectors: np.ndarray) -> Dict[str, np.ndarray]:
+        codes, scales = quantize(vectors, self.dtype)
+        arrays = {"vectors": codes, "scales": scales, "full": vectors if self.rerank else None}
+        return {kind: np.ascontiguousarray(array) for kind, array in arrays.items() if array is not None}
+
+    @staticmethod
+    def _rows_blob(ids, documents, metadatas) -> bytes:
+        return b"".join(json.dumps({"id": i, "document": d, "metadata": m}).encode() + b"\n"
+                        for i, d, m in zip(ids, documents, metadatas))
+
+    def _write_matrix(self, path: str, vectors: np.ndarray, ids, documents, metadatas, model: str | None) -> int:
+        # Generations are timestamps, so they never repeat after a partition is reset.
+        gen = time.time_ns()
+        for kind, array in self._encode(vectors).items():
+            _write_atomic(os.path.join(path, f"{kind}-{gen}.bin"), lambda f: f.write(array.tobytes()))
+        rows = self._rows_blob(ids, documents, metadatas)
+        _write_atomic(os.path.join(path, f"rows-{gen}.jsonl"), lambda f: f.write(rows))
+        self._write_manifest(path, {"backend": "matrix", "layout": APPEND_LAYOUT, "generation": gen,
+                                     "count": len(ids), "dim": vectors.shape[1], "dtype": self.dtype,
+                                     "rerank": self.rerank, "rows_bytes": len(rows), "model": model})
+        return gen
+
+    def _can_append(self, manifest: dict, old: _Matrix, ids: Sequence[str]) -> bool:
+        return (manifest.get("layout") == APPEND_LAYOUT and manifest["dtype"] == self.dtype
+                and manifest.get("rerank") == self.rerank and not set(ids).intersection(old.ids))
+
+    def _append_matrix(self, path: str, manifest: dict, vectors: np.ndarray, ids, documents, metadatas):
+        """Add rows to the current generation's files; the manifest's count makes them visible."""
+        gen, count = manifest["generation"], manifest["count"]
+        for kind, array in self._encode(vectors).items():
+            _append_at(os.path.join(path, f"{kind}-{gen}.bin"), count * (array.nbytes // len(array)), array.tobytes())
+        rows = self._rows_blob(ids, documents, metadatas)
+        _append_at(os.path.join(path, f"rows-{gen}.jsonl"), manifest["rows_bytes"], rows)
+        self._write_manifest(path, {**manifest, "count": count + len(ids),
+                                     "rows_bytes": manifest["rows_bytes"] + len(rows)})
+
+    @staticmethod
+    def _write_manifest(path: str, manifest: dict):
+        _write_atomic(os.path.join(path, "manifest.json"), lambda f: f.write(json.dumps(manifest).encode()))
+
+    @staticmethod
+    def _drop_generations(path: str, keep: Sequence[int] = ()):
+        # Readers holding an old memmap keep working after the unlink. The caller keeps the
+        # generation it replaced too, for readers that read the old manifest but have not
+        # opened its files yet; readers that lose even that race retry (see _read).
+        keep = {str(gen) for gen in keep}
+        for name in os.listdir(path):
+            if name.startswith(("vectors-", "scales-", "full-", "rows-")) and name.split("-")[1].split(".")[0] not in keep:
+                os.remove(os.path.join(path, name))
+
+    @staticmethod
+    def _generations(manifest: dict | None, *gens: int) -> Tuple[int, ...]:
+        previous = (manifest["generation"],) if manifest and manifest["backend"] == "matrix" else ()
+        return (*gens, *previous)
+
+    def _read(self, user_id: int, read: Callable[[dict | None], object]):
+        """Run ``read`` on the current manifest, re-reading it once if its files were dropped meanwhile."""
+        try:
+            return read(self.manifest(user_id))
+        except FileNotFoundError:
+            return read(self.manifest(user_id))
+
+    def _reset_if_stale(self, user_id: int, path: str, manifest: dict | None, model: str | None) -> dict | None:
+        # Vectors from another embedding model are not comparable (or even the same width); start over.
+        if manifest is None or model is None or manifest.get("model") in (None, model):
+            return manifest
+        logger.info(f"Discarding {manifest['count']} vectors of user {user_id} from model {manifest['model']}")
+        if manifest["backend"] == "chroma":
+            self._chroma_delete(self.collection(partition_name(user_id)), self.ids(user_id))
+        os.remove(os.path.join(path, "manifest.json"))
+        self._drop_generations(path)
+        return None
+
+    def upsert(self, user_id: int, ids: List[str], embeddings: Sequence, metadatas: List[dict], documents: List[str],
+               model: str | None = None):
+        if not ids:
+            return
+        with self._writer(user_id) as path:
+            manifest = self.manifest(user_id)
+            if manifest is None:
+                # First write for a user still served from the shared collection: bring their
+                # rows along, or the new partition would hide everything indexed before it.
+                ids, embeddings, metadatas, documents = self._with_legacy_rows(
+                    user_id, ids, embeddings, metadatas, documents)
+            manifest = self._reset_if_stale(user_id, path, manifest, model)
+            model = model or (manifest or {}).get("model")
+            if (manifest and manifest["backend"] == "chroma") or (manifest is None and len(ids) > self.matrix_max_rows):
+                self._chroma_upsert(user_id, path, ids, embeddings, metadatas, documents, model)
+                return
+            if manifest:
+                old = self._matrix(user_id, manifest)
+                if self._can_append(manifest, old, ids) and manifest["count"] + len(ids) <= self.matrix_max_rows:
+                    self._append_matrix(path, manifest, _unit_rows(embeddings), ids, documents, metadatas)
+                    return
+                # Replacing rows, a VECTOR_DTYPE change or an old layout: compact into a new generation.
+                replaced = set(ids)
+                keep = [i for i, rid in enumerate(old.ids) if rid not in replaced]
+                vectors = np.vstack([old.exact()[keep], _unit_rows(embeddings)])
+                all_ids = [old.ids[i] for i in keep] + list(ids)
+                all_docs = [old.documents[i] for i in keep] + list(documents)
+                all_metas = [old.metadatas[i] for i in keep] + list(metadatas)
+            else:
+                vectors, all_ids, all_docs, all_metas = _unit_rows(embeddings), list(ids), list(documents), list(metadatas)
+            if len(all_ids) > self.matrix_max_rows:
+                logger.info(f"Promoting vectors of user {user_id} to Chroma ({len(all_ids)} rows)")
+                self._chroma_upsert(user_id, path, all_ids, vectors.tolist(), all_metas, all_docs, model)
+                self._drop_generations(path)
+                return
+            gen = self._write_matrix(path, vectors, all_ids, all_docs, all_metas, model)
+            self._drop_generations(path, keep=self._generations(manifest, gen))
+
+    def delete(self, user_id: int, ids: Sequence[str]):
+        if not ids:
+            return
+        with self._writer(user_id) as path:
+            manifest = self.manifest(user_id)
+            if manifest is None:
+                # Otherwise the rows would come back when the partition is first written.
+                self._chroma_delete(self.collection(LEGACY_COLLECTION), ids)
+                return
+            if manifest["backend"] == "chroma":
+                collection = self.collection(partition_name(user_id))
+                self._chroma_delete(collection, ids)
+                self._write_manifest(path, {**manifest, "count": collection.count()})
+                return
+            old = self._matrix(user_id, manifest)
+            removed = set(ids)
+            keep = [i for i, rid in enumerate(old.ids) if rid not in removed]
+            if len(keep) == len(old.ids):
+                return
+            gen = self._write_matrix(path, old.exact()[keep], [old.ids[i] for i in keep],
+                                     [old.documents[i] for i in keep], [old.metadatas[i] for i in keep], manifest.get("model"))
+            self._drop_generations(path, keep=self._generations(manifest, gen))
+
+    def ids(self, user_id: int) -> List[str]:
+        """Every vector id in the user's partition (empty for users still on the shared collection)."""
+        return self._read(user_id, lambda manifest: self._ids(user_id, manifest))
+
+    def _ids(self, user_id: int, manifest: dict | None) -> List[str]:
+        if manifest is None:
+            return []
+        if manifest["backend"] == "matrix":
+            return list(self._matrix(user_id, manifest).ids)
+        collection, ids = self.collection(partition_name(user_id)), []
+        while True:
+            page = collection.get(include=[], limit=CHROMA_BATCH, offset=len(ids))["ids"]
+            ids.extend(page)
+            if len(page) < CHROMA_BATCH:
+                return ids
+
+    def legacy_rows(self, user_id: int) -> Tuple[List[str], List[List[float]], List[dict], List[str]]:
+        """The user's (ids, embeddings, metadatas, documents) in the shared collection."""
+        collection = self.collection(LEGACY_COLLECTION)
+        ids, embeddings, metadatas, documents = [], [], [], []
+        while True:
+            page = collection.get(where={"user_id": user_id}, include=["embeddings", "metadatas", "documents"],
+                                  limit=CHROMA_BATCH, offset=len(ids))
+            page_ids = list(page["ids"])
+            if page_ids:
+                ids.extend(page_ids)
+                embeddings.extend(np.asarray(page["embeddings"], dtype=np.float64).tolist())
+                metadatas.extend(page["metadatas"])
+                documents.extend(page["documents"])
+            if len(page_ids) < CHROMA_BATCH:
+                return ids, embeddings, metadatas, documents
+
+    def _with_legacy_rows(self, user_id: int, ids, embeddings, metadatas, documents):
+        old_ids, old_embeddings, old_metas, old_docs = self.legacy_rows(user_id)
+        replaced = set(ids)
+        keep = [i for i, rid in enumerate(old_ids) if rid not in replaced]
+        if not keep:
+            return ids, embeddings, metadatas, documents
+        logger.info(f"Moving {len(keep)} vectors of user {user_id} from the shared collection into their partition")
+        return ([old_ids[i] for i in keep] + list(ids),
+                [old_embeddings[i] for i in keep] + np.asarray(embeddings, dtype=np.float64).tolist(),
+                [old_metas[i] for i in keep] + list(metadatas),
+                [old_docs[i] for i in keep] + list(documents))
+
+    def drop_legacy(self, user_id: int):
+        """Remove the user's rows from the shared collection once their partition is complete."""
+        self.collection(LEGACY_COLLECTION).delete(where={"user_id": user_id})
+
+    @staticmethod
+    def _chroma_delete(collection, ids: Sequence[str]):
+        ids = list(ids)
+        for i in range(0, len(ids), CHROMA_BATCH):
+            collection.delete(ids=ids[i:i + CHROMA_BATCH])
+
+    def _chroma_upsert(self, user_id: int, path: str, ids, embeddings, metadatas, documents, model: str | None = None):
+        collection = self.collection(partition_name(user_id))
+        for i in range(0, len(ids), CHROMA_BATCH):
+            collection.upsert(
+                ids=ids[i:i + CHROMA_BATCH],
+                embeddings=embeddings[i:i + CHROMA_BATCH],
+                metadatas=metadatas[i:i + CHROMA_BATCH],
+                documents=documents[i:i + CHROMA_BATCH],
+            )
+        self._write_manifest(path, {"backend": "chroma", "count": collection.count(), "model": model})
+
+    def query(self, user_id: int, embedding: Sequence[float], top_k: int = 10,
+              date_range: DateRange | None = None) -> List[VectorHit]:
+        return self._read(user_id, lambda manifest: self._query(user_id, manifest, embedding, top_k, date_range))
+
+    def _query(self, user_id: int, manifest: dict | None, embedding, top_k: int,
+               date_range: DateRange | None) -> List[VectorHit]:
+        if manifest is None:
+            return self._chroma_query(self.collection(LEGACY_COLLECTION), embedding, top_k, date_range, user_id)
+        if manifest["backend"] == "chroma":
+            return self._chroma_query(self.collection(partition_name(user_id)), embedding, top_k, date_range)
+        return self._matrix_query(self._matrix(user_id, manifest), embedding, top_k, date_range)
+
+    @staticmethod
+    def _matrix_query(matrix: _Matrix, embedding, top_k: int, date_range: DateRange | None) -> List[VectorHit]:
+        if not matrix.ids:
+            return []
+        query = _unit_rows([embedding])[0]
+        if matrix.vectors.dtype == np.float32:
+            scores = matrix.vectors @ query
+        else:
+            # Decode block by block so a scan never materialises the whole partition as float32.
+            scores = np.empty(len(matrix.ids), dtype=np.float32)
+            for i in range(0, len(scores), SCAN_BLOCK):
+                scores[i:i + SCAN_BLOCK] = np.asarray(matrix.vectors[i:i + SCAN_BLOCK], dtype=np.float32) @ query
+            if matrix.scales is not None:
+                scores *= matrix.scales
+        if date_range is not None:
+            lo, hi = date_range
+            scores = np.where((matrix.date_ts >= lo) & (matrix.date_ts <= hi), scores, -np.inf)
+        shortlist = top_k * RERANK_FACTOR if matrix.full is not None else top_k
+        top = _top(scores, shortlist)
+        top = top[np.isfinite(scores[top])]
+        if matrix.full is not None and len(top):
+            # Exact float32 scores for the shortlist only; just these rows are paged in.
+            order = np.sort(top)
+            exact = np.asarray(matrix.full[order]) @ query
+            scores = np.full(len(scores), -np.inf, dtype=np.float32)
+            scores[order] = exact
+            top = _top(scores, top_k)
+        return [VectorHit(matrix.ids[i], matrix.documents[i], matrix.metadatas[i], float(scores[i]))
+                for i in top if np.isfinite(scores[i])]
+
+    @staticmethod
+    def _chroma_query(collection, embedding, top_k: int, date_range: DateRange | None,
+                      user_id: int | None = None) -> List[VectorHit]:
+        filters = [{"user_id": user_id}] if user_id is not None else []
+        if date_range is not None:
+            filters.append({"date_ts": {"$gte": date_range[0]}})
+            filters.append({"date_ts": {"$lte": date_range[1]}})
+        where = {"$and": filters} if len(filters) > 1 else (filters[0] if filters else None)
+        results = collection.query(query_embeddings=[list(embedding)], n_results=top_k, where=where)
+        docs = results.get("documents", [[]])[0]
+        ids = (results.get("ids") or [[None] * len(docs)])[0]
+        metas = (results.get("metadatas") or [None])[0] or [{}] * len(docs)
+        # Chroma's default space is squared L2; for unit vectors that is 2 - 2cos.
+        dists = (results.get("distances") or [None])[0] or [0.0] * len(docs)
+        return [VectorHit(i, d, m or {}, 1.0 - dist / 2) for i, d, m, dist in zip(ids, docs, metas, dists)]
@@ -0,0 +1,48 @@
+import argparse
+from sqlalchemy import select, update, bindparam
+from db.setup import SessionLocal
+from db.models.receipt import Receipt
+from api.services.dedupe_service import text_fingerprint
+
+def backfill(db, batch_size: int, recompute: bool = False) -> int:
+    # Image hashes need the original upload, which is not stored; only the text tier can be backfilled.
+    updated, last_id = 0, 0
+    pending = [] if recompute else [Receipt.text_fingerprint.is_(None)]
+    while True:
+        rows = db.execute(
+            select(Receipt.id, Receipt.raw_text)
+            .where(Receipt.id > last_id, Receipt.raw_text.isnot(None), *pending)
+            .order_by(Receipt.id).limit(batch_size)
+        ).all()
+        if not rows:
+            return updated
+        last_id = rows[-1].id
+        fingerprints = [(r.id, text_fingerprint(r.raw_text.splitlines())) for r in rows]
+        # A recompute also clears fingerprints the current scheme no longer trusts.
+        params = [{"rid": rid, "fp": fp} for rid, fp in fingerprints if fp or recompute]
+        if params:
+            db.connection().execute(
+                update(Receipt.__table__).where(Receipt.__table__.c.id == bindparam("rid"))
+                .values(text_fingerprint=bindparam("fp")), params,
+            )
+        db.commit()
+        updated += len(params)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute text fingerprints for receipts stored before dedupe existed.")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--recompute", action="store_true",
+                        help="re-fingerprint every receipt, e.g. after the fingerprint format changed")
+    args = parser.parse_args()
+    db = SessionLocal()
+    try:
+        print(f"Fingerprinted {backfill(db, args.batch_size, args.recompute)} receipts.")
+    except Exception as e:
+        db.rollback()
+        print(f"Failed to backfill fingerprints: {e}")
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""add monthly spend rollups
+
+Revision ID: 3f2a9c1d7b64
+Revises:
+Create Date: 2026-10-18 20:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3f2a9c1d7b64"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "monthly_category_spend",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("month", sa.Date(), nullable=False),
+        sa.Column("category", sa.String(), nullable=False),
+        sa.Column("total", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("item_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("user_id", "month", "category"),
+    )
+    op.create_table(
+        "monthly_store_spend",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("month", sa.Date(), nullable=False),
+        sa.Column("store_name", sa.String(), nullable=False),
+        sa.Column("total", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("receipt_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("user_id", "month", "store_name"),
+    )
+    # Backfill from existing receipts so the rollups start out consistent.
+    op.execute("""
+        INSERT INTO monthly_category_spend (user_id, month, category, total, item_count)
+        SELECT r.user_id, date_trunc('month', r.date)::date, COALESCE(li.category, 'other'),
+               COALESCE(SUM(li.total_price), 0), COUNT(li.id)
+        FROM line_items li JOIN receipts r ON r.id = li.receipt_id
+        WHERE r.user_id IS NOT NULL AND r.date IS NOT NULL
+        GROUP BY 1, 2, 3
+    """)
+    op.execute("""
+        INSERT INTO monthly_store_spend (user_id, month, store_name, total, receipt_count)
+        SELECT r.user_id, date_trunc('month', r.date)::date, COALESCE(r.store_name, ''),
+               COALESCE(SUM(r.total), 0), COUNT(r.id)
+        FROM receipts r
+        WHERE r.user_id IS NOT NULL AND r.date IS NOT NULL
+        GROUP BY 1, 2, 3
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table("monthly_store_spend")
+    op.drop_table("monthly_category_spend")
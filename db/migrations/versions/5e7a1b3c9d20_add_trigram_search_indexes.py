@@ -0,0 +1,39 @@
+"""add trigram search indexes
+
+Revision ID: 5e7a1b3c9d20
+Revises: c4d9e2f1a3b8
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5e7a1b3c9d20"
+down_revision: Union[str, None] = "c4d9e2f1a3b8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # GIN indexes are maintained by Postgres on every insert, so new receipts are searchable at commit.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_line_items_name_trgm", "line_items", ["name"],
+            postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"},
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            "ix_receipts_store_name_trgm", "receipts", ["store_name"],
+            postgresql_using="gin", postgresql_ops={"store_name": "gin_trgm_ops"},
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_receipts_store_name_trgm", table_name="receipts", postgresql_concurrently=True)
+        op.drop_index("ix_line_items_name_trgm", table_name="line_items", postgresql_concurrently=True)
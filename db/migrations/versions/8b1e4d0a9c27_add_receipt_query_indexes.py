@@ -0,0 +1,43 @@
+"""add receipt query indexes
+
+Revision ID: 8b1e4d0a9c27
+Revises: 3f2a9c1d7b64
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8b1e4d0a9c27"
+down_revision: Union[str, None] = "3f2a9c1d7b64"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps receipts writable while the indexes build on large tables.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_receipts_user_id_date_id", "receipts",
+            ["user_id", sa.text("date DESC NULLS LAST"), sa.text("id DESC")],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            "ix_receipts_user_id_store_name", "receipts", ["user_id", "store_name"],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            "ix_line_items_receipt_id_category", "line_items", ["receipt_id", "category"],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_line_items_receipt_id_category", table_name="line_items", postgresql_concurrently=True)
+        op.drop_index("ix_receipts_user_id_store_name", table_name="receipts", postgresql_concurrently=True)
+        op.drop_index("ix_receipts_user_id_date_id", table_name="receipts", postgresql_concurrently=True)
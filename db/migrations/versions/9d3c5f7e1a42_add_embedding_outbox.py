@@ -0,0 +1,43 @@
+"""add embedding outbox
+
+Revision ID: 9d3c5f7e1a42
+Revises: 5e7a1b3c9d20
+Create Date: 2026-10-19 00:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9d3c5f7e1a42"
+down_revision: Union[str, None] = "5e7a1b3c9d20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "embedding_outbox",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("receipt_id", sa.Integer(), sa.ForeignKey("receipts.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column("available_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("failed_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    # New table, so no CONCURRENTLY needed.
+    op.create_index(
+        "ix_embedding_outbox_available_at_id", "embedding_outbox", ["available_at", "id"],
+        postgresql_where=sa.text("failed_at IS NULL"),
+    )
+    # Receipts stored before the outbox are picked up by `python -m db.reindex_vectors --mode reconcile`.
+
+
+def downgrade() -> None:
+    op.drop_index("ix_embedding_outbox_available_at_id", table_name="embedding_outbox")
+    op.drop_table("embedding_outbox")
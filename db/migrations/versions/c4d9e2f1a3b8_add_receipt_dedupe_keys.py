@@ -0,0 +1,49 @@
+"""add receipt dedupe keys
+
+Revision ID: c4d9e2f1a3b8
+Revises: 8b1e4d0a9c27
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c4d9e2f1a3b8"
+down_revision: Union[str, None] = "8b1e4d0a9c27"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Nullable columns without defaults are a catalog-only change in Postgres.
+    op.add_column("receipts", sa.Column("content_sha256", sa.String(length=64), nullable=True))
+    op.add_column("receipts", sa.Column("image_phash", sa.BigInteger(), nullable=True))
+    op.add_column("receipts", sa.Column("text_fingerprint", sa.String(length=64), nullable=True))
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_receipts_user_id_content_sha256", "receipts", ["user_id", "content_sha256"],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            "ix_receipts_user_id_text_fingerprint", "receipts", ["user_id", "text_fingerprint"],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            "ix_receipts_user_id_phash", "receipts", ["user_id", sa.text("id DESC")],
+            postgresql_include=["image_phash"], postgresql_where=sa.text("image_phash IS NOT NULL"),
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_receipts_user_id_phash", table_name="receipts", postgresql_concurrently=True)
+        op.drop_index("ix_receipts_user_id_text_fingerprint", table_name="receipts", postgresql_concurrently=True)
+        op.drop_index("ix_receipts_user_id_content_sha256", table_name="receipts", postgresql_concurrently=True)
+    op.drop_column("receipts", "text_fingerprint")
+    op.drop_column("receipts", "image_phash")
+    op.drop_column("receipts", "content_sha256")
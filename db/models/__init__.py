@@ -2,4 +2,6 @@ from sqlalchemy.orm import declarative_base
 Base = declarative_base()
 from db.models.user import User
 from db.models.receipt import Receipt
-from db.models.line_item import LineItem
\ No newline at end of file
+from db.models.line_item import LineItem
+from db.models.spend_rollup import MonthlyCategorySpend, MonthlyStoreSpend
+from db.models.embedding_outbox import EmbeddingOutbox
\ No newline at end of file
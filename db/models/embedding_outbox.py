@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, BigInteger, Text, DateTime, ForeignKey, Index, func
+from db.models import Base
+class EmbeddingOutbox(Base):
+    """One row per receipt whose vectors still have to be written; deleted once embedded."""
+    __tablename__ = "embedding_outbox"
+    id = Column(BigInteger, primary_key=True)
+    receipt_id = Column(Integer, ForeignKey("receipts.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    available_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    attempts = Column(Integer, nullable=False, server_default="0")
+    last_error = Column(Text)
+    failed_at = Column(DateTime(timezone=True))
+Index("ix_embedding_outbox_available_at_id", EmbeddingOutbox.available_at, EmbeddingOutbox.id,
+      postgresql_where=EmbeddingOutbox.failed_at.is_(None))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from db.models import Base
 class LineItem(Base):
@@ -11,4 +11,7 @@ class LineItem(Base):
     total_price = Column(Float)
     confidence_score = Column(Integer)
     category = Column(String)
-    receipt = relationship("Receipt", back_populates="line_items")
\ No newline at end of file
+    receipt = relationship("Receipt", back_populates="line_items")
+Index("ix_line_items_receipt_id_category", LineItem.receipt_id, LineItem.category)
+Index("ix_line_items_name_trgm", LineItem.name,
+      postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"})
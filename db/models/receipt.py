@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Date, Text, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Date, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from db.models import Base
 class Receipt(Base):
@@ -14,5 +14,17 @@ class Receipt(Base):
     payment_method = Column(String)
     confidence_score_ocr = Column(Integer)
     raw_text = Column(Text)
+    content_sha256 = Column(String(64))
+    image_phash = Column(BigInteger)
+    text_fingerprint = Column(String(64))
     user = relationship("User", back_populates="receipts")
-    line_items = relationship("LineItem", back_populates="receipt", cascade="all, delete")
\ No newline at end of file
+    # Ordered so vector ids (r:<id>:item:<n>) are stable between ingest and re-index.
+    line_items = relationship("LineItem", back_populates="receipt", cascade="all, delete", order_by="LineItem.id")
+Index("ix_receipts_user_id_date_id", Receipt.user_id, Receipt.date.desc().nulls_last(), Receipt.id.desc())
+Index("ix_receipts_user_id_store_name", Receipt.user_id, Receipt.store_name)
+Index("ix_receipts_user_id_content_sha256", Receipt.user_id, Receipt.content_sha256)
+Index("ix_receipts_user_id_text_fingerprint", Receipt.user_id, Receipt.text_fingerprint)
+Index("ix_receipts_user_id_phash", Receipt.user_id, Receipt.id.desc(),
+      postgresql_include=["image_phash"], postgresql_where=Receipt.image_phash.isnot(None))
+Index("ix_receipts_store_name_trgm", Receipt.store_name,
+      postgresql_using="gin", postgresql_ops={"store_name": "gin_trgm_ops"})
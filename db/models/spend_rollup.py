@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey
+from db.models import Base
+class MonthlyCategorySpend(Base):
+    __tablename__ = "monthly_category_spend"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    month = Column(Date, primary_key=True)
+    category = Column(String, primary_key=True)
+    total = Column(Float, nullable=False, default=0.0)
+    item_count = Column(Integer, nullable=False, default=0)
+
+class MonthlyStoreSpend(Base):
+    __tablename__ = "monthly_store_spend"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    month = Column(Date, primary_key=True)
+    store_name = Column(String, primary_key=True)
+    total = Column(Float, nullable=False, default=0.0)
+    receipt_count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,22 @@
+import argparse
+from db.setup import SessionLocal
+from api.services.rollup_service import rebuild_rollups
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute monthly spend rollups from receipts and line items.")
+    parser.add_argument("--user-id", type=int, default=None, help="only rebuild this user's rollups")
+    args = parser.parse_args()
+    db = SessionLocal()
+    try:
+        rebuild_rollups(db, args.user_id)
+        scope = f"user {args.user_id}" if args.user_id is not None else "all users"
+        print(f"Rebuilt monthly spend rollups for {scope}.")
+    except Exception as e:
+        db.rollback()
+        print(f"Failed to rebuild rollups: {e}")
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import argparse
+from db.setup import SessionLocal
+from api.services.reindex_service import BATCH_SIZE, ENCODE_BATCH_SIZE, MODES, Reindexer
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed receipts into the vector store, or repair missing/orphaned vectors.")
+    parser.add_argument("--mode", choices=MODES, default="reconcile")
+    parser.add_argument("--user-id", type=int, default=None, help="only this user's receipts")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="receipts per cursor batch")
+    parser.add_argument("--encode-batch-size", type=int, default=ENCODE_BATCH_SIZE)
+    parser.add_argument("--no-resume", action="store_true", help="ignore the checkpoint and start from the beginning")
+    args = parser.parse_args()
+    reindexer = Reindexer(SessionLocal, batch_size=args.batch_size, encode_batch_size=args.encode_batch_size)
+    progress = reindexer.run(
+        args.mode, args.user_id, resume=not args.no_resume,
+        on_progress=lambda p: print(f"\r{p.receipts} receipts, {p.vectors} vectors, {p.missing} missing, "
+                                    f"{p.orphaned} orphaned (cursor {p.cursor})", end="", flush=True),
+    )
+    print(f"\n{args.mode} {progress.status} for model {progress.model}.")
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,17 @@
+import os
+import shutil
 from chromadb import PersistentClient
 from chromadb.config import Settings
 
 client = PersistentClient(path="./chroma_db")
-try:
-    client.delete_collection("receipts")
-    print("Dropped 'receipts' collection.")
-except Exception:
-    pass
+for collection in client.list_collections():
+    name = getattr(collection, "name", collection)
+    if name == "receipts" or name.startswith("receipts_u"):
+        client.delete_collection(name)
+        print(f"Dropped '{name}' collection.")
 client.get_or_create_collection(name="receipts")
-print("Created fresh 'receipts' collection.")
\ No newline at end of file
+print("Created fresh 'receipts' collection.")
+
+vector_index = os.getenv("VECTOR_INDEX_DIR", "./vector_index")
+shutil.rmtree(vector_index, ignore_errors=True)
+print(f"Removed per-user vector partitions in {vector_index}.")
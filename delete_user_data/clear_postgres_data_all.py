@@ -6,11 +6,12 @@ from db.models.user import User
 def clear_all_data():
     db = SessionLocal()
     try:
+        db.execute(text("TRUNCATE TABLE monthly_category_spend, monthly_store_spend;"))
         db.execute(text("TRUNCATE TABLE line_items RESTART IDENTITY CASCADE;"))
         db.execute(text("TRUNCATE TABLE receipts RESTART IDENTITY CASCADE;"))
         db.execute(text("TRUNCATE TABLE users RESTART IDENTITY CASCADE;"))
         db.commit()
-        print("All PostgreSQL tables (users, receipts, line_items) have been cleared.")
+        print("All PostgreSQL tables (users, receipts, line_items, spend rollups) have been cleared.")
     except Exception as e:
         db.rollback()
         print(f"Failed to clear tables: {e}")
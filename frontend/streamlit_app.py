@@ -1,6 +1,7 @@
 import streamlit as st
 import requests
 import os
+import json
 from datetime import date
 from dotenv import load_dotenv
 
@@ -47,25 +48,42 @@ if page == "Chat":
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        # Call RAG/question pipeline
+        # Call RAG/question pipeline; tokens render as the API streams them
         try:
             with st.chat_message("assistant"):
-                with st.spinner("Thinking..."):
-                    response = requests.post(
-                        f"{API_BASE_URL}/rag/Question",
+                sources = []
+                def answer_tokens():
+                    with requests.post(
+                        f"{API_BASE_URL}/rag/Question/stream",
                         json={
                             "question": prompt,
                             "user_id": user_id,
                             "start_date": start_date.isoformat(),
                             "end_date": end_date.isoformat()
                         },
-                        timeout=30
-                    )
-                    response.raise_for_status()
-                    answer = response.json().get("answer", "No response from API")
-                    st.markdown(answer)
-                    st.session_state.messages.append({"role": "assistant", "content": answer})
-        except requests.exceptions.RequestException as e:
+                        stream=True,
+                        timeout=(5, 60)  # connect, and max wait between streamed chunks
+                    ) as response:
+                        response.raise_for_status()
+                        event = None
+                        for line in response.iter_lines(decode_unicode=True):
+                            if line.startswith("event: "):
+                                event = line[len("event: "):]
+                            elif line.startswith("data: "):
+                                data = json.loads(line[len("data: "):])
+                                if event == "sources":
+                                    sources.extend(data["source_chunks"])
+                                elif event == "token":
+                                    yield data["text"]
+                                elif event == "error":
+                                    raise RuntimeError(data["detail"])
+                answer = st.write_stream(answer_tokens())
+                if sources:
+                    with st.expander("Sources"):
+                        for chunk in sources:
+                            st.caption(chunk)
+                st.session_state.messages.append({"role": "assistant", "content": answer})
+        except (requests.exceptions.RequestException, RuntimeError) as e:
             st.error(f"API Error: {str(e)}")
 
 # Upload Receipts Interface
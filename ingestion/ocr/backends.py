@@ -0,0 +1,162 @@
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple
+import cv2
+import numpy as np
+from loguru import logger
+from ingestion.ocr.preprocess import ImageSource
+
+@dataclass
+class OCRResult:
+    engine: str
+    lines: List[str]
+    confidences: List[float]
+    elapsed: float                       # seconds spent in the engine
+    attempts: List[str] = field(default_factory=list)
+
+    @property
+    def mean_confidence(self) -> float:
+        return sum(self.confidences) / len(self.confidences) if self.confidences else 0.0
+
+class OCRBackend:
+    """Turns an image (path, encoded bytes or array) into reading-order lines
+    with a 0-1 confidence per line.
+
+    Engines are imported on first use so a worker only loads the models it runs.
+    """
+    name = ""
+
+    def warm_up(self):
+        pass
+
+    def _extract(self, image: ImageSource) -> List[Tuple[str, float]]:
+        raise NotImplementedError
+
+    def recognize(self, image: ImageSource) -> OCRResult:
+        t0 = time.perf_counter()
+        pairs = self._extract(image)
+        return OCRResult(
+            engine=self.name,
+            lines=[text for text, _ in pairs],
+            confidences=[conf for _, conf in pairs],
+            elapsed=time.perf_counter() - t0,
+            attempts=[self.name],
+        )
+
+class EasyOCRBackend(OCRBackend):
+    name = "easyocr"
+
+    def warm_up(self):
+        from ingestion.ocr.easyocr_wrapper import get_reader
+        get_reader()
+
+    def _extract(self, image):
+        from ingestion.ocr.easyocr_wrapper import extract_lines_with_confidence
+        return extract_lines_with_confidence(image)
+
+class TesseractBackend(OCRBackend):
+    name = "tesseract"
+
+    def warm_up(self):
+        import ingestion.ocr.tesseract_wrapper
+
+    def _extract(self, image):
+        from ingestion.ocr.tesseract_wrapper import extract_text_blocks_with_confidence
+        return extract_text_blocks_with_confidence(image)
+
+class DocTRBackend(OCRBackend):
+    name = "doctr"
+
+    def __init__(self):
+        self._predictor = None
+
+    def warm_up(self):
+        if self._predictor is None:
+            from doctr.models import ocr_predictor
+            self._predictor = ocr_predictor(pretrained=True)
+
+    def _extract(self, image):
+        self.warm_up()
+        if isinstance(image, np.ndarray):
+            pages = [cv2.cvtColor(image, cv2.COLOR_BGR2RGB if image.ndim == 3 else cv2.COLOR_GRAY2RGB)]
+        else:
+            from doctr.io import DocumentFile
+            pages = DocumentFile.from_images(bytes(image) if isinstance(image, (bytearray, memoryview)) else image)
+        doc = self._predictor(pages)
+        pairs = []
+        for page in doc.pages:
+            for block in page.blocks:
+                for line in block.lines:
+                    words = [w for w in line.words if w.value.strip()]
+                    if words:
+                        pairs.append((" ".join(w.value for w in words),
+                                      sum(w.confidence for w in words) / len(words)))
+        return pairs
+
+BACKENDS: Dict[str, Callable[[], OCRBackend]] = {
+    "easyocr": EasyOCRBackend,
+    "tesseract": TesseractBackend,
+    "doctr": DocTRBackend,
+}
+
+class CascadeBackend(OCRBackend):
+    """Runs the cheap engine first and escalates only when its output looks unreliable.
+
+    A result is accepted when its mean line confidence reaches ``min_confidence``
+    and it has at least ``min_lines`` lines; otherwise the next engine runs and
+    the most confident result seen so far is returned.
+    """
+    name = "cascade"
+
+    def __init__(self, engines: List[OCRBackend], min_confidence: float = 0.6, min_lines: int = 3):
+        if not engines:
+            raise ValueError("CascadeBackend needs at least one engine")
+        self.engines = engines
+        self.min_confidence = min_confidence
+        self.min_lines = min_lines
+
+    def warm_up(self):
+        for engine in self.engines:
+            engine.warm_up()
+
+    def accepts(self, result: OCRResult) -> bool:
+        return result.mean_confidence >= self.min_confidence and len(result.lines) >= self.min_lines
+
+    def recognize(self, image: ImageSource) -> OCRResult:
+        best, attempts, elapsed = None, [], 0.0
+        for engine in self.engines:
+            result = engine.recognize(image)
+            attempts.append(engine.name)
+            elapsed += result.elapsed
+            if best is None or result.mean_confidence > best.mean_confidence:
+                best = result
+            if self.accepts(result):
+                break
+            logger.debug(f"OCR {engine.name} confidence {result.mean_confidence:.2f} "
+                         f"over {len(result.lines)} lines, escalating")
+        best.attempts, best.elapsed = attempts, elapsed
+        return best
+
+ENGINE_CHOICES = (*BACKENDS, "cascade")
+
+def build_backend(name: str | None = None) -> OCRBackend:
+    """Build the engine named by ``name`` or OCR_ENGINE.
+
+    ``cascade`` chains the engines in OCR_CASCADE (default "tesseract,easyocr")
+    and escalates below OCR_MIN_CONFIDENCE (default 0.6).
+    """
+    name = name or os.getenv("OCR_ENGINE", "easyocr")
+    if name == "cascade":
+        order = [e.strip() for e in os.getenv("OCR_CASCADE", "tesseract,easyocr").split(",") if e.strip()]
+        unknown = [e for e in order if e not in BACKENDS]
+        if unknown:
+            raise ValueError(f"Unknown OCR engines in OCR_CASCADE: {unknown}, expected {list(BACKENDS)}")
+        return CascadeBackend(
+            [BACKENDS[e]() for e in order],
+            min_confidence=float(os.getenv("OCR_MIN_CONFIDENCE", "0.6")),
+            min_lines=int(os.getenv("OCR_MIN_LINES", "3")),
+        )
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown OCR engine {name!r}, expected one of {ENGINE_CHOICES}")
+    return BACKENDS[name]()
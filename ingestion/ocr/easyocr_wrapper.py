@@ -1,13 +1,27 @@
-import easyocr
+import threading
 import numpy as np
 import cv2
 from typing import List, Tuple
+from ingestion.ocr.preprocess import ImageSource, PreprocessConfig, load_image, preprocess
 
-READER = easyocr.Reader(
-    ["de", "en"], gpu=False, verbose=False
-)
+_reader = None
+_reader_lock = threading.Lock()
 
-def sort_by_reading_order(results) -> List[Tuple[str, List[int]]]:
+def get_reader():
+    """The process-wide EasyOCR reader, built on first use.
+
+    Importing easyocr pulls in torch and building the reader loads both
+    detection and recognition weights, so neither happens at import time.
+    """
+    global _reader
+    with _reader_lock:
+        if _reader is None:
+            import easyocr
+            _reader = easyocr.Reader(["de", "en"], gpu=False, verbose=False)
+        return _reader
+
+def group_lines(results) -> List[Tuple[str, float]]:
+    """Merge EasyOCR word boxes into reading-order lines with their mean confidence."""
     sorted_res = sorted(
         results,
         key=lambda r: (
@@ -17,25 +31,29 @@ def sort_by_reading_order(results) -> List[Tuple[str, List[int]]]:
     )
     lines = []
     current_y = -1
-    buf = []
+    buf, confs = [], []
     for bbox, text, conf in sorted_res:
         if conf < 0.3 or not text.strip():
             continue
         y_top = min(p[1] for p in bbox)
         if current_y != -1 and y_top - current_y > 15:  
-            lines.append(" ".join(buf))
-            buf = []
+            lines.append((" ".join(buf), sum(confs) / len(confs)))
+            buf, confs = [], []
         buf.append(text.strip())
+        confs.append(float(conf))
         current_y = y_top
     if buf:
-        lines.append(" ".join(buf))
+        lines.append((" ".join(buf), sum(confs) / len(confs)))
     return lines
 
-def extract_lines(img_path: str) -> List[str]:
-    img = cv2.imread(img_path)
-    if img is None:
-        raise FileNotFoundError(img_path)
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    results = READER.readtext(gray, detail=1, paragraph=False)
-    return sort_by_reading_order(results)
+def sort_by_reading_order(results) -> List[str]:
+    return [text for text, _ in group_lines(results)]
+
+def extract_lines_with_confidence(image: ImageSource, config: PreprocessConfig | None = None) -> List[Tuple[str, float]]:
+    gray = preprocess(load_image(image), config)
+    results = get_reader().readtext(gray, detail=1, paragraph=False)
+    return group_lines(results)
 
+def extract_lines(image: ImageSource, config: PreprocessConfig | None = None) -> List[str]:
+    """OCR a path, encoded image bytes or a decoded array into reading-order lines."""
+    return [text for text, _ in extract_lines_with_confidence(image, config)]
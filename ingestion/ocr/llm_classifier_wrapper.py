@@ -2,20 +2,22 @@ import os
 from typing import List, Optional, Literal
 from pydantic import ValidationError, BaseModel, Field, conint, confloat
 from fastapi import HTTPException
-from openai import OpenAI
+from api.services.llm_client import get_llm_client
 
 #Define required JSON schema
+Category = Literal["frozen/prepared food essential", "frozen/prepared food indulgence","savory snacks",  "desserts", "pantry staples",
+                   "other pantry indulgence","beverages","alcohol","household cleaning supplies","laundry","toiletries essentials",
+                   "toiletries indulgence","cosmetics and skin/hair/body care essentials","cosmetics and skin/hair/body care indulgence",
+                   "over-the-counter medicine", "vitamins and supplements","dining/restaurants","transportation","utilities/housing",
+                   "education/professional", "entertainment","travel and accommodation","gifts and donation","subscription and membership",
+                   "other"]
+
 class LineItem(BaseModel):
     name: str
     quantity: Optional[conint(ge=0)] = None
     price_per_unit: Optional[confloat(ge=0.0)] = None
     total_price: Optional[confloat(ge=0.0)]    = None
-    category: Literal["frozen/prepared food essential", "frozen/prepared food indulgence","savory snacks",  "desserts", "pantry staples",
-                       "other pantry indulgence","beverages","alcohol","household cleaning supplies","laundry","toiletries essentials",
-                       "toiletries indulgence","cosmetics and skin/hair/body care essentials","cosmetics and skin/hair/body care indulgence",
-                       "over-the-counter medicine", "vitamins and supplements","dining/restaurants","transportation","utilities/housing",
-                       "education/professional", "entertainment","travel and accommodation","gifts and donation","subscription and membership",
-                       "other"]
+    category: Category
     confidence_score: int
 
 class ReceiptSummary(BaseModel):
@@ -35,12 +37,8 @@ class ReceiptSummary(BaseModel):
     confidence_score_ocr: int
 
 #OCR lines to json conversion with classification of receipts and confidence scores
-def classify_receipt(lines: List[str]) -> ReceiptSummary:
+async def classify_receipt(lines: List[str]) -> ReceiptSummary:
     receipt_lines = "\n".join(lines)
-    client = OpenAI(
-        base_url = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1"),
-        api_key  = os.getenv("GROQ_API_KEY"),
-    )
     SYSTEM_PROMPT = (
         "You are a helpful information extractor. You read receipt_lines extracted from OCR "
         "and output a single JSON object that matches the ReceiptSummary schema exactly."
@@ -52,7 +50,7 @@ def classify_receipt(lines: List[str]) -> ReceiptSummary:
         "of OCR extracted input. Remeber to give the date as DD-MM-YYYY format."
     )
     try:
-        response = client.beta.chat.completions.parse(
+        response = await get_llm_client().parse(
             model="moonshotai/kimi-k2-instruct",
             messages=[
                 {"role": "system", "content": SYSTEM_PROMPT},
@@ -63,3 +61,30 @@ def classify_receipt(lines: List[str]) -> ReceiptSummary:
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"LLM request failed: {e}")
     return response.choices[0].message.parsed
+
+class ItemCategory(BaseModel):
+    name: str
+    category: Category
+    confidence_score: int
+
+class ItemCategories(BaseModel):
+    items: List[ItemCategory]
+
+#Category-only call for receipts the local parser already read; item names in, categories out
+async def categorize_items(names: List[str]) -> List[ItemCategory]:
+    SYSTEM_PROMPT = (
+        "Assign each grocery receipt item name (one per line) a category from the schema. "
+        "Keep names exactly as given. Give a confidence_score out of 100 per item."
+    )
+    try:
+        response = await get_llm_client().parse(
+            model="moonshotai/kimi-k2-instruct",
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user",   "content": "\n".join(names)},
+            ],
+            response_format=ItemCategories,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"LLM request failed: {e}")
+    return response.choices[0].message.parsed.items
@@ -0,0 +1,184 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import List
+from loguru import logger
+
+from ingestion.ocr.backends import ENGINE_CHOICES, OCRBackend, build_backend
+from ingestion.ocr.preprocess import ImageSource, load_image
+from api.services import metrics
+
+OCR_ENGINES = ENGINE_CHOICES
+
+# Set once per worker process by _init_worker; the engine modules build their
+# models on first use, so each worker pays the load cost exactly once.
+_BACKEND: OCRBackend | None = None
+
+def _init_worker(engine: str):
+    global _BACKEND
+    _BACKEND = build_backend(engine)
+    _BACKEND.warm_up()
+
+@dataclass
+class OCROutput:
+    lines: List[str]
+    decode_seconds: float
+    ocr_seconds: float
+
+def _run_ocr(image: ImageSource) -> OCROutput:
+    # Timings travel back with the result; metrics live in the API process, not the workers.
+    t0 = time.perf_counter()
+    img = load_image(image)
+    decode_seconds = time.perf_counter() - t0
+    result = _BACKEND.recognize(img)
+    logger.debug(f"OCR {result.engine} via {'>'.join(result.attempts)}: {len(result.lines)} lines, "
+                 f"confidence {result.mean_confidence:.2f}, {result.elapsed:.2f}s")
+    return OCROutput(result.lines, decode_seconds, result.elapsed)
+
+def _record(inner: Future, outer: Future):
+    if inner.cancelled():
+        outer.cancel()
+        return
+    exc = inner.exception()
+    if exc is not None:
+        metrics.STAGE_ERRORS.labels("ocr").inc()
+        outer.set_exception(exc)
+        return
+    out = inner.result()
+    metrics.observe("image_decode", out.decode_seconds)
+    metrics.observe("ocr", out.ocr_seconds, len(out.lines))
+    outer.set_result(out.lines)
+
+def _ping() -> int:
+    return os.getpid()
+
+class OCRQueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("OCR queue is full")
+        self.retry_after = retry_after
+
+class OCRPool:
+    """Runs OCR in dedicated worker processes, off the event loop and the API's GIL.
+
+    At most ``workers + max_queue`` images are admitted at once; further
+    submissions are rejected with OCRQueueFull (or block, for batch callers).
+    """
+    def __init__(self, workers: int | None = None, max_queue: int | None = None,
+                 engine: str | None = None, retry_after: int | None = None):
+        self.workers = workers or int(os.getenv("OCR_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("OCR_MAX_QUEUE", self.workers * 4))
+        self.engine = engine or os.getenv("OCR_ENGINE", "easyocr")
+        if self.engine not in OCR_ENGINES:
+            raise ValueError(f"Unknown OCR engine {self.engine!r}, expected one of {OCR_ENGINES}")
+        self.retry_after = retry_after or int(os.getenv("OCR_RETRY_AFTER", "5"))
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._executor: ProcessPoolExecutor | None = None
+        self.state = "idle"
+        self.error: str | None = None
+        self.load_seconds: float | None = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                ctx = multiprocessing.get_context(os.getenv("OCR_START_METHOD", "spawn"))
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=ctx,
+                    initializer=_init_worker, initargs=(self.engine,),
+                )
+                logger.info(f"Started OCR pool: {self.workers} {self.engine} workers, queue {self.max_queue}")
+            return self._executor
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def warm_up(self):
+        """Spawn every worker and wait until each has loaded its model."""
+        start = time.perf_counter()
+        self.state = "loading"
+        try:
+            executor = self._get_executor()
+            pids = {f.result() for f in [executor.submit(_ping) for _ in range(self.workers * 2)]}
+        except Exception as e:
+            self.error = str(e)
+            self.state = "failed"
+            logger.error(f"OCR warm-up failed: {e}")
+            raise
+        self.load_seconds = time.perf_counter() - start
+        self.error = None
+        self.state = "ready"
+        logger.info(f"OCR workers ready in {self.load_seconds:.1f}s: {sorted(pids)}")
+
+    def start(self, mode: str = "background"):
+        # Workers load in parallel with the embedding model; uploads that arrive
+        # first simply queue for a worker.
+        if mode == "blocking":
+            self.warm_up()
+            return
+        self.state = "loading"
+        threading.Thread(target=self._warm_up_quietly, name="ocr-warm-up", daemon=True).start()
+
+    def _warm_up_quietly(self):
+        try:
+            self.warm_up()
+        except Exception:
+            pass  # recorded in state/error and reported by /ready
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "engine": self.engine,
+            "workers": self.workers,
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+        }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    @property
+    def pending(self) -> int:
+        return self._in_flight
+
+    def submit(self, image: ImageSource, block: bool = False) -> Future:
+        # Bytes are pickled to the worker over the pool's pipe, so uploads never hit disk.
+        if not self._slots.acquire(blocking=block):
+            raise OCRQueueFull(self.retry_after)
+        with self._lock:
+            self._in_flight += 1
+        try:
+            try:
+                fut = self._get_executor().submit(_run_ocr, image)
+            except BrokenProcessPool:
+                logger.warning("OCR pool broken, restarting workers")
+                self.shutdown()
+                fut = self._get_executor().submit(_run_ocr, image)
+        except Exception:
+            self._release(None)
+            raise
+        fut.add_done_callback(self._release)
+        lines = Future()
+        fut.add_done_callback(lambda f: _record(f, lines))
+        return lines
+
+    def _release(self, _fut: Future | None):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    async def extract(self, image: ImageSource) -> List[str]:
+        return await asyncio.wrap_future(self.submit(image))
+
+ocr_pool = OCRPool()
+metrics.track_queue("ocr", lambda: ocr_pool.pending)
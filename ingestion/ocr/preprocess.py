@@ -0,0 +1,106 @@
+import os
+from dataclasses import dataclass
+from typing import Optional, Union
+import cv2
+import numpy as np
+
+# A path on disk, raw encoded bytes (e.g. straight from an upload), or a decoded array.
+ImageSource = Union[str, os.PathLike, bytes, bytearray, memoryview, np.ndarray]
+
+@dataclass(frozen=True)
+class PreprocessConfig:
+    crop: bool = True
+    deskew: bool = True
+    target_text_height: Optional[int] = 28   # px; only ever downscales
+    max_side: Optional[int] = 2000           # px cap applied before text-height scaling
+    clahe: bool = False
+
+PRESETS = {
+    "off":      PreprocessConfig(crop=False, deskew=False, target_text_height=None, max_side=None),
+    "fast":     PreprocessConfig(crop=True, deskew=False, target_text_height=20, max_side=1600),
+    "balanced": PreprocessConfig(crop=True, deskew=True, target_text_height=28, max_side=2000),
+    "quality":  PreprocessConfig(crop=True, deskew=True, target_text_height=40, max_side=None, clahe=True),
+}
+
+def config_from_env() -> PreprocessConfig:
+    name = os.getenv("OCR_PREPROCESS", "balanced")
+    if name not in PRESETS:
+        raise ValueError(f"Unknown OCR_PREPROCESS preset {name!r}, expected one of {list(PRESETS)}")
+    return PRESETS[name]
+
+def load_image(src: ImageSource):
+    """Decode ``src`` into a BGR (or already-gray) array without touching disk for bytes."""
+    if isinstance(src, np.ndarray):
+        return src
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        img = cv2.imdecode(np.frombuffer(src, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError("Could not decode image bytes")
+        return img
+    img = cv2.imread(os.fspath(src))
+    if img is None:
+        raise FileNotFoundError(os.fspath(src))
+    return img
+
+def crop_receipt(img):
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    _, th = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    contours = cv2.findContours(th, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0]
+    if not contours:
+        return img
+    x, y, w, h = cv2.boundingRect(max(contours, key=cv2.contourArea))
+    # A tiny "largest contour" means the paper did not separate from the background.
+    if w * h < 0.2 * gray.shape[0] * gray.shape[1]:
+        return img
+    return img[y:y+h, x:x+w]
+
+def clahe(gray):
+    return cv2.createCLAHE(2.0, (8, 8)).apply(gray)
+
+def _resize(gray, scale: float):
+    return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+def estimate_text_height(gray) -> Optional[float]:
+    _, th = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    n, _, stats, _ = cv2.connectedComponentsWithStats(th, connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    heights = heights[(areas >= 8) & (heights >= 4) & (heights <= gray.shape[0] / 10)]
+    if len(heights) < 20:
+        return None
+    return float(np.median(heights))
+
+def deskew(gray, max_angle: float = 15.0):
+    _, th = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    coords = cv2.findNonZero(th)
+    if coords is None or len(coords) < 50:
+        return gray
+    angle = cv2.minAreaRect(coords)[-1]
+    # minAreaRect reports (0, 90] on OpenCV >= 4.5 and [-90, 0) before; fold into (-45, 45].
+    if angle > 45:
+        angle -= 90
+    elif angle <= -45:
+        angle += 90
+    if abs(angle) < 0.5 or abs(angle) > max_angle:
+        return gray
+    h, w = gray.shape
+    m = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    return cv2.warpAffine(gray, m, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+def preprocess(img, config: PreprocessConfig | None = None):
+    """Crop, downscale, deskew and optionally equalise a BGR or gray image; returns gray."""
+    config = config or config_from_env()
+    if config.crop:
+        img = crop_receipt(img)
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    if config.max_side and max(gray.shape) > config.max_side:
+        gray = _resize(gray, config.max_side / max(gray.shape))
+    if config.target_text_height:
+        text_h = estimate_text_height(gray)
+        if text_h and text_h > config.target_text_height * 1.15:
+            gray = _resize(gray, config.target_text_height / text_h)
+    if config.deskew:
+        gray = deskew(gray)
+    if config.clahe:
+        gray = clahe(gray)
+    return gray
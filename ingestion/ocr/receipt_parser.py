@@ -0,0 +1,125 @@
+import re
+from dataclasses import dataclass, field
+from datetime import date
+from typing import List, Optional
+
+AMOUNT = r"-?\d{1,5}[.,]\d{2}"
+ITEM_LINE = re.compile(rf"^(?P<name>.*?[^\W\d_].*?)\s+(?P<amount>{AMOUNT})(?:\s*(?:[A-Z]{{1,2}}|\*|€|EUR))*\s*$")
+QTY_LINE = re.compile(rf"^(?P<qty>\d{{1,3}})\s*(?:stk\.?|st\.?)?\s*[x×*]\s*(?P<ppu>{AMOUNT})", re.I)
+WEIGHT_LINE = re.compile(rf"^\d+[.,]\d{{1,3}}\s*kg\s*[x×*]\s*(?P<ppu>{AMOUNT})", re.I)
+TOTAL_LINE = re.compile(r"\b(summe|total|gesamt|gesamtbetrag|zu zahlen)\b", re.I)
+TAX_LINE = re.compile(r"\b(mwst|ust|steuer|tax|vat)\b(?![-.]?(id|nr))", re.I)
+DATE = re.compile(r"\b(\d{1,2})[./-](\d{1,2})[./-](\d{2,4})\b")
+ADDRESS = re.compile(r"(str\.|straße|strasse|weg|platz|allee|\b\d{5}\b)", re.I)
+PAYMENTS = [
+    ("credit card", re.compile(r"kredit|credit|visa|master\s?card|amex", re.I)),
+    ("debit card", re.compile(r"\bec\b|girocard|debit|maestro|v pay", re.I)),
+    ("cash", re.compile(r"\bbar\b|bargeld|cash", re.I)),
+]
+
+@dataclass
+class ParsedItem:
+    name: str
+    total_price: float
+    quantity: Optional[int] = None
+    price_per_unit: Optional[float] = None
+
+@dataclass
+class ParsedReceipt:
+    """What the rule-based parser could read off the OCR lines on its own."""
+    store_name: Optional[str] = None
+    store_address: str = ""
+    items: List[ParsedItem] = field(default_factory=list)
+    total: Optional[float] = None
+    taxes: Optional[float] = None
+    date: Optional[str] = None             # DD-MM-YYYY, like the LLM output
+    payment_method: str = "other"
+    has_negative_lines: bool = False
+
+    @property
+    def reconciles(self) -> bool:
+        # The item prices adding up to the printed total is what makes a local parse trustworthy.
+        return (bool(self.items) and self.total is not None and not self.has_negative_lines
+                and abs(sum(i.total_price for i in self.items) - self.total) < 0.015)
+
+    @property
+    def complete(self) -> bool:
+        return self.reconciles and bool(self.store_name)
+
+def _amount(text: str) -> float:
+    return float(text.replace(",", "."))
+
+def _date(text: str) -> Optional[str]:
+    for m in DATE.finditer(text):
+        d, mth, y = (int(g) for g in m.groups())
+        try:
+            day = date(y + 2000 if y < 100 else y, mth, d)
+        except ValueError:
+            continue            # 31.02 and the like are OCR misreads, not dates
+        return day.strftime("%d-%m-%Y")
+    return None
+
+def _amounts(line: str) -> List[float]:
+    return [_amount(a) for a in re.findall(AMOUNT, re.sub(r"\d+(?:[.,]\d+)?\s*%", "", line))]
+
+def parse_receipt(lines: List[str]) -> ParsedReceipt:
+    parsed = ParsedReceipt()
+    header, fragment, pending_qty = [], [], None
+    in_items, after_total = False, False
+    # Tax tables print one "rate  net  tax  gross" row per rate and sometimes a
+    # separate "MwSt <sum>" line; prefer the rows so the sum is not counted twice.
+    tax_rows, tax_line = [], None
+    for raw in lines:
+        line = raw.strip()
+        if not line:
+            continue
+        if after_total:
+            amounts = _amounts(line)
+            if "%" in line and len(amounts) >= 3:
+                tax_rows.append(amounts[-2])
+            elif TAX_LINE.search(line) and amounts:
+                tax_line = min(amounts)
+            for method, pattern in PAYMENTS:
+                if parsed.payment_method == "other" and pattern.search(line):
+                    parsed.payment_method = method
+            parsed.date = parsed.date or _date(line)
+            continue
+        if TOTAL_LINE.search(line) and re.search(AMOUNT, line):
+            parsed.total = _amount(re.findall(AMOUNT, line)[-1])
+            after_total = True
+            continue
+        qty = QTY_LINE.match(line)
+        if qty or WEIGHT_LINE.match(line):
+            ppu = _amount((qty or WEIGHT_LINE.match(line)).group("ppu"))
+            count = int(qty.group("qty")) if qty else None
+            last = parsed.items[-1] if parsed.items else None
+            if last and last.price_per_unit is None and (count is None or abs(count * ppu - last.total_price) < 0.015):
+                last.quantity, last.price_per_unit = count, ppu
+            else:
+                pending_qty = (count, ppu)
+            in_items = True
+            continue
+        item = ITEM_LINE.match(line)
+        if item and not DATE.search(item.group("name")):
+            total = _amount(item.group("amount"))
+            parsed.has_negative_lines |= total < 0
+            name = " ".join(fragment + [item.group("name").strip()])
+            new = ParsedItem(name=name, total_price=total)
+            if pending_qty and (pending_qty[0] is None or abs(pending_qty[0] * pending_qty[1] - total) < 0.015):
+                new.quantity, new.price_per_unit = pending_qty
+            parsed.items.append(new)
+            fragment, pending_qty, in_items = [], None, True
+            continue
+        if not in_items:
+            header.append(line)
+            parsed.date = parsed.date or _date(line)
+        elif re.search(r"[^\W\d_]{3,}", line) and line.upper() != "EUR":
+            fragment.append(line)   # a long item name wrapped onto its own line
+    parsed.taxes = round(sum(tax_rows), 2) if tax_rows else tax_line
+    names = [h for h in header if len(re.findall(r"[^\W\d_]", h)) >= 3]
+    parsed.store_name = names[0] if names else None
+    parsed.store_address = ", ".join(h for h in header[1:] if ADDRESS.search(h))
+    for item in parsed.items:
+        if item.quantity is None and item.price_per_unit is None:
+            item.quantity, item.price_per_unit = 1, item.total_price
+    return parsed
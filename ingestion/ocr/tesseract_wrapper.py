@@ -1,5 +1,11 @@
 import cv2, pytesseract, numpy as np
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from threading import Lock
 from PIL import Image
+from ingestion.ocr.preprocess import ImageSource, load_image, crop_receipt as _crop_receipt, clahe as _clahe
 
 LANGS = "deu+eng+chi_sim"
 CFG_MAIN  = "--oem 3 --psm 6"
@@ -8,18 +14,19 @@ CFG_SMALL = "--oem 3 --psm 11"
 def _remove_logo_band(img, band_px=70):
     return img[band_px:, :]
 
-def _crop_receipt(img):
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    _, th = cv2.threshold(gray,0,255,cv2.THRESH_BINARY+cv2.THRESH_OTSU)
-    cnt  = max(cv2.findContours(th,cv2.RETR_EXTERNAL,cv2.CHAIN_APPROX_SIMPLE)[0],key=cv2.contourArea)
-    x,y,w,h = cv2.boundingRect(cnt)
-    return img[y:y+h, x:x+w]
+# Each pass is its own tesseract subprocess, so threads are enough to overlap them.
+_PASSES = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tesseract-pass")
 
-def _clahe(gray):
-    return cv2.createCLAHE(2.0,(8,8)).apply(gray)
+# Preprocessed grayscale images keyed by (path, mtime, size); repeat OCR of the
+# same file (retries, engine cascades, backfill re-runs) skips decode + CLAHE.
+_CACHE_SIZE = int(os.getenv("TESSERACT_IMAGE_CACHE", "16"))
+_cache: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+_cache_lock = Lock()
 
-def extract_text_blocks(path: str) -> list[str]:
-    img   = cv2.imread(path)
+def _prepare(image: ImageSource):
+    img   = load_image(image)
+    if img.ndim == 2:
+        img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
     crop  = _crop_receipt(img)
     crop  = _remove_logo_band(crop)         
     gray  = _clahe(cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY))
@@ -27,25 +34,87 @@ def extract_text_blocks(path: str) -> list[str]:
     if max(h, w) < 1800:
         s = 1800/max(h, w)
         gray = cv2.resize(gray, None, fx=s, fy=s, interpolation=cv2.INTER_CUBIC)
-    data = pytesseract.image_to_data(
+    return gray, h
+
+def _prepared(image: ImageSource):
+    if not isinstance(image, (str, os.PathLike)):
+        return _prepare(image)   # in-memory images have no stable identity to cache on
+    path = os.fspath(image)
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    prepared = _prepare(image)
+    if _CACHE_SIZE > 0:
+        prepared[0].setflags(write=False)
+        with _cache_lock:
+            _cache[key] = prepared
+            while len(_cache) > _CACHE_SIZE:
+                _cache.popitem(last=False)
+    return prepared
+
+def _image_to_data(gray, config):
+    return pytesseract.image_to_data(
         Image.fromarray(gray), lang=LANGS,
-        config=CFG_MAIN, output_type=pytesseract.Output.DICT)
+        config=config, output_type=pytesseract.Output.DICT)
+
+def extract_text_blocks_with_confidence(image: ImageSource) -> list[tuple[str, float]]:
+    gray, h = _prepared(image)
     roi   = gray[int(h*0.55):]             
-    extra = pytesseract.image_to_data(
-        Image.fromarray(roi), lang=LANGS,
-        config=CFG_SMALL, output_type=pytesseract.Output.DICT)
+    main_pass  = _PASSES.submit(_image_to_data, gray, CFG_MAIN)
+    extra_pass = _PASSES.submit(_image_to_data, roi, CFG_SMALL)
+    data, extra = main_pass.result(), extra_pass.result()
     all_words  = data["text"]  + extra["text"]
+    all_confs  = data["conf"]  + extra["conf"]
     all_lines  = data["line_num"] + [ln+max(data["line_num"])+1
                                      for ln in extra["line_num"]]
     merged={}
-    for word, ln in zip(all_words, all_lines):
+    for word, conf, ln in zip(all_words, all_confs, all_lines):
         if word.strip():
-            merged.setdefault(ln, []).append(word.strip())
+            merged.setdefault(ln, []).append((word.strip(), float(conf)))
     clean=[]
-    for txt in merged.values():
-        toks=[t for t in txt
-              if (len(t) > 2 or any(c.isdigit() for c in t))
+    for words in merged.values():
+        toks=[(t, c) for t, c in words
+              if (len(t) > 2 or any(ch.isdigit() for ch in t))
               and not (t.isupper() and len(t)<=4 and t.isalpha())]
         if toks:
-            clean.append(" ".join(toks))
+            # Tesseract reports 0-100 per word; normalise to EasyOCR's 0-1.
+            conf = sum(max(c, 0.0) for _, c in toks) / len(toks) / 100
+            clean.append((" ".join(t for t, _ in toks), conf))
     return clean
+
+def extract_text_blocks(image: ImageSource) -> list[str]:
+    return [text for text, _ in extract_text_blocks_with_confidence(image)]
+
+def _init_batch_worker():
+    # Tesseract's own OpenMP threads would oversubscribe cores the pool already fills.
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+def _extract_or_error(path: str):
+    try:
+        return extract_text_blocks(path)
+    except Exception as e:
+        return e
+
+def extract_text_blocks_batch(paths: list[str], workers: int | None = None,
+                              return_exceptions: bool = False) -> list:
+    """OCR many images across a process pool; results are in input order.
+
+    Duplicate paths are recognised once. With ``return_exceptions`` a failed
+    image yields its exception instead of aborting the whole batch.
+    """
+    unique = list(dict.fromkeys(paths))
+    if not unique:
+        return []
+    workers = min(workers or os.cpu_count() or 1, len(unique))
+    ctx = multiprocessing.get_context(os.getenv("OCR_START_METHOD", "spawn"))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_batch_worker) as pool:
+        chunksize = max(1, len(unique) // (workers * 4))
+        results = dict(zip(unique, pool.map(_extract_or_error, unique, chunksize=chunksize)))
+    if not return_exceptions:
+        for res in results.values():
+            if isinstance(res, Exception):
+                raise res
+    return [results[p] for p in paths]
@@ -0,0 +1,90 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from api.services.category_memo import CategoryMemo, normalize_item_name
+from api.services import receipt_classifier
+from tests.test_receipt_parser import REWE
+
+VECTORS = {
+    "milch 1l": [1.0, 0.0, 0.0],
+    "vollmilch 1l": [0.97, 0.1, 0.0],
+    "banane chiquita": [0.0, 1.0, 0.0],
+    "kaese gouda": [0.0, 0.0, 1.0],
+}
+
+
+def _encoder(texts):
+    return [VECTORS.get(t, [0.3, 0.3, 0.3]) for t in texts]
+
+
+def _memo(rows, user_id=1):
+    memo = CategoryMemo(encoder=_encoder)
+    result = MagicMock()
+    result.all.return_value = rows
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=result)
+    asyncio.run(memo.ensure_loaded(db, user_id))
+    return memo
+
+
+def test_normalize_item_name():
+    assert normalize_item_name("  MILCH-1L. ") == "milch 1l"
+
+
+def test_exact_names_need_enough_consistent_history():
+    memo = _memo([("Milch 1L", "pantry staples", 5), ("MILCH 1L", "beverages", 1),
+                  ("Banane Chiquita", "pantry staples", 1),
+                  ("Kaese Gouda", "pantry staples", 2), ("Kaese Gouda", "savory snacks", 2)])
+    guesses = memo.lookup(1, ["MILCH 1L", "BANANE CHIQUITA", "KAESE GOUDA"])
+    assert guesses["MILCH 1L"].category == "pantry staples"
+    assert guesses["MILCH 1L"].source == "memo"
+    assert guesses["BANANE CHIQUITA"] is None     # seen once
+    assert guesses["KAESE GOUDA"] is None         # split 50/50
+
+
+def test_unseen_names_use_the_nearest_known_name():
+    memo = _memo([("Milch 1L", "pantry staples", 4)])
+    guesses = memo.lookup(1, ["VOLLMILCH 1L", "Unbekannt"])
+    assert guesses["VOLLMILCH 1L"].category == "pantry staples"
+    assert guesses["VOLLMILCH 1L"].source == "neighbour"
+    assert guesses["Unbekannt"] is None
+
+
+def test_learn_updates_a_loaded_memo():
+    memo = _memo([("Milch 1L", "pantry staples", 1)])
+    assert memo.lookup(1, ["Milch 1L"])["Milch 1L"] is None
+    memo.learn(1, [SimpleNamespace(name="milch 1l", category="pantry staples")])
+    assert memo.lookup(1, ["Milch 1L"])["Milch 1L"].category == "pantry staples"
+    memo.learn(2, [SimpleNamespace(name="x", category="other")])   # not loaded: ignored
+    assert memo.lookup(2, ["x"]) == {"x": None}
+
+
+def test_known_receipt_is_classified_without_the_llm():
+    memo = _memo([("Milch 1L", "pantry staples", 3), ("Banane Chiquita", "pantry staples", 2),
+                  ("Kaese Gouda", "pantry staples", 5)])
+    with patch.object(receipt_classifier, "category_memo", memo), \
+         patch.object(receipt_classifier, "classify_receipt", AsyncMock()) as full, \
+         patch.object(receipt_classifier, "categorize_items", AsyncMock()) as short:
+        summary = asyncio.run(receipt_classifier.classify_lines(REWE, user_id=1))
+    full.assert_not_awaited()
+    short.assert_not_awaited()
+    assert summary.total == 6.68
+    assert [i.category for i in summary.items] == ["pantry staples"] * 3
+
+
+def test_only_unknown_names_are_sent_to_the_llm():
+    memo = _memo([("Milch 1L", "pantry staples", 3), ("Kaese Gouda", "pantry staples", 5)])
+    answer = [SimpleNamespace(name="BANANE CHIQUITA", category="pantry staples", confidence_score=90)]
+    with patch.object(receipt_classifier, "category_memo", memo), \
+         patch.object(receipt_classifier, "classify_receipt", AsyncMock()) as full, \
+         patch.object(receipt_classifier, "categorize_items", AsyncMock(return_value=answer)) as short:
+        summary = asyncio.run(receipt_classifier.classify_lines(REWE, user_id=1))
+    full.assert_not_awaited()
+    short.assert_awaited_once_with(["BANANE CHIQUITA"])
+    assert summary.items[1].confidence_score == 90
+
+
+def test_unreconciled_receipt_uses_full_extraction():
+    with patch.object(receipt_classifier, "classify_receipt", AsyncMock(return_value="full")) as full:
+        assert asyncio.run(receipt_classifier.classify_lines(REWE[:6], user_id=1)) == "full"
+    full.assert_awaited_once()
@@ -0,0 +1,150 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+import cv2
+import numpy as np
+from datetime import date
+from api.services.dedupe_service import (PHASH_MAX_DISTANCE, ImageKeys, find_image_duplicate,
+                                         find_near_image_duplicate, hamming, image_keys, text_fingerprint)
+
+
+def _receipt_image(seed=0):
+    rng = np.random.default_rng(seed)
+    img = np.full((1600, 700, 3), 255, np.uint8)
+    for row in range(30):
+        width = int(rng.integers(200, 600))
+        cv2.rectangle(img, (40, 60 + row * 50), (40 + width, 80 + row * 50), (0, 0, 0), -1)
+    return img
+
+
+def _printed_receipt(items, background=(90, 110, 130), angle=0.0):
+    # Same till, same paper, same photo setup: only the printed items differ.
+    photo = np.full((2000, 1500, 3), background, np.uint8)
+    paper = np.full((1700, 800, 3), 250, np.uint8)
+    cv2.putText(paper, "REWE Markt GmbH", (60, 80), cv2.FONT_HERSHEY_SIMPLEX, 1.4, (20, 20, 20), 3)
+    for row, (name, price) in enumerate(items):
+        y = 150 + row * 60
+        cv2.putText(paper, name, (60, y), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (20, 20, 20), 2)
+        cv2.putText(paper, price, (600, y), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (20, 20, 20), 2)
+    cv2.putText(paper, "SUMME", (60, 150 + len(items) * 60 + 40), cv2.FONT_HERSHEY_SIMPLEX, 1.4, (20, 20, 20), 3)
+    photo[150:1850, 350:1150] = paper
+    if angle:
+        rotation = cv2.getRotationMatrix2D((750, 1000), angle, 1.0)
+        photo = cv2.warpAffine(photo, rotation, (1500, 2000), borderValue=background)
+    return photo
+
+
+def _items(seed):
+    rng = np.random.default_rng(seed)
+    names = ["Milch", "Bananen", "Brot", "Kaese", "Butter", "Joghurt", "Eier", "Apfel", "Tomaten", "Wasser"]
+    return [(names[int(rng.integers(len(names)))], f"{rng.integers(0, 9)},{rng.integers(10, 99)}") for _ in range(18)]
+
+
+def _encode(img, ext=".jpg", **params):
+    return cv2.imencode(ext, img, [cv2.IMWRITE_JPEG_QUALITY, params.get("quality", 95)])[1].tobytes()
+
+
+def test_phash_survives_reencoding_and_resizing():
+    img = _receipt_image()
+    a = image_keys(_encode(img))
+    b = image_keys(_encode(cv2.resize(img, None, fx=0.6, fy=0.6), quality=60))
+    assert a.content_sha256 != b.content_sha256
+    assert hamming(a.image_phash, b.image_phash) <= 6
+
+
+def test_phash_separates_different_receipts():
+    a = image_keys(_encode(_receipt_image(0)))
+    b = image_keys(_encode(_receipt_image(1)))
+    assert hamming(a.image_phash, b.image_phash) > 6
+
+
+def test_phash_separates_receipts_with_the_same_layout():
+    keys = [image_keys(_encode(_printed_receipt(_items(seed)))).image_phash for seed in range(6)]
+    assert min(hamming(a, b) for i, a in enumerate(keys) for b in keys[i + 1:]) > PHASH_MAX_DISTANCE
+
+
+def test_phash_matches_a_retaken_photo_of_the_same_receipt():
+    items = _items(0)
+    first = image_keys(_encode(_printed_receipt(items)))
+    retaken = image_keys(_encode(_printed_receipt(items, background=(40, 40, 40), angle=2.0), quality=60))
+    assert hamming(first.image_phash, retaken.image_phash) <= PHASH_MAX_DISTANCE
+
+
+def test_phash_fits_a_signed_bigint():
+    keys = image_keys(_encode(_receipt_image()))
+    assert -(1 << 63) <= keys.image_phash < (1 << 63)
+
+
+def test_text_fingerprint_ignores_word_noise():
+    first = ["REWE Markt", "Milch 1L 1,19", "Bananen 2,00", "SUMME 3,19", "02.03.2026 12:31"]
+    second = ["REWE Markf", "MiIch 1l 1.19", "Banenen 2,00", "SUMNE 3,19", "2.3.26 12:31"]
+    assert text_fingerprint(first) == text_fingerprint(second)
+    assert text_fingerprint(first) != text_fingerprint(first[:1] + ["Milch 1L 1,29"] + first[2:])
+
+
+def test_text_fingerprint_separates_same_day_purchases_at_one_price():
+    morning = ["Baeckerei Huber", "Kaffee 2,50", "Croissant 1,20", "SUMME 3,70", "02.03.2026 08:05"]
+    afternoon = morning[:-1] + ["02.03.2026 15:40"]
+    other_store = ["Cafe Mueller"] + morning[1:]
+    assert len({text_fingerprint(morning), text_fingerprint(afternoon), text_fingerprint(other_store)}) == 3
+    by_number = [morning[:-1] + ["02.03.2026", f"Bon-Nr. {n}"] for n in (1234, 1235)]
+    assert text_fingerprint(by_number[0]) != text_fingerprint(by_number[1])
+
+
+def test_text_fingerprint_needs_a_date_and_a_time_or_number():
+    assert text_fingerprint(["Kiosk", "Wasser 0,99", "SUMME 0,99"]) is None
+    lines = ["Kiosk", "Wasser 0,99", "Brezel 0,80", "SUMME 1,79"]
+    assert text_fingerprint(lines + ["12:31"]) is None
+    assert text_fingerprint(lines + ["02.03.2026"]) is None
+    assert text_fingerprint(lines + ["02.03.2026 12:31"]) is not None
+
+
+def _db(*results):
+    db = MagicMock()
+    db.execute = AsyncMock(side_effect=list(results))
+    return db
+
+
+def test_exact_hash_match_short_circuits():
+    exact = MagicMock()
+    exact.scalar_one_or_none.return_value = 42
+    db = _db(exact)
+    assert asyncio.run(find_image_duplicate(db, 1, ImageKeys("abc", 5))) == 42
+    assert db.execute.await_count == 1
+
+
+def _rows(*rows):
+    result = MagicMock()
+    result.all.return_value = [SimpleNamespace(**r) for r in rows]
+    return result
+
+
+OCR_LINES = ["REWE Markt", "Milch 1L 1,19", "Bananen 2,00", "SUMME 3,19", "02.03.2026 12:31"]
+
+
+def test_near_image_match_needs_the_ocr_total_to_agree():
+    candidates = _rows(dict(id=9, image_phash=0b1111_0000_1111), dict(id=8, image_phash=0b1111_0000_1011))
+    stored = _rows(dict(id=9, total=3.19, date=date(2026, 3, 2)), dict(id=8, total=3.19, date=date(2026, 3, 2)))
+    db = _db(candidates, stored)
+    assert asyncio.run(find_near_image_duplicate(db, 1, ImageKeys("abc", 0b1111_0000_1011), OCR_LINES)) == 8
+
+    # Same layout, same hash, but a different receipt: its total does not match, so it is not a duplicate.
+    other = _rows(dict(id=8, total=7.45, date=date(2026, 3, 2)))
+    db = _db(_rows(dict(id=8, image_phash=0b1111_0000_1011)), other)
+    assert asyncio.run(find_near_image_duplicate(db, 1, ImageKeys("abc", 0b1111_0000_1011), OCR_LINES)) is None
+
+    later = _rows(dict(id=8, total=3.19, date=date(2026, 3, 3)))
+    db = _db(_rows(dict(id=8, image_phash=0b1111_0000_1011)), later)
+    assert asyncio.run(find_near_image_duplicate(db, 1, ImageKeys("abc", 0b1111_0000_1011), OCR_LINES)) is None
+
+
+def test_far_image_hash_is_not_a_candidate():
+    db = _db(_rows(dict(id=9, image_phash=-1)))
+    assert asyncio.run(find_near_image_duplicate(db, 1, ImageKeys("abc", 0), OCR_LINES)) is None
+    assert db.execute.await_count == 1
+
+
+def test_near_image_match_is_not_checked_without_an_ocr_total():
+    db = _db()
+    assert asyncio.run(find_near_image_duplicate(db, 1, ImageKeys("abc", 0), ["Kassenbon", "Danke"])) is None
+    db.execute.assert_not_awaited()
@@ -0,0 +1,50 @@
+from api.services.embedding_cache import EmbeddingCache
+
+
+def test_round_trip_is_scoped_by_model(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "cache.sqlite3"), max_entries=100)
+    cache.put_many("model-a", {"Milch 1L": [0.5, 0.25]})
+
+    assert cache.get_many("model-a", ["Milch 1L", "Bananen"]) == {"Milch 1L": [0.5, 0.25]}
+    assert cache.get_many("model-b", ["Milch 1L"]) == {}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "cache.sqlite3"), max_entries=10)
+    for i in range(10):
+        cache.put_many("m", {f"item {i}": [float(i)]})
+    cache.get_many("m", ["item 0"])          # refresh the oldest entry
+
+    cache.put_many("m", {"item 10": [10.0]})
+
+    stats = cache.stats()
+    assert stats["entries"] == 9
+    assert stats["evictions"] == 2
+    assert cache.get_many("m", ["item 0", "item 1", "item 2", "item 10"]).keys() == {"item 0", "item 10"}
+
+
+def test_writes_count_rows_only_when_the_limit_may_be_crossed(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "cache.sqlite3"), max_entries=10)
+    statements = []
+    cache._conn.set_trace_callback(statements.append)
+    for i in range(10):
+        cache.put_many("m", {f"item {i}": [float(i)]})
+    assert not [s for s in statements if "COUNT(*)" in s]
+
+    # Rewriting existing keys pushes the estimate over the limit; the recount finds no eviction is due.
+    cache.put_many("m", {"item 0": [0.5], "item 1": [1.5]})
+    assert len([s for s in statements if "COUNT(*)" in s]) == 1
+    assert cache.stats()["entries"] == 10
+    assert cache.stats()["evictions"] == 0
+
+
+def test_stats_count_rows_written_by_another_process(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCache(path=path, max_entries=100)
+    other = EmbeddingCache(path=path, max_entries=100)
+    cache.put_many("m", {"Milch 1L": [0.5]})
+    other.put_many("m", {"Bananen": [0.25], "Brot": [1.0]})
+
+    assert cache.stats()["entries"] == 3
@@ -0,0 +1,66 @@
+import asyncio
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from sqlalchemy.dialects import postgresql
+from api.services.embedding_worker import EmbeddingWorker, claim_statement, retry_statement
+
+
+def _sql(stmt):
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def test_claim_skips_locked_rows_and_takes_a_lease():
+    sql = _sql(claim_statement(32))
+    assert "FOR UPDATE SKIP LOCKED" in sql
+    assert "attempts=(embedding_outbox.attempts + " in sql
+    assert "RETURNING embedding_outbox.id, embedding_outbox.receipt_id, embedding_outbox.attempts" in sql
+    retry = _sql(retry_statement([1], "boom"))
+    assert "make_interval(" in retry and "CASE WHEN (embedding_outbox.attempts >= " in retry
+
+
+class _Session:
+    def __init__(self, results):
+        self.results = results
+        self.statements = []
+        self.commit = AsyncMock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt, *args):
+        self.statements.append(stmt)
+        result = MagicMock()
+        result.all.return_value = result.scalars.return_value.all.return_value = self.results.pop(0) if self.results else []
+        return result
+
+
+def test_run_once_embeds_batch_and_retries_only_the_failing_receipt():
+    claimed = [SimpleNamespace(id=1, receipt_id=10, attempts=1), SimpleNamespace(id=2, receipt_id=11, attempts=3),
+               SimpleNamespace(id=3, receipt_id=12, attempts=1)]
+    receipts = [SimpleNamespace(id=10, date=date(2026, 1, 1)), SimpleNamespace(id=11, date=date(2026, 1, 2)),
+                SimpleNamespace(id=12, date=None)]
+    finished = _Session([])
+    sessions = [_Session([claimed, receipts]), finished]
+    embedder = MagicMock()
+    batches = []
+
+    def embed(batch):
+        batches.append([r.id for r in batch])
+        if any(r.id == 11 for r in batch):
+            raise RuntimeError("chroma unavailable")
+    embedder.embed_receipts.side_effect = embed
+    worker = EmbeddingWorker(session_factory=lambda: sessions.pop(0), embedder=embedder, batch_size=8)
+
+    assert asyncio.run(worker.run_once()) == 3
+
+    # One forward pass for the batch, then one by one after it failed; the undated receipt is skipped.
+    assert batches == [[10, 11], [10], [11]]
+    delete_stmt, retry_stmt = finished.statements
+    assert "DELETE FROM embedding_outbox" in _sql(delete_stmt)
+    assert delete_stmt.compile().params["id_1"] == [1, 3]
+    assert retry_stmt.compile().params["id_1"] == [2]
+    assert (worker.processed, worker.failures, worker.last_batch_size) == (2, 1, 3)
@@ -3,8 +3,20 @@ from datetime import date, datetime, time
 from unittest.mock import MagicMock, patch
 import pytest
 from api.services.embedding_service import EmbeddingService
+from api.services.model_registry import registry
 
 
+@pytest.fixture(autouse=True)
+def _fresh_registry(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMBED_CACHE_PATH", str(tmp_path / "embedding_cache.sqlite3"))
+    monkeypatch.setenv("VECTOR_INDEX_DIR", str(tmp_path / "vector_index"))
+    monkeypatch.setenv("CHROMA_PERSIST_DIR", str(tmp_path / "chroma_db"))
+    # Every partition goes straight to Chroma so the upserts below hit the collection mock.
+    monkeypatch.setattr("api.services.vector_store.MATRIX_MAX_ROWS", 0)
+    registry.reset()
+    yield
+    registry.reset()
+
 
 def _make_receipt(store_name="StoreX", store_address="123 Ave", store_number="555",
                   d=date(2022,1,2), payment_method="Card", total=10.0, taxes=0.5,
@@ -24,8 +36,8 @@ def _make_receipt(store_name="StoreX", store_address="123 Ave", store_number="55
         line_items=line_items
     )
 
-@patch('api.services.embedding_service.chromadb.PersistentClient')
-@patch('api.services.embedding_service.SentenceTransformer')
+@patch('api.services.model_registry._persistent_client')
+@patch('api.services.model_registry._sentence_transformer')
 def test_embed_receipt_inserts_expected_records(mock_sentence_transformer, mock_persistent_client):
     # Prepare model mock
     model = MagicMock()
@@ -37,6 +49,7 @@ def test_embed_receipt_inserts_expected_records(mock_sentence_transformer, mock_
 
     # Prepare collection mock
     collection = MagicMock()
+    collection.count.return_value = 0
     client = MagicMock()
     client.get_or_create_collection.return_value = collection
     mock_persistent_client.return_value = client
@@ -87,8 +100,8 @@ def test_embed_receipt_inserts_expected_records(mock_sentence_transformer, mock_
     assert metadatas[1]['category'] == li1.category
     assert metadatas[1]['item_name'] == li1.name
 
-@patch('api.services.embedding_service.chromadb.PersistentClient')
-@patch('api.services.embedding_service.SentenceTransformer')
+@patch('api.services.model_registry._persistent_client')
+@patch('api.services.model_registry._sentence_transformer')
 def test_embed_receipt_with_no_line_items(mock_sentence_transformer, mock_persistent_client):
     # Prepare model mock
     model = MagicMock()
@@ -100,6 +113,7 @@ def test_embed_receipt_with_no_line_items(mock_sentence_transformer, mock_persis
 
     # Prepare collection mock
     collection = MagicMock()
+    collection.count.return_value = 0
     client = MagicMock()
     client.get_or_create_collection.return_value = collection
     mock_persistent_client.return_value = client
@@ -132,4 +146,33 @@ def test_embed_receipt_with_no_line_items(mock_sentence_transformer, mock_persis
     assert len(metadatas) == 1
     expected_ts = datetime.combine(receipt.date, time()).timestamp()
     assert abs(metadatas[0]['date_ts'] - expected_ts) < 1e-6
-    assert metadatas[0]['type'] == 'summary'
\ No newline at end of file
+    assert metadatas[0]['type'] == 'summary'
+
+@patch('api.services.model_registry._persistent_client')
+@patch('api.services.model_registry._sentence_transformer')
+def test_embed_receipt_only_encodes_unseen_texts(mock_sentence_transformer, mock_persistent_client):
+    model = MagicMock()
+    model.encode.side_effect = lambda texts, **kw: MagicMock(
+        tolist=MagicMock(return_value=[[float(len(t)), 0.5] for t in texts]))
+    mock_sentence_transformer.return_value = model
+    collection = MagicMock()
+    collection.count.return_value = 0
+    mock_persistent_client.return_value.get_or_create_collection.return_value = collection
+
+    li1 = SimpleNamespace(name='Milch 1L', quantity=1, price_per_unit=1.0, total_price=1.0, category='beverages')
+    li2 = SimpleNamespace(name='Bananen', quantity=1, price_per_unit=2.0, total_price=2.0, category='pantry staples')
+    svc = EmbeddingService()
+    svc.embed_receipt(_make_receipt(line_items=[li1], rid=1))
+    first_embeddings = collection.upsert.call_args.kwargs['embeddings']
+
+    # Same store/date summary and a repeated item: only the new item is encoded.
+    svc.embed_receipt(_make_receipt(line_items=[li1, li2], rid=1))
+    item2_text = "Item name: Bananen; Quantity: 1; Unit Price: 2.0; Total Price: 2.0; Category: pantry staples"
+    assert model.encode.call_args.args[0] == [item2_text]
+    embeddings = collection.upsert.call_args.kwargs['embeddings']
+    assert embeddings[:2] == first_embeddings
+    assert embeddings[2] == [float(len(item2_text)), 0.5]
+
+    stats = svc.cache.stats()
+    assert stats['hits'] == 2
+    assert stats['misses'] == 3
@@ -0,0 +1,66 @@
+import asyncio
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy.dialects import postgresql
+from api.services.lexical_search import (
+    item_key, summary_key, query_terms, item_statement, reciprocal_rank_fusion,
+)
+from api.services.rag_service import RAGService
+from api.services.vector_store import VectorHit
+
+
+def test_query_terms_keeps_names_and_numbers():
+    assert query_terms("How much did I spend on Lindt chocolate at REWE in 2026?") == ["lindt", "chocolate", "rewe", "2026"]
+    assert query_terms("what did I buy?") == []
+
+
+def test_item_statement_uses_trigram_operator():
+    sql = str(item_statement(7, ["lindt", "rewe"], date(2026, 1, 1), date(2026, 1, 31))
+              .compile(dialect=postgresql.dialect()))
+    assert "line_items.name %%> " in sql   # % is escaped for the pyformat paramstyle
+    assert "greatest(word_similarity(" in sql
+    assert "receipts.user_id = " in sql and "receipts.date >= " in sql
+    assert "line_items_1.id < line_items.id" in sql   # position on the receipt, matching the vector ids
+
+
+def test_same_named_lines_on_one_receipt_stay_separate_hits():
+    hits = [
+        VectorHit("r:5:item:0", "Item name: Banane; Quantity: 1", {"type": "line_item", "receipt_id": 5, "item_name": "Banane"}, 0.9),
+        VectorHit("r:5:item:2", "Item name: Banane; Quantity: 3", {"type": "line_item", "receipt_id": 5, "item_name": "Banane"}, 0.8),
+    ]
+    keys = [RAGService._hit_key(hit) for hit in hits]
+    assert keys == [item_key(5, 0), item_key(5, 2)]
+    lexical = [(item_key(5, 2), "Item name: Banane; Quantity: 3")]
+    fused = reciprocal_rank_fusion([(k, h.document) for k, h in zip(keys, hits)], lexical, top_k=5)
+    assert fused == ["Item name: Banane; Quantity: 3", "Item name: Banane; Quantity: 1"]
+
+
+def test_rrf_merges_shared_keys_and_favours_agreement():
+    vector = [(summary_key(1), "summary 1"), (item_key(2, 0), "milch"), (item_key(3, 1), "brot")]
+    lexical = [(item_key(3, 1), "brot"), (item_key(4, 0), "lindt")]
+
+    fused = reciprocal_rank_fusion(vector, lexical, top_k=4)
+
+    assert fused[0] == "brot"
+    assert fused.count("brot") == 1
+    assert fused[1] == "summary 1"
+    assert set(fused[2:]) == {"milch", "lindt"}
+
+
+@patch("api.services.rag_service.lexical_hits", new_callable=AsyncMock)
+@patch("api.services.rag_service.EmbeddingService")
+def test_retrieve_hybrid_falls_back_to_vector_results(mock_emb_svc_class, mock_lexical):
+    emb = mock_emb_svc_class.return_value
+    emb.model.encode.return_value.tolist.return_value = [[0.1]]
+    emb.store.query.return_value = [
+        VectorHit("r:2:item:0", "Item name: Milch", {"type": "line_item", "receipt_id": 2, "item_name": "Milch"}, 0.9),
+        VectorHit("r:2:summary", "Store: REWE", {"type": "summary", "receipt_id": 2}, 0.8),
+    ]
+    mock_lexical.side_effect = RuntimeError("pg_trgm missing")
+    db = MagicMock(rollback=AsyncMock())
+
+    docs = asyncio.run(RAGService().retrieve_hybrid(db, 1, "Milch at REWE"))
+
+    assert docs == ["Item name: Milch", "Store: REWE"]
+    db.rollback.assert_awaited_once()
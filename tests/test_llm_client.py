@@ -0,0 +1,98 @@
+import asyncio
+from types import SimpleNamespace
+import httpx
+import pytest
+from unittest.mock import AsyncMock, patch
+from openai import APIStatusError, AuthenticationError
+from api.services.llm_client import LLMClient
+
+
+@pytest.fixture(autouse=True)
+def _groq_key(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+
+
+def _status_error(cls, status):
+    request = httpx.Request("POST", "https://example.invalid/chat/completions")
+    response = httpx.Response(status, request=request)
+    return cls("boom", response=response, body=None)
+
+
+@patch("api.services.llm_client.asyncio.sleep", new_callable=AsyncMock)
+def test_call_retries_on_rate_limit_then_succeeds(mock_sleep):
+    client = LLMClient(max_in_flight=2, max_retries=3, timeout=5, backoff=0.1)
+    fn = AsyncMock(side_effect=[_status_error(APIStatusError, 429),
+                                _status_error(APIStatusError, 503),
+                                "ok"])
+
+    result = asyncio.run(client._call(fn, model="m"))
+
+    assert result == "ok"
+    assert fn.await_count == 3
+    assert mock_sleep.await_count == 2
+    assert fn.call_args.kwargs == {"timeout": 5, "model": "m"}
+
+
+@patch("api.services.llm_client.asyncio.sleep", new_callable=AsyncMock)
+def test_call_does_not_retry_client_errors(mock_sleep):
+    client = LLMClient(max_in_flight=2, max_retries=3, timeout=5, backoff=0.1)
+    fn = AsyncMock(side_effect=_status_error(AuthenticationError, 401))
+
+    with pytest.raises(AuthenticationError):
+        asyncio.run(client._call(fn))
+    assert fn.await_count == 1
+    mock_sleep.assert_not_awaited()
+
+
+def test_in_flight_requests_are_capped():
+    client = LLMClient(max_in_flight=2, max_retries=0, timeout=5)
+    peak = 0
+
+    async def fake_call(**kwargs):
+        nonlocal peak
+        peak = max(peak, client.in_flight)
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    async def run():
+        return await asyncio.gather(*[client._call(fake_call) for _ in range(6)])
+
+    assert asyncio.run(run()) == ["ok"] * 6
+    assert peak == 2
+
+
+class _FakeStream:
+    def __init__(self, texts):
+        self.chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=t))]) for t in texts]
+        self.closed = False
+
+    def __aiter__(self):
+        return self._gen()
+
+    async def _gen(self):
+        for chunk in self.chunks:
+            yield chunk
+
+    async def close(self):
+        self.closed = True
+
+
+@patch("api.services.llm_client.asyncio.sleep", new_callable=AsyncMock)
+def test_stream_retries_opening_then_yields_deltas(mock_sleep):
+    client = LLMClient(max_in_flight=1, max_retries=2, timeout=5, backoff=0.1)
+    stream = _FakeStream(["You ", None, "spent ", "12,50 €"])
+    create = AsyncMock(side_effect=[_status_error(APIStatusError, 503), stream])
+    client.client.chat.completions.create = create
+
+    async def run():
+        tokens = []
+        async for token in client.stream(model="m", messages=[]):
+            assert client.in_flight == 1
+            tokens.append(token)
+        return tokens
+
+    assert asyncio.run(run()) == ["You ", "spent ", "12,50 €"]
+    assert create.await_count == 2
+    assert create.call_args.kwargs["stream"] is True
+    assert stream.closed
+    assert client.in_flight == 0
@@ -0,0 +1,55 @@
+from concurrent.futures import Future
+from types import SimpleNamespace
+import pytest
+from prometheus_client import REGISTRY
+from api.services import metrics
+from ingestion.ocr.ocr_pool import OCROutput, _record
+
+
+def _value(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_timed_counts_calls_items_and_errors():
+    calls, items, errors = (_value("pipeline_stage_seconds_count", stage="embed"),
+                            _value("pipeline_stage_items_total", stage="embed"),
+                            _value("pipeline_stage_errors_total", stage="embed"))
+    with metrics.timed("embed", 12):
+        pass
+    with pytest.raises(RuntimeError):
+        with metrics.timed("embed"):
+            raise RuntimeError("model crashed")
+
+    assert _value("pipeline_stage_seconds_count", stage="embed") == calls + 2
+    assert _value("pipeline_stage_items_total", stage="embed") == items + 12
+    assert _value("pipeline_stage_errors_total", stage="embed") == errors + 1
+
+
+def test_count_tokens_accepts_objects_and_dicts():
+    before = _value("llm_tokens_total", stage="llm_answer", kind="completion")
+    metrics.count_tokens("llm_answer", SimpleNamespace(prompt_tokens=100, completion_tokens=7))
+    metrics.count_tokens("llm_answer", {"prompt_tokens": 50, "completion_tokens": 3})
+    metrics.count_tokens("llm_answer", None)
+    assert _value("llm_tokens_total", stage="llm_answer", kind="completion") == before + 10
+
+
+def test_ocr_timings_from_workers_are_recorded_in_the_api_process():
+    decode_before = _value("pipeline_stage_seconds_sum", stage="image_decode")
+    lines_before = _value("pipeline_stage_items_total", stage="ocr")
+    inner, outer = Future(), Future()
+    inner.set_result(OCROutput(["REWE", "Milch 1,19"], 0.25, 1.5))
+
+    _record(inner, outer)
+
+    assert outer.result() == ["REWE", "Milch 1,19"]
+    assert _value("pipeline_stage_seconds_sum", stage="image_decode") == pytest.approx(decode_before + 0.25)
+    assert _value("pipeline_stage_items_total", stage="ocr") == lines_before + 2
+
+
+def test_queue_depth_is_read_at_scrape_time():
+    depth = [3]
+    metrics.track_queue("test_queue", lambda: depth[0])
+    depth[0] = 5
+    body, content_type = metrics.render()
+    assert content_type.startswith("text/plain")
+    assert b'queue_depth{queue="test_queue"} 5.0' in body
@@ -0,0 +1,57 @@
+from unittest.mock import MagicMock, patch
+import pytest
+from api.services.model_registry import registry
+
+
+@pytest.fixture(autouse=True)
+def _fresh_registry(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMBED_CACHE_PATH", str(tmp_path / "embedding_cache.sqlite3"))
+    monkeypatch.setenv("VECTOR_INDEX_DIR", str(tmp_path / "vector_index"))
+    monkeypatch.setenv("CHROMA_PERSIST_DIR", str(tmp_path / "chroma_db"))
+    registry.reset()
+    yield
+    registry.reset()
+
+
+@patch("api.services.model_registry._persistent_client")
+@patch("api.services.model_registry._sentence_transformer")
+def test_background_warm_up_reports_ready(mock_sentence_transformer, mock_persistent_client):
+    assert registry.status()["state"] == "idle"
+    registry.start_warm_up("background")
+    assert registry.wait_ready(timeout=5)
+    status = registry.status()
+    assert status["state"] == "ready" and status["embedding_model"] == registry.embed_model_name
+    mock_sentence_transformer.return_value.encode.assert_called_once()
+
+
+@patch("api.services.model_registry._persistent_client")
+@patch("api.services.model_registry._sentence_transformer", side_effect=OSError("no weights"))
+def test_failed_background_warm_up_is_reported_not_raised(mock_sentence_transformer, mock_persistent_client):
+    registry.start_warm_up("background")
+    assert not registry.wait_ready(timeout=5)
+    assert registry.status()["state"] == "failed"
+    assert registry.status()["error"] == "no weights"
+
+
+@patch("api.services.model_registry._persistent_client")
+@patch("api.services.model_registry._sentence_transformer")
+def test_nothing_is_loaded_before_first_use(mock_sentence_transformer, mock_persistent_client):
+    from api.services.embedding_service import EmbeddingService
+    svc = EmbeddingService()
+    mock_sentence_transformer.assert_not_called()
+    assert svc.model is mock_sentence_transformer.return_value
+    mock_sentence_transformer.assert_called_once_with(registry.embed_model_name)
+
+
+def test_ocr_pool_background_start_tracks_readiness():
+    from ingestion.ocr.ocr_pool import OCRPool
+    pool = OCRPool(workers=1, max_queue=0, engine="easyocr")
+    executor = MagicMock()
+    executor.submit.return_value.result.return_value = 1234
+    pool._executor = executor
+    with patch("ingestion.ocr.ocr_pool.threading.Thread") as thread:
+        pool.start("background")
+        assert pool.status()["state"] == "loading"
+        thread.return_value.start.assert_called_once()
+        thread.call_args.kwargs["target"]()
+    assert pool.status()["ready"]
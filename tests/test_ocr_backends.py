@@ -0,0 +1,59 @@
+import pytest
+from ingestion.ocr.backends import CascadeBackend, OCRBackend, build_backend
+
+
+class FakeBackend(OCRBackend):
+    def __init__(self, name, pairs):
+        self.name = name
+        self.pairs = pairs
+        self.calls = 0
+
+    def _extract(self, img_path):
+        self.calls += 1
+        return self.pairs
+
+
+def test_cascade_stops_at_first_confident_engine():
+    fast = FakeBackend("fast", [("MILCH 1,29", 0.9), ("BROT 2,49", 0.8), ("SUMME 3,78", 0.85)])
+    slow = FakeBackend("slow", [("MILCH 1,29", 0.99)] * 3)
+    result = CascadeBackend([fast, slow], min_confidence=0.6).recognize("r.jpg")
+
+    assert result.engine == "fast"
+    assert result.attempts == ["fast"]
+    assert slow.calls == 0
+
+
+def test_cascade_escalates_on_low_confidence():
+    fast = FakeBackend("fast", [("M1LCH", 0.3), ("BR0T", 0.2), ("SUMME", 0.4)])
+    slow = FakeBackend("slow", [("MILCH 1,29", 0.9), ("BROT 2,49", 0.9), ("SUMME 3,78", 0.9)])
+    result = CascadeBackend([fast, slow], min_confidence=0.6).recognize("r.jpg")
+
+    assert result.engine == "slow"
+    assert result.attempts == ["fast", "slow"]
+    assert result.lines[0] == "MILCH 1,29"
+
+
+def test_cascade_escalates_when_too_few_lines_and_keeps_best():
+    fast = FakeBackend("fast", [("SUMME 3,78", 0.95)])
+    slow = FakeBackend("slow", [("MILCH", 0.5), ("BROT", 0.5), ("SUMME", 0.5)])
+    result = CascadeBackend([fast, slow], min_confidence=0.6, min_lines=3).recognize("r.jpg")
+
+    # Neither is accepted, so the more confident result wins.
+    assert result.engine == "fast"
+    assert result.attempts == ["fast", "slow"]
+
+
+def test_build_backend_reads_cascade_order_from_env(monkeypatch):
+    monkeypatch.setenv("OCR_CASCADE", "tesseract, doctr")
+    monkeypatch.setenv("OCR_MIN_CONFIDENCE", "0.75")
+    backend = build_backend("cascade")
+    assert [e.name for e in backend.engines] == ["tesseract", "doctr"]
+    assert backend.min_confidence == 0.75
+
+
+def test_build_backend_rejects_unknown_engines(monkeypatch):
+    with pytest.raises(ValueError):
+        build_backend("paddle")
+    monkeypatch.setenv("OCR_CASCADE", "tesseract,paddle")
+    with pytest.raises(ValueError):
+        build_backend("cascade")
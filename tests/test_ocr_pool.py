@@ -0,0 +1,45 @@
+from concurrent.futures import Future
+from unittest.mock import MagicMock
+import pytest
+from ingestion.ocr.ocr_pool import OCROutput, OCRPool, OCRQueueFull
+
+
+def _pool_with_fake_executor(workers=1, max_queue=1):
+    pool = OCRPool(workers=workers, max_queue=max_queue, engine="easyocr", retry_after=7)
+    futures = []
+    executor = MagicMock()
+    def submit(fn, *args):
+        fut = Future()
+        futures.append(fut)
+        return fut
+    executor.submit.side_effect = submit
+    pool._executor = executor
+    return pool, futures
+
+
+def test_submit_rejects_when_queue_is_full():
+    pool, futures = _pool_with_fake_executor(workers=1, max_queue=1)
+    pool.submit("a.jpg")
+    pool.submit("b.jpg")
+    assert pool.pending == 2
+
+    with pytest.raises(OCRQueueFull) as exc:
+        pool.submit("c.jpg")
+    assert exc.value.retry_after == 7
+
+
+def test_completed_jobs_free_their_slot():
+    pool, futures = _pool_with_fake_executor(workers=1, max_queue=0)
+    pool.submit("a.jpg")
+    with pytest.raises(OCRQueueFull):
+        pool.submit("b.jpg")
+
+    futures[0].set_result(OCROutput(["line"], 0.01, 0.5))
+    assert pool.pending == 0
+    pool.submit("b.jpg")
+    assert pool.pending == 1
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        OCRPool(workers=1, engine="paddle")
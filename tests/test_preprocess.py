@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+import pytest
+from ingestion.ocr.preprocess import PRESETS, PreprocessConfig, deskew, estimate_text_height, load_image, preprocess
+
+def _receipt(scale=1, angle=0.0):
+    img = np.full((1200 * scale, 500 * scale), 255, np.uint8)
+    for row in range(40):
+        cv2.putText(img, f"ITEM {row:02d}  1,99 EUR", (20 * scale, (25 + row * 28) * scale),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6 * scale, 0, 2 * scale)
+    if angle:
+        h, w = img.shape
+        m = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+        img = cv2.warpAffine(img, m, (w, h), borderValue=255)
+    return img
+
+def test_off_preset_leaves_image_untouched():
+    img = _receipt()
+    out = preprocess(cv2.cvtColor(img, cv2.COLOR_GRAY2BGR), PRESETS["off"])
+    assert out.shape == img.shape
+    assert np.array_equal(out, img)
+
+def test_large_text_is_downscaled_towards_target_height():
+    img = _receipt(scale=3)
+    config = PreprocessConfig(crop=False, deskew=False, target_text_height=20, max_side=None)
+    out = preprocess(img, config)
+    assert out.shape[0] < img.shape[0]
+    assert estimate_text_height(out) <= 20 * 1.15
+
+def test_small_text_is_never_upscaled():
+    img = _receipt()
+    config = PreprocessConfig(crop=False, deskew=False, target_text_height=200, max_side=None)
+    assert preprocess(img, config).shape == img.shape
+
+def test_max_side_caps_the_long_edge():
+    img = _receipt(scale=3)
+    config = PreprocessConfig(crop=False, deskew=False, target_text_height=None, max_side=1000)
+    assert max(preprocess(img, config).shape) == 1000
+
+def test_deskew_straightens_rotated_text():
+    def ink_rows(gray):
+        return int((gray < 128).any(axis=1).sum())
+    straight, tilted = _receipt(), _receipt(angle=5)
+    assert ink_rows(deskew(tilted)) < ink_rows(tilted)
+    assert np.array_equal(deskew(straight), straight)
+
+def test_load_image_accepts_bytes_arrays_and_paths(tmp_path):
+    img = cv2.cvtColor(_receipt(), cv2.COLOR_GRAY2BGR)
+    ok, encoded = cv2.imencode(".png", img)
+    path = tmp_path / "r.png"
+    path.write_bytes(encoded.tobytes())
+
+    assert np.array_equal(load_image(encoded.tobytes()), img)
+    assert np.array_equal(load_image(str(path)), img)
+    assert load_image(img) is img
+
+
+def test_load_image_rejects_garbage(tmp_path):
+    with pytest.raises(ValueError):
+        load_image(b"not an image")
+    with pytest.raises(FileNotFoundError):
+        load_image(str(tmp_path / "missing.png"))
@@ -0,0 +1,114 @@
+import asyncio
+import time
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from api.services.profiling import RequestProfiler, prune
+
+
+class FakeProfiler:
+    started = 0
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.running = False
+
+    def start(self):
+        FakeProfiler.started += 1
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+    def output_html(self):
+        return "<html>profile</html>"
+
+
+def _client(tmp_path, **kwargs):
+    app = FastAPI()
+    options = dict(directory=str(tmp_path), profiler_factory=FakeProfiler, sample_rate=0, token="secret")
+    options.update(kwargs)
+    app.add_middleware(RequestProfiler, **options)
+
+    @app.get("/rag/query")
+    def query():
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_header_with_token_saves_a_profile(tmp_path):
+    resp = _client(tmp_path).get("/rag/query", headers={"X-Profile": "secret"})
+    assert resp.status_code == 200
+    name = resp.headers["x-profile-id"]
+    assert "-get-rag_query-" in name and name.endswith(".html")
+    assert (tmp_path / name).read_text() == "<html>profile</html>"
+
+
+def test_wrong_token_and_unsampled_requests_are_not_profiled(tmp_path):
+    FakeProfiler.started = 0
+    client = _client(tmp_path)
+    assert "x-profile-id" not in client.get("/rag/query", headers={"X-Profile": "guess"}).headers
+    assert "x-profile-id" not in client.get("/rag/query").headers
+    assert FakeProfiler.started == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_header_is_ignored_without_a_token(tmp_path):
+    client = _client(tmp_path, token="", sample_rate=0)
+    assert "x-profile-id" not in client.get("/rag/query", headers={"X-Profile": ""}).headers
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_sampled_requests_are_saved_without_a_header(tmp_path):
+    client = _client(tmp_path, token="", sample_rate=1.0)
+    client.get("/rag/query")
+    assert len(list(tmp_path.glob("*.html"))) == 1
+
+
+def test_fast_sampled_requests_below_threshold_are_dropped(tmp_path):
+    client = _client(tmp_path, sample_rate=1.0, min_seconds=60)
+    client.get("/rag/query")
+    assert list(tmp_path.iterdir()) == []
+    client.get("/rag/query", headers={"X-Profile": "secret"})
+    assert len(list(tmp_path.glob("*.html"))) == 1
+
+
+def test_no_profile_is_started_past_the_concurrency_cap(tmp_path):
+    FakeProfiler.started = 0
+    sent = []
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+    async def send(message):
+        sent.append(message)
+    middleware = RequestProfiler(app, directory=str(tmp_path), profiler_factory=FakeProfiler, sample_rate=1.0,
+                                 max_concurrent=1)
+    middleware.active = 1
+    scope = {"type": "http", "method": "GET", "path": "/rag/query", "headers": []}
+    asyncio.run(middleware(scope, None, send))
+    assert sent[0]["status"] == 200
+    assert FakeProfiler.started == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_missing_pyinstrument_disables_profiling(tmp_path):
+    def missing(interval):
+        raise ImportError("No module named 'pyinstrument'")
+    client = _client(tmp_path, sample_rate=1.0, profiler_factory=missing)
+    assert client.get("/rag/query").status_code == 200
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_prune_keeps_newest_profiles(tmp_path):
+    for i in range(5):
+        (tmp_path / f"{time.time_ns() + i:019d}-get-x-1ms.html").write_text("p")
+    (tmp_path / "notes.txt").write_text("keep")
+    names = sorted(p.name for p in tmp_path.glob("*.html"))
+    prune(tmp_path, 2)
+    assert sorted(p.name for p in tmp_path.glob("*.html")) == names[-2:]
+    assert (tmp_path / "notes.txt").exists()
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError, match="PROFILE_FORMAT"):
+        RequestProfiler(app=None, fmt="pstats")
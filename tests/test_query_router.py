@@ -0,0 +1,84 @@
+from datetime import date
+from sqlalchemy.dialects import postgresql
+from api.services.query_router import parse_question, parse_date_range, build_statement, format_answer
+
+TODAY = date(2026, 5, 14)
+
+
+def test_open_ended_questions_are_not_routed():
+    assert parse_question("What did I buy at the bakery?", TODAY) is None
+    assert parse_question("Did I buy oat milk recently?", TODAY) is None
+
+
+def test_questions_sql_cannot_answer_fall_back_to_rag():
+    stores = ["REWE Markt GmbH", "Lidl"]
+    # A product name is a filter the aggregates cannot apply.
+    assert parse_question("How much did I spend on Hafermilch?", TODAY, stores) is None
+    assert parse_question("How much does a banana cost at Rewe?", TODAY, stores) is None
+    # One receipt or one item, not a sum over all of them.
+    assert parse_question("What was the total on my last Lidl receipt?", TODAY, stores) is None
+    assert parse_question("What was the most expensive item I bought?", TODAY, stores) is None
+    # A store the user never shopped at is not silently dropped either.
+    assert parse_question("How much did I spend at Aldi?", TODAY, stores) is None
+
+
+def test_filters_that_are_matched_still_route():
+    q = parse_question("How much did I spend at Lidl last month?", TODAY, ["REWE Markt GmbH", "Lidl"])
+    assert q.stores == ["Lidl"] and q.start_date == date(2026, 4, 1)
+    assert parse_question("How much did I pay by credit card in March?", TODAY).payment_methods == ["credit card"]
+
+
+def test_category_spend_in_month():
+    q = parse_question("How much did I spend on alcohol in March?", TODAY)
+    assert q.metric == "sum"
+    assert q.group_by is None
+    assert q.categories == ["alcohol"]
+    assert (q.start_date, q.end_date) == (date(2026, 3, 1), date(2026, 3, 31))
+    assert q.item_level
+
+
+def test_top_stores_last_quarter_uses_known_store_names():
+    q = parse_question("Top 3 stores last quarter", TODAY, known_stores=["REWE Markt GmbH", "Lidl"])
+    assert q.group_by == "store"
+    assert q.limit == 3
+    assert q.stores == []
+    assert (q.start_date, q.end_date) == (date(2026, 1, 1), date(2026, 3, 31))
+    assert not q.item_level
+
+    q = parse_question("How much did I spend at rewe?", TODAY, known_stores=["REWE Markt GmbH", "Lidl"])
+    assert q.stores == ["REWE Markt GmbH"]
+
+
+def test_request_dates_apply_when_question_has_none():
+    q = parse_question("total spending by category", TODAY,
+                       start_date=date(2024, 1, 1), end_date=date(2024, 6, 30))
+    assert q.group_by == "category"
+    assert (q.start_date, q.end_date) == (date(2024, 1, 1), date(2024, 6, 30))
+
+
+def test_relative_date_ranges():
+    assert parse_date_range("last month", TODAY) == (date(2026, 4, 1), date(2026, 4, 30))
+    assert parse_date_range("in 2024", TODAY) == (date(2024, 1, 1), date(2024, 12, 31))
+    assert parse_date_range("in december", TODAY) == (date(2025, 12, 1), date(2025, 12, 31))
+    assert parse_date_range("how much may I spend", TODAY) is None
+
+
+def test_statement_groups_and_filters_in_sql():
+    q = parse_question("how much did I spend on beer by month in 2025", TODAY)
+    sql = str(build_statement(7, q).compile(dialect=postgresql.dialect()))
+    assert "JOIN line_items" in sql
+    assert "date_trunc" in sql
+    assert "GROUP BY" in sql
+    assert "line_items.category IN" in sql
+
+
+def test_format_scalar_and_grouped_answers():
+    q = parse_question("how much did I spend on alcohol in March", TODAY)
+    answer, chunks = format_answer(q, [(42.5, 6)])
+    assert answer == "You spent 42.50 on alcohol between 2026-03-01 and 2026-03-31 (6 items)."
+    assert len(chunks) == 1
+
+    q = parse_question("top stores", TODAY)
+    answer, chunks = format_answer(q, [("REWE", 120.0, 8), ("Lidl", 80.0, 5)])
+    assert answer.splitlines()[1] == "1. REWE: 120.00 (8 receipts)"
+    assert chunks == ["store=REWE; total=120.00; receipts=8", "store=Lidl; total=80.00; receipts=5"]
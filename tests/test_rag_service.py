@@ -1,13 +1,15 @@
+import asyncio
 import pytest
-from unittest.mock import MagicMock, patch, call
+from unittest.mock import AsyncMock, MagicMock, patch, call
 from datetime import date, datetime, time
 from types import SimpleNamespace
 from api.services.rag_service import RAGService
+from api.services.vector_store import VectorStore
 
 
-@patch("api.services.rag_service.OpenAI")
+@patch("api.services.rag_service.get_llm_client")
 @patch("api.services.rag_service.EmbeddingService")
-def test_answer_question_with_results(mock_emb_svc_class, mock_openai_class):
+def test_answer_question_with_results(mock_emb_svc_class, mock_get_llm_client, tmp_path):
     """Test answer_question with matching documents and date filters."""
     # Setup mocks
     mock_emb_svc = MagicMock()
@@ -26,25 +28,26 @@ def test_answer_question_with_results(mock_emb_svc_class, mock_openai_class):
             ]
         ]
     }
-    mock_emb_svc.collection = mock_collection
+    # No partition yet for this user: reads go to the shared collection.
+    mock_emb_svc.store = VectorStore(root=str(tmp_path), collection=lambda name: mock_collection)
     
     mock_client = MagicMock()
-    mock_openai_class.return_value = mock_client
+    mock_get_llm_client.return_value = mock_client
     mock_response = MagicMock()
     mock_response.choices[0].message.content = "You spent $45.99 at Walmart on groceries."
-    mock_client.chat.completions.create.return_value = mock_response
+    mock_client.chat = AsyncMock(return_value=mock_response)
     
     # Instantiate and call
     rag_svc = RAGService()
     start = date(2026, 2, 1)
     end = date(2026, 2, 28)
-    answer, docs = rag_svc.answer_question(
+    answer, docs = asyncio.run(rag_svc.answer_question(
         user_id=42,
         question="How much did I spend on groceries?",
         start_date=start,
         end_date=end,
         top_k=5
-    )
+    ))
     
     # Assertions
     assert answer == "You spent $45.99 at Walmart on groceries."
@@ -67,8 +70,8 @@ def test_answer_question_with_results(mock_emb_svc_class, mock_openai_class):
     assert filters[0] == {"user_id": 42}
     
     # Verify LLM called
-    mock_client.chat.completions.create.assert_called_once()
-    llm_kwargs = mock_client.chat.completions.create.call_args[1]
+    mock_client.chat.assert_awaited_once()
+    llm_kwargs = mock_client.chat.call_args[1]
     assert llm_kwargs["model"] == "llama-3.1-8b-instant"
     assert llm_kwargs["temperature"] == 0.0
     assert "How much did I spend on groceries?" in llm_kwargs["messages"][0]["content"]
@@ -76,9 +79,9 @@ def test_answer_question_with_results(mock_emb_svc_class, mock_openai_class):
 
 
 
-@patch("api.services.rag_service.OpenAI")
+@patch("api.services.rag_service.get_llm_client")
 @patch("api.services.rag_service.EmbeddingService")
-def test_answer_question_no_date_filter(mock_emb_svc_class, mock_openai_class):
+def test_answer_question_no_date_filter(mock_emb_svc_class, mock_get_llm_client, tmp_path):
     """Test answer_question without date filters."""
     # Setup mocks
     mock_emb_svc = MagicMock()
@@ -92,20 +95,21 @@ def test_answer_question_no_date_filter(mock_emb_svc_class, mock_openai_class):
     mock_collection.query.return_value = {
         "documents": [["Store: Amazon; Total: 29.99"]]
     }
-    mock_emb_svc.collection = mock_collection
+    # No partition yet for this user: reads go to the shared collection.
+    mock_emb_svc.store = VectorStore(root=str(tmp_path), collection=lambda name: mock_collection)
     
     mock_client = MagicMock()
-    mock_openai_class.return_value = mock_client
+    mock_get_llm_client.return_value = mock_client
     mock_response = MagicMock()
     mock_response.choices[0].message.content = "You spent $29.99 on Amazon."
-    mock_client.chat.completions.create.return_value = mock_response
+    mock_client.chat = AsyncMock(return_value=mock_response)
     
     # Instantiate and call (no date filters)
     rag_svc = RAGService()
-    answer, docs = rag_svc.answer_question(
+    answer, docs = asyncio.run(rag_svc.answer_question(
         user_id=10,
         question="Total spending?"
-    )
+    ))
     
     # Assertions
     assert answer == "You spent $29.99 on Amazon."
@@ -113,4 +117,29 @@ def test_answer_question_no_date_filter(mock_emb_svc_class, mock_openai_class):
     
     # Verify collection.query called with only user_id filter (no $and)
     call_kwargs = mock_collection.query.call_args[1]
-    assert call_kwargs["where"] == {"user_id": 10}
\ No newline at end of file
+    assert call_kwargs["where"] == {"user_id": 10}
+
+
+@patch("api.services.rag_service.get_llm_client")
+@patch("api.services.rag_service.EmbeddingService")
+def test_stream_answer_sends_sources_before_tokens(mock_emb_svc_class, mock_get_llm_client, tmp_path):
+    mock_emb_svc = MagicMock()
+    mock_emb_svc_class.return_value = mock_emb_svc
+    mock_emb_svc.model.encode.return_value.tolist.return_value = [[0.1, 0.2]]
+    mock_collection = MagicMock()
+    mock_collection.query.return_value = {"documents": [["Store: REWE; Total: 12.5"]]}
+    mock_emb_svc.store = VectorStore(root=str(tmp_path), collection=lambda name: mock_collection)
+
+    async def fake_stream(**kwargs):
+        for token in ["You spent ", "12.50."]:
+            yield token
+    mock_get_llm_client.return_value.stream = fake_stream
+
+    async def collect():
+        return [event async for event in RAGService().stream_answer(user_id=1, question="REWE total?")]
+
+    assert asyncio.run(collect()) == [
+        ("sources", ["Store: REWE; Total: 12.5"]),
+        ("token", "You spent "),
+        ("token", "12.50."),
+    ]
@@ -0,0 +1,57 @@
+from ingestion.ocr.receipt_parser import parse_receipt
+
+REWE = """REWE Markt GmbH
+Hauptstr. 12
+10115 Berlin
+EUR
+MILCH 1L 1,19 B
+BANANE
+CHIQUITA 2,00 B
+2 Stk x 1,00
+KAESE GOUDA 3,49 B
+SUMME EUR 6,68
+Geg. EC-Cash EUR 6,68
+Steuer % Netto Steuer Brutto
+B= 7,0% 6,24 0,44 6,68
+02.03.2026 12:31 Bon-Nr. 1234""".splitlines()
+
+
+def test_parses_a_reconciling_receipt():
+    parsed = parse_receipt(REWE)
+    assert parsed.complete
+    assert parsed.store_name == "REWE Markt GmbH"
+    assert parsed.store_address == "Hauptstr. 12, 10115 Berlin"
+    assert [(i.name, i.quantity, i.price_per_unit, i.total_price) for i in parsed.items] == [
+        ("MILCH 1L", 1, 1.19, 1.19),
+        ("BANANE CHIQUITA", 2, 1.0, 2.0),
+        ("KAESE GOUDA", 1, 3.49, 3.49),
+    ]
+    assert parsed.total == 6.68
+    assert parsed.taxes == 0.44
+    assert parsed.date == "02-03-2026"
+    assert parsed.payment_method == "debit card"
+
+
+def test_quantity_line_before_the_item():
+    parsed = parse_receipt(["Lidl", "3 x 0,59", "Joghurt 1,77 A", "zu zahlen 1,77", "Bar 2,00"])
+    assert parsed.items[0].quantity == 3
+    assert parsed.items[0].price_per_unit == 0.59
+    assert parsed.payment_method == "cash"
+    assert parsed.complete
+
+
+def test_missing_item_line_does_not_reconcile():
+    lines = [l for l in REWE if not l.startswith("KAESE")]
+    assert not parse_receipt(lines).complete
+
+
+def test_discounts_force_the_llm_path():
+    parsed = parse_receipt(["Aldi", "Butter 2,49", "Rabatt -0,50", "SUMME 1,99"])
+    assert parsed.has_negative_lines
+    assert not parsed.complete
+
+
+def test_impossible_dates_are_skipped():
+    lines = [l.replace("02.03.2026", "31.02.2026 / 03.03.2026") for l in REWE]
+    assert parse_receipt(lines).date == "03-03-2026"
+    assert parse_receipt([l for l in REWE if "2026" not in l] + ["31.02.26"]).date is None
@@ -0,0 +1,45 @@
+from datetime import date
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+from api.services.receipt_query_service import (
+    Cursor, encode_cursor, decode_cursor, receipts_statement, line_items_statement,
+)
+
+
+def _sql(stmt):
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def test_cursor_round_trip():
+    c = Cursor(date(2026, 3, 2), 41, 7)
+    assert decode_cursor(encode_cursor(c)) == c
+    assert decode_cursor(encode_cursor(Cursor(None, 3))) == Cursor(None, 3)
+
+
+def test_garbage_cursor_is_rejected():
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor("not-a-cursor")
+    assert exc.value.status_code == 400
+
+
+def test_receipts_page_uses_keyset_not_offset():
+    token = encode_cursor(Cursor(date(2026, 3, 2), 41))
+    sql = _sql(receipts_statement(7, store="REWE", min_total=5, limit=20, cursor=token))
+    assert "OFFSET" not in sql
+    assert "(receipts.date, receipts.id) < (" in sql
+    assert "ORDER BY receipts.date DESC NULLS LAST, receipts.id DESC" in sql
+    assert "LIMIT" in sql
+
+
+def test_line_items_page_filters_and_orders_by_receipt_then_item():
+    token = encode_cursor(Cursor(date(2026, 3, 2), 41, 9))
+    sql = _sql(line_items_statement(7, category="alcohol", max_price=10, cursor=token))
+    assert "line_items.category = " in sql
+    assert "line_items.id < " in sql
+    assert "ORDER BY receipts.date DESC NULLS LAST, receipts.id DESC, line_items.id DESC" in sql
+
+
+def test_line_items_reject_receipt_cursor():
+    with pytest.raises(HTTPException):
+        line_items_statement(7, cursor=encode_cursor(Cursor(date(2026, 3, 2), 41)))
@@ -0,0 +1,64 @@
+import asyncio
+from datetime import date
+from unittest.mock import AsyncMock, MagicMock
+from ingestion.ocr.llm_classifier_wrapper import ReceiptSummary, LineItem
+from api.services.receipt_service import persist_receipts
+
+
+def _summary(store, items, d="02-03-2026"):
+    return ReceiptSummary(
+        store_name=store, store_address="Hauptstr. 1", items=items, taxes=0.5, total=9.0,
+        date=d, payment_method="cash", confidence_score_ocr=90,
+    )
+
+
+def _item(name, price, category="pantry staples"):
+    return LineItem(name=name, quantity=1, price_per_unit=price, total_price=price,
+                    category=category, confidence_score=95)
+
+
+def _result(ids):
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = ids
+    return result
+
+
+def test_persist_receipts_inserts_in_bulk_without_reading_back():
+    db = MagicMock()
+    db.execute = AsyncMock(side_effect=[_result([10, 11]), _result([100, 101, 102]), None, None, None])
+    db.commit = AsyncMock()
+    batch = [
+        (_summary("REWE", [_item("Milch 1L", 1.19), _item("Bananen", 2.0)]), ["REWE", "Milch 1L 1,19"]),
+        (_summary("Lidl", [_item("Bier", 5.8, "alcohol")], d=None), ["Lidl"]),
+    ]
+
+    receipts = asyncio.run(persist_receipts(db, batch, user_id=7))
+
+    # receipts insert, line items insert, outbox insert, two rollup upserts - and nothing else
+    assert db.execute.await_count == 5
+    _, receipt_rows = db.execute.await_args_list[0].args
+    assert [r["store_name"] for r in receipt_rows] == ["REWE", "Lidl"]
+    assert receipt_rows[0]["raw_text"] == "REWE\nMilch 1L 1,19"
+    _, item_rows = db.execute.await_args_list[1].args
+    assert [r["receipt_id"] for r in item_rows] == [10, 10, 11]
+    # Only the dated receipt can be embedded, so only it is queued in the same transaction.
+    _, outbox_rows = db.execute.await_args_list[2].args
+    assert outbox_rows == [{"receipt_id": 10, "user_id": 7}]
+    db.commit.assert_awaited_once()
+
+    assert [r.id for r in receipts] == [10, 11]
+    assert receipts[0].date == date(2026, 3, 2)
+    assert receipts[1].date is None
+    assert [(li.id, li.name) for li in receipts[0].line_items] == [(100, "Milch 1L"), (101, "Bananen")]
+    assert receipts[1].line_items[0].receipt_id == 11
+
+
+def test_unparseable_llm_date_is_stored_as_undated():
+    db = MagicMock()
+    db.execute = AsyncMock(side_effect=[_result([12]), _result([103]), None, None])
+    db.commit = AsyncMock()
+
+    receipts = asyncio.run(persist_receipts(db, [(_summary("REWE", [_item("Milch 1L", 1.19)], d="31-02-2026"), ["REWE"])]))
+
+    assert receipts[0].date is None
+    db.commit.assert_awaited_once()
@@ -0,0 +1,83 @@
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+import pytest
+from api.services.reindex_service import Reindexer, load_checkpoint, vector_ids
+from api.services.vector_store import VectorStore
+
+
+def _receipt(rid, n_items, uid=1):
+    items = [SimpleNamespace(name=f"item {i}", quantity=1, price_per_unit=1.0, total_price=1.0, category="other")
+             for i in range(n_items)]
+    return SimpleNamespace(id=rid, user_id=uid, store_name="REWE", store_address=None, store_number=None,
+                           date=date(2026, 1, rid), payment_method="cash", total=1.0, taxes=0.0, line_items=items)
+
+
+class _Embedder:
+    """Writes fixed vectors straight into a real VectorStore."""
+    def __init__(self, store):
+        self.store = store
+        self.embedded = []
+
+    def embed_receipts(self, receipts, batch_size=None):
+        for r in receipts:
+            self.embedded.append(r.id)
+            ids = vector_ids(r.id, len(r.line_items))
+            self.store.upsert(r.user_id, ids, [[1.0, float(r.id)]] * len(ids), [{"user_id": r.user_id}] * len(ids),
+                              ids, model="all-MiniLM-L6-v2")
+
+
+@pytest.fixture
+def reindexer(tmp_path, monkeypatch):
+    monkeypatch.delenv("EMBED_MODEL", raising=False)
+    store = VectorStore(root=str(tmp_path / "index"), collection=MagicMock(), matrix_max_rows=1000)
+    return Reindexer(MagicMock, embedder=_Embedder(store), checkpoint_path=str(tmp_path / "checkpoint.json"),
+                     batch_size=2)
+
+
+def test_reindex_resumes_from_checkpoint(reindexer):
+    batches = [[_receipt(1, 1), _receipt(2, 0)], [_receipt(3, 2)]]
+
+    def failing(db, batch_size, after_id, user_id):
+        yield batches[0]
+        raise RuntimeError("connection lost")
+
+    with patch("api.services.reindex_service.receipt_batches", failing), pytest.raises(RuntimeError):
+        reindexer.run("reindex")
+    checkpoint = load_checkpoint(reindexer.checkpoint_path)
+    assert (checkpoint.status, checkpoint.cursor, checkpoint.vectors) == ("failed", 2, 3)
+
+    calls = []
+    def rest(db, batch_size, after_id, user_id):
+        calls.append(after_id)
+        yield from [b for b in batches if b[0].id > after_id]
+
+    with patch("api.services.reindex_service.receipt_batches", rest):
+        progress = reindexer.run("reindex")
+    assert calls == [2]
+    assert (progress.status, progress.receipts, progress.vectors) == ("completed", 3, 6)
+    assert reindexer.embedder.embedded == [1, 2, 3]
+
+
+def test_reconcile_embeds_missing_and_deletes_orphans(reindexer):
+    store = reindexer.embedder.store
+    reindexer.embedder.embed_receipts([_receipt(1, 2), _receipt(2, 1)])
+    store.upsert(1, ["r:9:summary"], [[0.0, 1.0]], [{"user_id": 1}], ["gone"], model="all-MiniLM-L6-v2")
+    reindexer.embedder.embedded.clear()
+    # Receipt 2 gained an item since it was embedded; receipt 3 was never embedded; receipt 9 was deleted.
+    expected = [(1, 2), (2, 2), (3, 0)]
+    receipts = {1: _receipt(1, 2), 2: _receipt(2, 2), 3: _receipt(3, 0)}
+    db = MagicMock()
+    db.execute.return_value.scalars.return_value.all.return_value = [1]
+
+    def batches(db, batch_size, user_id=None, receipt_ids=None):
+        yield [receipts[i] for i in receipt_ids]
+
+    reindexer.session_factory = lambda: db
+    with patch.object(Reindexer, "_expected_ids", lambda self, db, uid: iter(expected)), \
+         patch("api.services.reindex_service.receipt_batches", batches):
+        progress = reindexer.run("reconcile")
+
+    assert reindexer.embedder.embedded == [2, 3]
+    assert (progress.missing, progress.orphaned) == (2, 1)
+    assert sorted(store.ids(1)) == sorted(vector_ids(1, 2) + vector_ids(2, 2) + vector_ids(3, 0))
@@ -0,0 +1,47 @@
+from datetime import date
+from types import SimpleNamespace
+from sqlalchemy.dialects import postgresql
+from api.services.rollup_service import rollup_rows, upsert_statements, rebuild_statements
+
+
+def _receipt(uid, d, store, total, items):
+    return SimpleNamespace(user_id=uid, date=d, store_name=store, total=total,
+                           line_items=[SimpleNamespace(category=c, total_price=p) for c, p in items])
+
+
+def test_rollup_rows_merge_receipts_sharing_a_key():
+    receipts = [
+        _receipt(1, date(2026, 3, 2), "REWE", 5.0, [("alcohol", 3.0), ("beverages", 2.0)]),
+        _receipt(1, date(2026, 3, 20), "REWE", 4.0, [("alcohol", 4.0)]),
+        _receipt(1, date(2026, 4, 1), "Lidl", 1.5, [("desserts", None)]),
+        _receipt(1, None, "Undated", 9.0, [("other", 9.0)]),
+    ]
+
+    category_rows, store_rows = rollup_rows(receipts)
+
+    assert category_rows == [
+        dict(user_id=1, month=date(2026, 3, 1), category="alcohol", total=7.0, item_count=2),
+        dict(user_id=1, month=date(2026, 3, 1), category="beverages", total=2.0, item_count=1),
+        dict(user_id=1, month=date(2026, 4, 1), category="desserts", total=0.0, item_count=1),
+    ]
+    assert store_rows == [
+        dict(user_id=1, month=date(2026, 3, 1), store_name="REWE", total=9.0, receipt_count=2),
+        dict(user_id=1, month=date(2026, 4, 1), store_name="Lidl", total=1.5, receipt_count=1),
+    ]
+
+
+def test_upserts_increment_existing_rollups():
+    receipts = [_receipt(1, date(2026, 3, 2), "REWE", 5.0, [("alcohol", 3.0)])]
+    stmts = upsert_statements(*rollup_rows(receipts))
+    sql = [str(s.compile(dialect=postgresql.dialect())) for s in stmts]
+    assert "ON CONFLICT (user_id, month, category) DO UPDATE" in sql[0]
+    assert "monthly_category_spend.total + excluded.total" in sql[0]
+    assert "ON CONFLICT (user_id, month, store_name) DO UPDATE" in sql[1]
+
+
+def test_rebuild_can_be_scoped_to_one_user():
+    stmts = rebuild_statements(user_id=3)
+    sql = [str(s.compile(dialect=postgresql.dialect())) for s in stmts]
+    assert "WHERE monthly_category_spend.user_id" in sql[0]
+    assert "r.user_id = " in sql[2]
+    assert all("user_id =" not in str(s) for s in rebuild_statements()[:2])
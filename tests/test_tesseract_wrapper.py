@@ -0,0 +1,59 @@
+import threading
+import cv2
+import numpy as np
+import pytest
+from ingestion.ocr import tesseract_wrapper
+
+
+def _fake_data(words, confs):
+    return {"text": words, "conf": confs, "line_num": list(range(len(words)))}
+
+
+@pytest.fixture
+def receipt_path(tmp_path):
+    img = np.full((900, 400, 3), 40, np.uint8)
+    img[50:850, 50:350] = 255
+    path = tmp_path / "receipt.png"
+    cv2.imwrite(str(path), img)
+    tesseract_wrapper._cache.clear()
+    return str(path)
+
+
+def test_passes_run_concurrently_and_merge(monkeypatch, receipt_path):
+    barrier = threading.Barrier(2, timeout=5)
+    def image_to_data(image, lang, config, output_type):
+        barrier.wait()   # deadlocks (and times out) if the passes run sequentially
+        if "psm 6" in config:
+            return _fake_data(["MILCH", "1,29"], ["91", "88"])
+        return _fake_data(["SUMME"], [-1])
+    monkeypatch.setattr(tesseract_wrapper.pytesseract, "image_to_data", image_to_data)
+
+    pairs = tesseract_wrapper.extract_text_blocks_with_confidence(receipt_path)
+    assert [text for text, _ in pairs] == ["MILCH", "1,29", "SUMME"]
+    assert pairs[0][1] == pytest.approx(0.91)
+    assert pairs[2][1] == 0.0
+
+
+def test_preprocessed_image_is_reused(monkeypatch, receipt_path):
+    monkeypatch.setattr(tesseract_wrapper.pytesseract, "image_to_data",
+                        lambda *a, **kw: _fake_data(["BROT"], ["90"]))
+    calls = []
+    real_prepare = tesseract_wrapper._prepare
+    monkeypatch.setattr(tesseract_wrapper, "_prepare", lambda p: calls.append(p) or real_prepare(p))
+
+    tesseract_wrapper.extract_text_blocks(receipt_path)
+    tesseract_wrapper.extract_text_blocks(receipt_path)
+    assert len(calls) == 1
+
+
+def test_batch_keeps_order_and_reports_failures(tmp_path):
+    # Files that exist but do not decode fail in the worker after the cache lookup.
+    for name in ("a.png", "b.png"):
+        (tmp_path / name).write_text("not an image")
+    paths = [str(tmp_path / "a.png"), str(tmp_path / "b.png"), str(tmp_path / "a.png")]
+    results = tesseract_wrapper.extract_text_blocks_batch(paths, workers=2, return_exceptions=True)
+    assert [str(r) for r in results] == paths
+    assert all(isinstance(r, FileNotFoundError) for r in results)
+
+    with pytest.raises(FileNotFoundError):
+        tesseract_wrapper.extract_text_blocks_batch(paths, workers=2)
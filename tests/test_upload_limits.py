@@ -0,0 +1,60 @@
+from fastapi import APIRouter, FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+from starlette.formparsers import MultiPartParser
+from api.services.upload_limits import InMemoryUploadRoute, UploadSizeLimit, read_upload
+
+
+def _client(limit=1000, per_file=500):
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimit, limits={"/upload": limit})
+    router = APIRouter(route_class=InMemoryUploadRoute)
+
+    @router.post("/upload/receipt")
+    async def upload(file: UploadFile = File(...)):
+        return {"size": len(await read_upload(file, per_file)), "spooled": file.file._rolled}
+
+    @app.post("/other")
+    async def other(file: UploadFile = File(...)):
+        return {"size": len(await file.read()), "spooled": file.file._rolled}
+
+    app.include_router(router)
+    return TestClient(app)
+
+
+def test_small_upload_is_read_in_memory():
+    resp = _client().post("/upload/receipt", files={"file": ("r.jpg", b"x" * 100)})
+    assert resp.status_code == 200
+    assert resp.json() == {"size": 100, "spooled": False}
+
+
+def test_only_upload_routes_keep_large_files_in_memory():
+    default_spool = MultiPartParser.spool_max_size
+    client = _client(limit=10 * 1024 * 1024, per_file=10 * 1024 * 1024)
+    body = {"file": ("r.jpg", b"x" * (2 * 1024 * 1024))}
+    assert client.post("/upload/receipt", files=body).json()["spooled"] is False
+    assert client.post("/other", files=body).json()["spooled"] is True
+    assert MultiPartParser.spool_max_size == default_spool
+
+
+def test_declared_oversize_body_is_rejected_before_parsing():
+    resp = _client(limit=1000).post("/upload/receipt", files={"file": ("r.jpg", b"x" * 5000)})
+    assert resp.status_code == 413
+
+
+def test_streamed_oversize_body_is_cut_off():
+    def chunks():
+        for _ in range(10):
+            yield b"x" * 500
+    resp = _client(limit=1000).post("/upload/receipt", content=chunks(),
+                                    headers={"content-type": "multipart/form-data; boundary=b"})
+    assert resp.status_code == 413
+
+
+def test_per_file_limit_applies_after_parsing():
+    resp = _client(limit=10_000, per_file=500).post("/upload/receipt", files={"file": ("r.jpg", b"x" * 800)})
+    assert resp.status_code == 413
+
+
+def test_other_paths_are_not_limited():
+    resp = _client(limit=1000).post("/other", files={"file": ("r.jpg", b"x" * 5000)})
+    assert resp.status_code == 200
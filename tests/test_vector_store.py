@@ -0,0 +1,172 @@
+from unittest.mock import MagicMock
+import numpy as np
+from api.services.vector_store import VectorStore, dequantize, partition_name, quantize
+
+
+def _rows(n, dim=4, start=0, ts=0.0):
+    rng = np.random.default_rng(start)
+    ids = [f"r:{start + i}:summary" for i in range(n)]
+    metas = [{"user_id": 1, "receipt_id": start + i, "date_ts": ts + i, "type": "summary"} for i in range(n)]
+    return ids, rng.normal(size=(n, dim)).tolist(), metas, [f"doc {start + i}" for i in range(n)]
+
+
+def test_matrix_query_is_exact_and_filters_dates(tmp_path):
+    store = VectorStore(root=str(tmp_path), collection=MagicMock(), matrix_max_rows=100)
+    ids, vectors, metas, docs = _rows(20)
+    store.upsert(1, ids, vectors, metas, docs)
+
+    hits = store.query(1, vectors[7], top_k=3)
+    assert store.backend(1) == "matrix"
+    assert hits[0].id == "r:7:summary"
+    assert abs(hits[0].score - 1.0) < 1e-5
+    assert [h.score for h in hits] == sorted((h.score for h in hits), reverse=True)
+
+    in_range = store.query(1, vectors[7], top_k=10, date_range=(10.0, 12.0))
+    assert {h.metadata["date_ts"] for h in in_range} == {10.0, 11.0, 12.0}
+
+
+def test_matrix_upsert_replaces_ids_and_is_visible_to_other_readers(tmp_path):
+    writer = VectorStore(root=str(tmp_path), collection=MagicMock(), matrix_max_rows=100)
+    reader = VectorStore(root=str(tmp_path), collection=MagicMock(), matrix_max_rows=100)
+    ids, vectors, metas, docs = _rows(5)
+    writer.upsert(1, ids, vectors, metas, docs)
+    assert len(reader.query(1, vectors[0], top_k=10)) == 5
+
+    writer.upsert(1, ids[:1], [vectors[1]], metas[:1], ["doc 0 v2"])
+    writer.upsert(1, *_rows(2, start=5))
+
+    assert writer.count(1) == 7
+    hits = reader.query(1, vectors[1], top_k=10)
+    assert len(hits) == 7
+    assert {h.document for h in hits if h.id == "r:0:summary"} == {"doc 0 v2"}
+    # The current generation plus the one it replaced.
+    assert len(list((tmp_path / "u1").glob("vectors-*"))) == 2
+
+
+def test_partition_is_promoted_to_chroma_when_it_grows(tmp_path):
+    collection = MagicMock()
+    collection.count.return_value = 12
+    collections = MagicMock(return_value=collection)
+    store = VectorStore(root=str(tmp_path), collection=collections, matrix_max_rows=10)
+    store.upsert(1, *_rows(8))
+    store.upsert(1, *_rows(4, start=8))
+
+    assert store.backend(1) == "chroma"
+    collections.assert_called_with(partition_name(1))
+    assert len(collection.upsert.call_args.kwargs["ids"]) == 12
+    assert not list((tmp_path / "u1").glob("vectors-*"))
+
+    collection.query.return_value = {"ids": [["r:3:summary"]], "documents": [["doc 3"]],
+                                     "metadatas": [[{"receipt_id": 3}]], "distances": [[0.5]]}
+    hits = store.query(1, [0.1, 0.2, 0.3, 0.4], top_k=1, date_range=(0.0, 5.0))
+    assert hits[0].score == 0.75
+    assert collection.query.call_args.kwargs["where"] == {"$and": [{"date_ts": {"$gte": 0.0}}, {"date_ts": {"$lte": 5.0}}]}
+
+
+def test_quantize_round_trip_error_is_small():
+    vectors = np.random.default_rng(0).normal(size=(50, 384)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    for dtype, tol in [("float16", 1e-3), ("int8", 1e-2)]:
+        codes, scales = quantize(vectors, dtype)
+        assert np.abs(dequantize(codes, scales) - vectors).max() < tol
+
+
+def test_int8_partition_reranks_with_exact_scores(tmp_path):
+    store = VectorStore(root=str(tmp_path), collection=MagicMock(), dtype="int8")
+    ids, vectors, metas, docs = _rows(200, dim=32)
+    store.upsert(1, ids, vectors, metas, docs)
+
+    assert store._matrix(1, store.manifest(1)).vectors.dtype == np.int8
+    assert next((tmp_path / "u1").glob("vectors-*")).stat().st_size == 200 * 32
+    exact = _unit(vectors) @ _unit([vectors[3]])[0]
+    hits = store.query(1, vectors[3], top_k=5)
+    assert [h.id for h in hits] == [ids[i] for i in np.argsort(-exact)[:5]]
+    assert np.allclose([h.score for h in hits], np.sort(exact)[::-1][:5], atol=1e-6)
+
+    # Without the float32 copy the scores are the (approximate) int8 ones.
+    store = VectorStore(root=str(tmp_path / "norerank"), collection=MagicMock(), dtype="int8", rerank=False)
+    store.upsert(1, ids, vectors, metas, docs)
+    assert not list((tmp_path / "norerank" / "u1").glob("full-*"))
+    assert store.query(1, vectors[3], top_k=1)[0].id == ids[3]
+
+
+def _unit(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_delete_and_model_change_reset_the_partition(tmp_path):
+    store = VectorStore(root=str(tmp_path), collection=MagicMock(), matrix_max_rows=100)
+    ids, vectors, metas, docs = _rows(6)
+    store.upsert(1, ids, vectors, metas, docs, model="mini")
+    store.delete(1, ids[:2] + ["r:99:summary"])
+    assert store.ids(1) == ids[2:]
+
+    store.upsert(1, ids[:1], np.ones((1, 8)).tolist(), metas[:1], docs[:1], model="bigger")
+    assert store.ids(1) == ids[:1]
+    assert store.manifest(1)["model"] == "bigger"
+
+
+def test_first_write_keeps_a_legacy_users_earlier_vectors(tmp_path):
+    legacy = MagicMock()
+    ids, vectors, metas, docs = _rows(3)
+    legacy.get.return_value = {"ids": ids, "embeddings": vectors, "metadatas": metas, "documents": docs}
+    store = VectorStore(root=str(tmp_path), collection=lambda name: legacy, matrix_max_rows=100)
+
+    store.upsert(1, *_rows(1, start=3))
+
+    assert store.backend(1) == "matrix"
+    assert legacy.get.call_args.kwargs["where"] == {"user_id": 1}
+    hits = store.query(1, vectors[1], top_k=10)
+    assert {h.id for h in hits} == {f"r:{i}:summary" for i in range(4)}
+    assert hits[0].id == "r:1:summary"
+    legacy.query.assert_not_called()
+
+
+def test_readers_survive_generations_dropped_under_them(tmp_path):
+    writer = VectorStore(root=str(tmp_path), collection=MagicMock(), matrix_max_rows=100)
+    reader = VectorStore(root=str(tmp_path), collection=MagicMock(), matrix_max_rows=100)
+    ids, vectors, metas, docs = _rows(3)
+    writer.upsert(1, ids, vectors, metas, docs)
+    stale = reader.manifest(1)
+
+    # One rewrite keeps the generation a reader may have just read from the manifest.
+    writer.delete(1, ids[:1])
+    assert len(reader._matrix(1, stale).ids) == 3
+    reader._cache.clear()
+
+    # After a second one it is gone; the reader re-reads the manifest and gets the new generation.
+    writer.delete(1, ids[1:2])
+    real_manifest = reader.manifest
+    manifests = iter([stale])
+    reader.manifest = lambda uid: next(manifests, None) or real_manifest(uid)
+    assert [h.id for h in reader.query(1, vectors[2], top_k=10)] == [ids[2]]
+
+
+def test_new_rows_are_appended_without_rewriting_the_partition(tmp_path):
+    writer = VectorStore(root=str(tmp_path), collection=MagicMock(), matrix_max_rows=100, dtype="int8")
+    reader = VectorStore(root=str(tmp_path), collection=MagicMock(), matrix_max_rows=100, dtype="int8")
+    ids, vectors, metas, docs = _rows(10, dim=8)
+    writer.upsert(1, ids[:6], vectors[:6], metas[:6], docs[:6])
+    gen = writer.manifest(1)["generation"]
+    assert len(reader.query(1, vectors[0], top_k=20)) == 6
+
+    writer.upsert(1, ids[6:8], vectors[6:8], metas[6:8], docs[6:8])
+    writer.upsert(1, ids[8:], vectors[8:], metas[8:], docs[8:])
+    assert writer.manifest(1)["generation"] == gen
+    assert len(list((tmp_path / "u1").glob("vectors-*"))) == 1
+    hits = reader.query(1, vectors[9], top_k=20)
+    assert len(hits) == 10 and hits[0].id == ids[9]
+
+    # A torn append (bytes past the published count) is invisible and overwritten by the next one.
+    with open(tmp_path / "u1" / f"vectors-{gen}.bin", "ab") as f:
+        f.write(b"\x7f" * 8)
+    assert len(reader.query(1, vectors[9], top_k=20)) == 10
+    extra = _rows(1, dim=8, start=10)
+    writer.upsert(1, *extra)
+    assert reader.query(1, extra[1][0], top_k=1)[0].id == "r:10:summary"
+
+    # Replacing a row compacts into a new generation.
+    writer.upsert(1, ids[:1], vectors[1:2], metas[:1], ["doc 0 v2"])
+    assert writer.manifest(1)["generation"] != gen
+    assert writer.count(1) == 11
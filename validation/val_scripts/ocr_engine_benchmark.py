@@ -0,0 +1,61 @@
+import argparse
+import multiprocessing
+import resource
+import time
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from ingestion.ocr.backends import ENGINE_CHOICES
+from validation.val_scripts.ocr_preprocess_benchmark import GT_DIR, IMG_DIR, item_token_recall, load_pairs
+
+def run_engine(engine: str, pairs):
+    # Runs in a fresh process so load time and peak RSS belong to this engine alone.
+    from ingestion.ocr.backends import build_backend
+    t0 = time.perf_counter()
+    backend = build_backend(engine)
+    backend.warm_up()
+    load_s = time.perf_counter() - t0
+    latencies, recalls, confidences, escalated = [], [], [], 0
+    t0 = time.perf_counter()
+    for img_path, gt_items in pairs:
+        result = backend.recognize(str(img_path))
+        latencies.append(result.elapsed)
+        recalls.append(item_token_recall(gt_items, result.lines))
+        confidences.append(result.mean_confidence)
+        escalated += len(result.attempts) > 1
+    wall_s = time.perf_counter() - t0
+    return {
+        "load_s": load_s,
+        "throughput": len(pairs) / wall_s,
+        "p50_ms": float(np.percentile(latencies, 50)) * 1000,
+        "p95_ms": float(np.percentile(latencies, 95)) * 1000,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "confidence": float(np.mean(confidences)),
+        "recall": float(np.mean(recalls)),
+        "escalated": escalated,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput, latency, memory and accuracy per OCR engine.")
+    parser.add_argument("--images", type=Path, default=IMG_DIR)
+    parser.add_argument("--ground-truth", type=Path, default=GT_DIR)
+    parser.add_argument("--engines", nargs="+", default=["tesseract", "easyocr", "cascade"], choices=ENGINE_CHOICES)
+    parser.add_argument("--limit", type=int, default=None, help="only use the first N images")
+    args = parser.parse_args()
+
+    pairs = load_pairs(args.images, args.ground_truth, args.limit)
+    if not pairs:
+        print("No images with ground truth found.")
+        return
+    print(f"Benchmarking {len(pairs)} receipts (cascade settings come from OCR_CASCADE / OCR_MIN_CONFIDENCE)")
+    print(f"{'engine':<10} {'load s':>7} {'img/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'rss MB':>8} "
+          f"{'conf':>6} {'recall':>7} {'escal.':>7}")
+    ctx = multiprocessing.get_context("spawn")
+    for engine in args.engines:
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as ex:
+            r = ex.submit(run_engine, engine, pairs).result()
+        print(f"{engine:<10} {r['load_s']:>7.1f} {r['throughput']:>7.2f} {r['p50_ms']:>8.0f} {r['p95_ms']:>8.0f} "
+              f"{r['peak_rss_mb']:>8.0f} {r['confidence']:>6.2f} {r['recall']:>7.3f} {r['escalated']:>7}")
+
+if __name__ == "__main__":
+    main()
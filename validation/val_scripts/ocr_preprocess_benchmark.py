@@ -0,0 +1,75 @@
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+import cv2
+import numpy as np
+from ingestion.ocr.preprocess import PRESETS, preprocess
+
+IMG_DIR = Path("validation/receipt_val_data/images")
+GT_DIR  = Path("validation/receipt_val_data/ground_truth_outdated")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tiff")
+
+tokenizer = re.compile(r"\w+")
+def tokenize(text):
+    return tokenizer.findall(text.lower())
+
+def item_token_recall(gt_items, lines) -> float:
+    # Share of ground-truth item-name tokens that appear anywhere in the OCR output.
+    ocr_tokens = set(tokenize(" ".join(lines)))
+    gt_tokens = [t for item in gt_items for t in tokenize(item["item"])]
+    if not gt_tokens:
+        return 0.0
+    return sum(t in ocr_tokens for t in gt_tokens) / len(gt_tokens)
+
+def load_pairs(images: Path, ground_truth: Path, limit: int | None = None):
+    pairs = []
+    for img_path in sorted(p for p in images.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS):
+        gt_path = ground_truth / f"{img_path.stem}.json"
+        if not gt_path.exists():
+            print(f"Skipping {img_path.name}: no ground truth found.")
+            continue
+        with gt_path.open("r", encoding="utf-8") as f:
+            pairs.append((img_path, json.load(f)))
+    return pairs[:limit] if limit else pairs
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR latency and accuracy per preprocessing preset.")
+    parser.add_argument("--images", type=Path, default=IMG_DIR)
+    parser.add_argument("--ground-truth", type=Path, default=GT_DIR)
+    parser.add_argument("--presets", nargs="+", default=list(PRESETS), choices=list(PRESETS))
+    parser.add_argument("--limit", type=int, default=None, help="only use the first N images")
+    args = parser.parse_args()
+
+    from ingestion.ocr.easyocr_wrapper import get_reader, sort_by_reading_order
+    reader = get_reader()
+
+    pairs = load_pairs(args.images, args.ground_truth, args.limit)
+    if not pairs:
+        print("No images with ground truth found.")
+        return
+    print(f"Benchmarking {len(pairs)} receipts")
+
+    reader.readtext(np.full((64, 64), 255, np.uint8))   # warm-up, excluded from timings
+    print(f"{'preset':<10} {'prep ms':>9} {'ocr ms':>9} {'p95 ms':>9} {'pixels':>10} {'recall':>8}")
+    for name in args.presets:
+        config = PRESETS[name]
+        prep_ms, ocr_ms, total_ms, pixels, recalls = [], [], [], [], []
+        for img_path, gt_items in pairs:
+            img = cv2.imread(str(img_path))
+            t0 = time.perf_counter()
+            gray = preprocess(img, config)
+            t1 = time.perf_counter()
+            lines = sort_by_reading_order(reader.readtext(gray, detail=1, paragraph=False))
+            t2 = time.perf_counter()
+            prep_ms.append((t1 - t0) * 1000)
+            ocr_ms.append((t2 - t1) * 1000)
+            total_ms.append((t2 - t0) * 1000)
+            pixels.append(gray.shape[0] * gray.shape[1])
+            recalls.append(item_token_recall(gt_items, lines))
+        print(f"{name:<10} {np.mean(prep_ms):>9.0f} {np.mean(ocr_ms):>9.0f} "
+              f"{np.percentile(total_ms, 95):>9.0f} {np.mean(pixels) / 1e6:>9.2f}M {np.mean(recalls):>8.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+from api.services.vector_store import VectorStore
+
+VARIANTS = [("float32", True), ("float16", True), ("int8", True), ("float16", False), ("int8", False)]
+
+def synthetic_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    # Receipts repeat the same stores and products, so draw points around a few hundred centres.
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(max(n // 50, 1), dim))
+    vectors = centres[rng.integers(len(centres), size=n)] + 0.35 * rng.normal(size=(n, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+def partition_vectors(root: Path, user_id: int) -> np.ndarray:
+    store = VectorStore(root=str(root))
+    manifest = store.manifest(user_id)
+    if not manifest or manifest["backend"] != "matrix":
+        raise SystemExit(f"User {user_id} has no matrix partition under {root}")
+    return store._matrix(user_id, manifest).exact()
+
+def run_variant(vectors: np.ndarray, queries: np.ndarray, truth: np.ndarray, dtype: str, rerank: bool, k: int):
+    with tempfile.TemporaryDirectory() as root:
+        store = VectorStore(root=root, collection=None, matrix_max_rows=len(vectors), dtype=dtype, rerank=rerank)
+        ids = [str(i) for i in range(len(vectors))]
+        store.upsert(1, ids, vectors, [{"date_ts": 0.0} for _ in ids], [""] * len(ids))
+        matrix = store._matrix(1, store.manifest(1))
+        resident = matrix.vectors.nbytes + (matrix.scales.nbytes if matrix.scales is not None else 0)
+        disk = sum(f.stat().st_size for f in Path(root, "u1").iterdir())
+        store.query(1, queries[0], top_k=k)
+        latencies, recalls = [], []
+        for query, expected in zip(queries, truth):
+            t0 = time.perf_counter()
+            hits = store.query(1, query, top_k=k)
+            latencies.append(time.perf_counter() - t0)
+            recalls.append(len({int(h.id) for h in hits} & set(expected.tolist())) / k)
+    return {
+        "scan_mb": resident / 2**20,
+        "disk_mb": disk / 2**20,
+        "p50_ms": float(np.percentile(latencies, 50)) * 1000,
+        "p95_ms": float(np.percentile(latencies, 95)) * 1000,
+        "recall": float(np.mean(recalls)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory, disk, latency and recall@k of quantized matrix partitions.")
+    parser.add_argument("--rows", type=int, default=20000, help="synthetic partition size")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--index-dir", type=Path, default=None, help="use a real partition from this VECTOR_INDEX_DIR")
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.index_dir:
+        vectors = partition_vectors(args.index_dir, args.user_id)
+    else:
+        vectors = synthetic_vectors(args.rows, args.dim)
+    rng = np.random.default_rng(1)
+    # Queries near stored rows, like questions about things the user actually bought.
+    queries = vectors[rng.integers(len(vectors), size=args.queries)] + 0.1 * rng.normal(size=(args.queries, vectors.shape[1]))
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+    truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.k]
+
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {args.queries} queries, recall@{args.k} vs float32 brute force")
+    print(f"{'dtype':<9} {'rerank':>6} {'scan MB':>8} {'disk MB':>8} {'p50 ms':>7} {'p95 ms':>7} {'recall':>7}")
+    for dtype, rerank in VARIANTS:
+        r = run_variant(vectors, queries, truth, dtype, rerank, args.k)
+        print(f"{dtype:<9} {'yes' if rerank and dtype != 'float32' else 'no':>6} {r['scan_mb']:>8.1f} {r['disk_mb']:>8.1f} "
+              f"{r['p50_ms']:>7.2f} {r['p95_ms']:>7.2f} {r['recall']:>7.3f}")
+
+if __name__ == "__main__":
+    main()